@@ -1,10 +1,254 @@
 from pathlib import Path
+import os
+import threading
+import time
 import duckdb
 
 DB_PATH = Path("app/data/landuse.duckdb")
+# Worker processes that only query can open the file read-only, any number of them at once
+# (a writer, e.g. the PBF ingest, needs the file to itself)
+DB_READ_ONLY = os.environ.get("DUCKDB_READ_ONLY", "").lower() in ("1", "true", "yes")
+
+# GeoParquet feature store, hive-partitioned by bundesland and landuse_type; files are Hilbert sorted
+# with a bbox covering column so bbox reads skip most row groups
+FEATURE_STORE_DIR = Path(os.environ.get("FEATURE_STORE_DIR", "data/feature_store"))
+FEATURE_STORE_ROW_GROUP_SIZE = int(os.environ.get("FEATURE_STORE_ROW_GROUP_SIZE", 10_000))
+# a fetched state/filter is answered from the store until it is this old, then fetched again
+FEATURE_STORE_MAX_AGE = int(os.environ.get("FEATURE_STORE_MAX_AGE", 7 * 24 * 3600))
+
+# Landuse statistics are kept per state and per grid cell of this size (degrees, ~1 km); bbox
+# statistics add up whole cells, so their extent is the bbox grown to this grid
+STATS_CELL_SIZE = float(os.environ.get("STATS_CELL_SIZE", 0.01))
+
+# DuckDB lets one process at a time hold a file read-write (or any number read-only). A process
+# keeps its handle (spatial loaded once) open; writers get the file through claim_store(). Set this
+# to close the handle after that many idle seconds instead, 0 keeps it open.
+DB_IDLE_SECONDS = float(os.environ.get("DUCKDB_IDLE_SECONDS", 0))
+# how long opening waits for another process to release the file before giving up
+DB_LOCK_TIMEOUT = float(os.environ.get("DUCKDB_LOCK_TIMEOUT", 10.0))
+# the ingest/update CLIs claim the store as its writer: every other process closes its handle as soon
+# as its queries are done and waits until the writer is finished; the writer waits this long for them
+DB_WRITER_TIMEOUT = float(os.environ.get("DUCKDB_WRITER_TIMEOUT", 600.0))
+
+INTENT_CHECK_SECONDS = 0.05
+# an idle open handle looks for a claiming writer this often, there is no query to notice it
+WRITER_POLL_SECONDS = 1.0
+
+def _is_lock_conflict(error):
+    return "lock" in str(error).lower()
+
+class ConnectionManager:
+    # One database handle per process with the spatial extension loaded once; every thread
+    # queries through its own cursor on that handle. Cursors are leases: the handle is closed once
+    # no lease has been open for idle_seconds (never when idle_seconds is 0 or None) or right away
+    # when a writer claimed the store.
+
+    def __init__(self, path=DB_PATH, read_only=DB_READ_ONLY, idle_seconds=DB_IDLE_SECONDS,
+                 lock_timeout=DB_LOCK_TIMEOUT):
+        self.path = Path(path)
+        self.read_only = read_only
+        self.idle_seconds = idle_seconds
+        self.lock_timeout = lock_timeout
+        self.lock_waits = 0
+        self.writer = False
+        self._intent = str(self.path.with_name(f"{self.path.name}.writer"))
+        self._intent_checked = (0.0, None)
+        self._db = None
+        self._pid = None
+        self._leases = 0
+        self._released = 0.0
+        self._timer = None
+        # re-entrant: a dropped cursor can end its lease from __del__ while this thread holds the lock
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def _open(self):
+        if not self.read_only:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = duckdb.connect(str(self.path), read_only=self.read_only)
+        try:
+            try:
+                db.load_extension("spatial")
+            except duckdb.Error:
+                db.install_extension("spatial")
+                db.load_extension("spatial")
+        except Exception:
+            db.close()
+            raise
+        return db
+
+    def claim_writer(self, timeout=DB_WRITER_TIMEOUT):
+        # this process becomes the store's writer until close()
+        self.writer = True
+        self.lock_timeout = max(self.lock_timeout, timeout)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        Path(self._intent).write_text(str(os.getpid()))
+
+    def writer_waiting(self):
+        # pid of another live process that claimed the store, None otherwise; looked up at most
+        # every INTENT_CHECK_SECONDS, this runs around every query
+        if self.writer:
+            return None
+        now = time.monotonic()
+        checked, pid = self._intent_checked
+        if now - checked > INTENT_CHECK_SECONDS:
+            pid = self._read_intent()
+            self._intent_checked = (now, pid)
+        return pid
+
+    def _read_intent(self):
+        try:
+            with open(self._intent, "rb") as f:
+                pid = int(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+        if pid == os.getpid():
+            return None
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            # left behind by a writer that crashed
+            return None
+        except PermissionError:
+            pass
+        return pid
+
+    def _open_waiting(self):
+        # another process holds the file or claimed it: retry with backoff until lock_timeout
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.05
+        while True:
+            writer = self.writer_waiting()
+            try:
+                if writer is not None:
+                    raise duckdb.IOException(f"Could not set lock on {self.path}: claimed by writer process {writer}")
+                return self._open()
+            except duckdb.IOException as e:
+                remaining = deadline - time.monotonic()
+                if not _is_lock_conflict(e) or remaining <= 0:
+                    raise
+                self.lock_waits += 1
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, 1.0)
+
+    def _reset_after_fork(self):
+        # a forked child must not reuse the parent's handle, leases or timer
+        if self._pid != os.getpid():
+            self._db = None
+            self._pid = os.getpid()
+            self._leases = 0
+            self._timer = None
+            self._local = threading.local()
+
+    def database(self):
+        with self._lock:
+            self._reset_after_fork()
+            if self._db is None:
+                self._db = self._open_waiting()
+                self._local = threading.local()
+            return self._db
+
+    def cursor(self):
+        with self._lock:
+            self._reset_after_fork()
+            if self._leases == 0 and self._db is not None and self.writer_waiting() is not None:
+                self._close_locked()
+            self._leases += 1
+        try:
+            db = self.database()
+            cursor = getattr(self._local, "cursor", None)
+            if cursor is None or self._local.db is not db:
+                cursor = db.cursor()
+                self._local.cursor = cursor
+                self._local.db = db
+        except BaseException:
+            self._release()
+            raise
+        return _PooledCursor(cursor, self)
+
+    def _release(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._leases -= 1
+            if self._leases > 0 or self._db is None:
+                return
+            self._released = time.monotonic()
+            if self.writer_waiting() is not None:
+                self._close_locked()
+            elif self._timer is None:
+                self._schedule(self._next_check(0.0))
+
+    def _next_check(self, idle):
+        if not self.idle_seconds:
+            return WRITER_POLL_SECONDS
+        return min(self.idle_seconds - idle, WRITER_POLL_SECONDS)
+
+    def _schedule(self, delay):
+        self._timer = threading.Timer(delay, self._close_idle)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _close_idle(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._timer = None
+            if self._leases > 0 or self._db is None:
+                return
+            idle = time.monotonic() - self._released
+            if self.writer_waiting() is not None or (self.idle_seconds and idle >= self.idle_seconds):
+                self._close_locked()
+            else:
+                self._schedule(self._next_check(idle))
+
+    def _close_locked(self):
+        if self._db is not None and self._pid == os.getpid():
+            self._db.close()
+        self._db = None
+        self._local = threading.local()
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._close_locked()
+            if self.writer:
+                self.writer = False
+                Path(self._intent).unlink(missing_ok=True)
+
+class _PooledCursor:
+    # The persistence functions close what get_connection() returns: that ends the lease, the
+    # thread's cursor itself stays open with the handle
+
+    def __init__(self, cursor, manager):
+        self._cursor = cursor
+        self._manager = manager
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._manager._release()
+
+    def __del__(self):
+        # a lease an exception path never closed ends with the object
+        if "_manager" in self.__dict__:
+            self.close()
+
+_manager = ConnectionManager()
 
 def get_connection():
-    conn = duckdb.connect(str(DB_PATH))
-    conn.install_extension("spatial")
-    conn.load_extension("spatial") 
-    return conn
\ No newline at end of file
+    return _manager.cursor()
+
+def close_connections():
+    _manager.close()
+
+def claim_store():
+    # for the CLIs that write (ingest, change files, statistics): the web app hands the file over
+    # between two queries and waits until close_connections()
+    _manager.claim_writer()
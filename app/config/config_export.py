@@ -0,0 +1,43 @@
+import os
+from pathlib import Path
+
+# Finished download artifacts, keyed by filter, format and data version
+ARTIFACT_CACHE_DIR = Path(os.environ.get("ARTIFACT_CACHE_DIR", "data/artifact_cache"))
+ARTIFACT_CACHE_TTL = int(os.environ.get("ARTIFACT_CACHE_TTL", 7 * 24 * 3600))
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get("ARTIFACT_CACHE_MAX_BYTES", 5 * 1024 ** 3))
+# bbox downloads are snapped outward to this grid (degrees) so nearby requests share an artifact
+ARTIFACT_BBOX_SNAP = float(os.environ.get("ARTIFACT_BBOX_SNAP", 0.001))
+
+# PMTiles archives in app/static/tiles, named by filter and data version; a background collector
+# keeps them under the quota, least recently served first
+PMTILES_MAX_BYTES = int(os.environ.get("PMTILES_MAX_BYTES", 5 * 1024 ** 3))
+PMTILES_MAX_AGE = int(os.environ.get("PMTILES_MAX_AGE", 7 * 24 * 3600))
+PMTILES_MIN_AGE = int(os.environ.get("PMTILES_MIN_AGE", 15 * 60))
+PMTILES_GC_INTERVAL = int(os.environ.get("PMTILES_GC_INTERVAL", 10 * 60))
+# builds that found no features or failed are answered from memory this long instead of being retried
+PMTILES_RETRY_AFTER = int(os.environ.get("PMTILES_RETRY_AFTER", 60))
+# "pipe" streams NDJSON into tippecanoe's stdin, "file" writes an NDJSON temp file that
+# tippecanoe maps and reads in parallel (faster parsing for very large states, costs the disk write)
+TIPPECANOE_INPUT = os.environ.get("TIPPECANOE_INPUT", "pipe")
+# Zoom range of the PMTiles archives. Below the last band's zoom features reach tippecanoe simplified
+# to one pixel of their band ("5-6,7-8,9-10"; empty hands over full detail at every zoom), polygons
+# smaller than TILE_MERGE_PIXELS² are merged per type up to TILE_MERGE_MAX_ZOOM
+TILE_MIN_ZOOM = int(os.environ.get("TILE_MIN_ZOOM", 5))
+TILE_MAX_ZOOM = int(os.environ.get("TILE_MAX_ZOOM", 14))
+TILE_ZOOM_BANDS = [tuple(int(z) for z in band.split("-"))
+                   for band in os.environ.get("TILE_ZOOM_BANDS", "5-6,7-8,9-10").split(",") if band.strip()]
+TILE_MERGE_MAX_ZOOM = int(os.environ.get("TILE_MERGE_MAX_ZOOM", 8))
+TILE_MERGE_PIXELS = float(os.environ.get("TILE_MERGE_PIXELS", 4))
+
+# Vector tiles encoded on demand from the local store, cached in memory and on disk
+MVT_MIN_ZOOM = int(os.environ.get("MVT_MIN_ZOOM", 5))
+MVT_MAX_ZOOM = int(os.environ.get("MVT_MAX_ZOOM", 16))
+MVT_MEMORY_TILES = int(os.environ.get("MVT_MEMORY_TILES", 2048))
+MVT_CACHE_DIR = Path(os.environ.get("MVT_CACHE_DIR", "data/mvt_cache"))
+MVT_CACHE_MAX_BYTES = int(os.environ.get("MVT_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+MVT_CACHE_TTL = int(os.environ.get("MVT_CACHE_TTL", 7 * 24 * 3600))
+
+# Background jobs for long-running filters and downloads
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# finished jobs stay pollable this long
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 3600))
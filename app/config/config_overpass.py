@@ -0,0 +1,39 @@
+import os
+from pathlib import Path
+
+OVERPASS_URL = os.environ.get("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+# comma separated list of interpreters the bundesland grid is spread over round-robin
+OVERPASS_URLS = [u.strip() for u in os.environ.get("OVERPASS_URLS", OVERPASS_URL).split(",") if u.strip()]
+
+# Compressed Overpass responses, keyed by the normalized query text
+OVERPASS_CACHE_DIR = Path(os.environ.get("OVERPASS_CACHE_DIR", "data/overpass_cache"))
+OVERPASS_CACHE_TTL = int(os.environ.get("OVERPASS_CACHE_TTL", 7 * 24 * 3600))
+OVERPASS_CACHE_MAX_BYTES = int(os.environ.get("OVERPASS_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# bbox coordinates are rounded before they go into a query so near-identical requests share a cache entry
+BBOX_PRECISION = 5
+
+# bbox requests are answered from fixed web-mercator tiles, each fetched and cached on its own
+BBOX_TILE_ZOOM = int(os.environ.get("BBOX_TILE_ZOOM", 12))
+BBOX_MAX_TILES = int(os.environ.get("BBOX_MAX_TILES", 64))
+BBOX_TILE_CACHE_DIR = Path(os.environ.get("BBOX_TILE_CACHE_DIR", "data/bbox_tile_cache"))
+BBOX_TILE_CACHE_MAX_BYTES = int(os.environ.get("BBOX_TILE_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Bundesland grid: cells that time out, get rate limited or blow these budgets are split into quadrants
+MAX_CELL_ELEMENTS = int(os.environ.get("MAX_CELL_ELEMENTS", 50_000))
+MAX_CELL_BYTES = int(os.environ.get("MAX_CELL_BYTES", 128 * 1024 ** 2))
+MIN_CELL_SIZE_DEG = float(os.environ.get("MIN_CELL_SIZE_DEG", 0.01))
+GRID_SIZES_FILE = Path(os.environ.get("GRID_SIZES_FILE", "data/grid_sizes.json"))
+
+# 429/504 answers are retried with exponential backoff before a cell gets split
+OVERPASS_MAX_RETRIES = int(os.environ.get("OVERPASS_MAX_RETRIES", 4))
+OVERPASS_BACKOFF_SECONDS = float(os.environ.get("OVERPASS_BACKOFF_SECONDS", 2.0))
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Clipping state results to the boundary: a quadtree at least CLIP_MIN_DEPTH levels deep with edge
+# pieces of at most CLIP_PIECE_VERTICES vertices; crossing features are clipped in a process pool
+# once there are enough of them
+CLIP_WORKERS = int(os.environ.get("CLIP_WORKERS", min(4, os.cpu_count() or 1)))
+CLIP_PIECE_VERTICES = int(os.environ.get("CLIP_PIECE_VERTICES", 256))
+CLIP_MIN_DEPTH = int(os.environ.get("CLIP_MIN_DEPTH", 5))
+CLIP_PARALLEL_MIN = int(os.environ.get("CLIP_PARALLEL_MIN", 2000))
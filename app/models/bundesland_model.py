@@ -4,6 +4,10 @@ class Bundesland(BaseModel):
     id: int | None
     bundesland: str
     area: float
+    minx: float
+    miny: float
+    maxx: float
+    maxy: float
     geometry: bytes
     
     
@@ -8,7 +8,11 @@ class LanduseByH3(BaseModel):
     landuse_type: str
     leisure: str
     city: str
-    area: str
+    area: float
+    minx: float
+    miny: float
+    maxx: float
+    maxy: float
     geometry: bytes
     created_at: Optional[str] = None
     
@@ -2,27 +2,36 @@ from app.config.config_db import get_connection
 
 def create_bundesland_table():
     conn = get_connection()
-    query = """CREATE TABLE IF NOT EXISTS bundesland(
-                id BIGINT AUTOINCREMENT,
+    query = """CREATE SEQUENCE IF NOT EXISTS bundesland_id_seq;
+               CREATE TABLE IF NOT EXISTS bundesland(
+                id BIGINT DEFAULT nextval('bundesland_id_seq'),
                 bundesland VARCHAR,
                 area DOUBLE PRECISION,
-                geometry BLOB
-                );"""
+                minx DOUBLE,
+                miny DOUBLE,
+                maxx DOUBLE,
+                maxy DOUBLE,
+                geometry GEOMETRY
+                );
+               CREATE INDEX IF NOT EXISTS bundesland_geometry_idx ON bundesland USING RTREE (geometry);"""
     conn.execute(query)
     conn.close()
     
 def insert_bundesland_data(df):
+    # df carries bundesland, area and geometry as WKB bytes
     conn = get_connection()
     conn.register("df_view", df)
-    query = """INSERT INTO bundesland(bundesland, area, geometry)
-               SELECT bundesland, area, geometry FROM df_view;"""
+    query = """INSERT INTO bundesland(bundesland, area, minx, miny, maxx, maxy, geometry)
+               SELECT bundesland, area, ST_XMin(g), ST_YMin(g), ST_XMax(g), ST_YMax(g), g
+               FROM (SELECT *, ST_GeomFromWKB(geometry) AS g FROM df_view);"""
     conn.execute(query)
     conn.unregister("df_view")
     conn.close()
     
 def get_bundesland_data(bundesland: str):
     conn = get_connection()
-    query = "SELECT * from bundesland WHERE bundesland = ?;"            
+    query = """SELECT id, bundesland, area, minx, miny, maxx, maxy, ST_AsWKB(geometry) AS geometry
+               FROM bundesland WHERE bundesland = ?;"""
     result = conn.execute(query, [bundesland]).df()
     conn.close()
     return result
@@ -31,4 +40,4 @@ def delete_bundesland_table():
     conn = get_connection()
     query = "DROP TABLE IF EXISTS bundesland;"
     conn.execute(query)
-    conn.close()
\ No newline at end of file
+    conn.close()
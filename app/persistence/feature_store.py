@@ -0,0 +1,208 @@
+from app.config.config_db import FEATURE_STORE_DIR, FEATURE_STORE_ROW_GROUP_SIZE, FEATURE_STORE_MAX_AGE
+from app.utils.overpass_query import UNTAGGED_LANDUSE_TYPES
+from app.utils.utils import empty_landuse_frame, LANDUSE_FRAME_COLUMNS
+
+import contextlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import quote, unquote
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import shapely
+
+# Layout: <root>/bundesland=<name>/landuse_type=<type>/part-0.parquet, one GeoParquet 1.1 file per
+# partition, rows in Hilbert order so row groups are spatially compact and their bbox statistics tight.
+# Natural/leisure features without a landuse tag sit in the partition of their untagged type.
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+PARTITION_FILE = "part-0.parquet"
+PARTITIONING = ds.HivePartitioning(pa.schema([("bundesland", pa.string()), ("landuse_type", pa.string())]),
+                                   null_fallback=NULL_PARTITION, segment_encoding="uri")
+TEXT_COLUMNS = ["id", "osm_id", "osm_type", "name", "leisure", "city"]
+
+def _geometry_slice(geometry_type):
+    geometry_type = str(geometry_type).lower()
+    if geometry_type == "point":
+        return "point"
+    if geometry_type in ("polygon", "multipolygon"):
+        return "polygon"
+    return "all"
+
+def _osm_types(geometry_slice):
+    return {"point": ["node"], "polygon": ["way", "relation"]}.get(geometry_slice)
+
+def _state_dir(root, bundesland):
+    return Path(root) / f"bundesland={quote(str(bundesland).lower(), safe='')}"
+
+def _partition_dir(root, bundesland, landuse_type):
+    value = NULL_PARTITION if landuse_type is None else quote(landuse_type, safe="")
+    return _state_dir(root, bundesland) / f"landuse_type={value}"
+
+@contextlib.contextmanager
+def _state_lock(root, bundesland):
+    # job processes may write different slices of the same state at once
+    state_dir = _state_dir(root, bundesland)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    with open(state_dir / "_lock", "a+") as f:
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _load_manifest(root, bundesland):
+    try:
+        with open(_state_dir(root, bundesland) / "_manifest.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _save_manifest(root, bundesland, manifest):
+    path = _state_dir(root, bundesland) / "_manifest.json"
+    tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def store_covers(bundesland, landuse_type, geometry_type, max_age=FEATURE_STORE_MAX_AGE, root=FEATURE_STORE_DIR):
+    # True when a fetch of the same or a wider filter was stored less than max_age ago
+    landuse_type, geometry_slice = landuse_type.lower(), _geometry_slice(geometry_type)
+    now = time.time()
+    for entry, stored_at in _load_manifest(root, bundesland).items():
+        stored_type, stored_slice = entry.split("|")
+        if (now - stored_at <= max_age and stored_type in (landuse_type, "all")
+                and stored_slice in (geometry_slice, "all")):
+            return True
+    return False
+
+def _slice_mask(df, landuse_type, geometry_slice):
+    # rows an Overpass fetch of (landuse_type, geometry) returns; "all" has no untagged types
+    if landuse_type != "all":
+        mask = df["landuse_type"] == landuse_type
+    else:
+        mask = df["landuse_type"].notna() & ~df["landuse_type"].isin(UNTAGGED_LANDUSE_TYPES)
+    osm_types = _osm_types(geometry_slice)
+    if osm_types is not None:
+        mask &= df["osm_type"].isin(osm_types)
+    return mask.fillna(False).astype(bool)
+
+def _normalize(gdf):
+    # fixed column types so every partition file has the same schema
+    df = pd.DataFrame({c: gdf[c] if c in gdf.columns else None for c in LANDUSE_FRAME_COLUMNS if c != "geometry"})
+    for column in TEXT_COLUMNS + ["landuse_type"]:
+        df[column] = df[column].astype("string")
+    df["area"] = pd.to_numeric(df["area"], errors="coerce").astype("float64")
+    return gpd.GeoDataFrame(df, geometry=gdf.geometry.values, crs="EPSG:4326")
+
+def _dedupe(gdf):
+    # neighbouring grid cells return the same border-crossing features, the most complete copy wins
+    gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+    vertices = shapely.get_num_coordinates(gdf.geometry.values)
+    order = np.argsort(-vertices, kind="stable")
+    return gdf.iloc[order].drop_duplicates(subset=["osm_type", "osm_id"]).reset_index(drop=True)
+
+def _read_partition(path, landuse_type):
+    gdf = gpd.read_parquet(path)
+    gdf = gdf.drop(columns=[c for c in ("bbox", "bundesland") if c in gdf.columns])
+    gdf["landuse_type"] = landuse_type
+    return gdf
+
+def _write_partition(path, gdf, row_group_size):
+    if gdf.empty:
+        if path.exists():
+            path.unlink()
+        return
+    # Hilbert order over the partition's extent, neighbours on the map end up in the same row group
+    order = np.argsort(gdf.geometry.hilbert_distance(total_bounds=gdf.total_bounds, level=16).values, kind="stable")
+    gdf = gdf.iloc[order].drop(columns=["landuse_type"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{uuid.uuid4().hex}.tmp")
+    try:
+        gdf.to_parquet(tmp, index=False, compression="zstd", schema_version="1.1.0", write_covering_bbox=True,
+                       row_group_size=row_group_size)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+def write_features(bundesland, landuse_type, geometry_type, gdf, root=FEATURE_STORE_DIR,
+                   row_group_size=FEATURE_STORE_ROW_GROUP_SIZE):
+    # Stores the result of one Overpass fetch: the slice of the state the filter covers is replaced,
+    # everything else in the state's partitions is kept
+    landuse_type, geometry_slice = landuse_type.lower(), _geometry_slice(geometry_type)
+    new = _normalize(gdf)
+    new = _dedupe(new[_slice_mask(new, landuse_type, geometry_slice)])
+
+    with _state_lock(root, bundesland):
+        if landuse_type == "all":
+            values = {None if pd.isna(v) else v for v in new["landuse_type"].unique()}
+            for path in _state_dir(root, bundesland).glob(f"landuse_type=*/{PARTITION_FILE}"):
+                values.add(_partition_value(path.parent.name))
+        else:
+            values = {landuse_type}
+
+        for value in values:
+            path = _partition_dir(root, bundesland, value) / PARTITION_FILE
+            part = new[new["landuse_type"].isna()] if value is None else new[new["landuse_type"] == value]
+            if path.exists():
+                existing = _read_partition(path, value)
+                existing = existing[~_slice_mask(existing, landuse_type, geometry_slice)]
+                part = pd.concat([existing, part], ignore_index=True)
+            _write_partition(path, gpd.GeoDataFrame(part, geometry="geometry", crs="EPSG:4326"), row_group_size)
+
+        manifest = _load_manifest(root, bundesland)
+        manifest[f"{landuse_type}|{geometry_slice}"] = time.time()
+        _save_manifest(root, bundesland, manifest)
+    return len(new)
+
+def _partition_value(name):
+    value = name.split("=", 1)[1]
+    return None if value == NULL_PARTITION else unquote(value)
+
+def store_filter(bundesland=None, landuse_type="all", geometry_type="all", bounds=None):
+    # Partition pruning on bundesland/landuse_type, row-group pruning on the bbox covering column
+    landuse_type, geometry_slice = str(landuse_type).lower(), _geometry_slice(geometry_type)
+    expr = ds.scalar(True)
+    if bundesland is not None:
+        expr &= ds.field("bundesland") == str(bundesland).lower()
+    if landuse_type != "all":
+        expr &= ds.field("landuse_type") == landuse_type
+    else:
+        expr &= ds.field("landuse_type").is_valid() & ~ds.field("landuse_type").isin(UNTAGGED_LANDUSE_TYPES)
+    osm_types = _osm_types(geometry_slice)
+    if osm_types is not None:
+        expr &= ds.field("osm_type").isin(osm_types)
+    if bounds is not None:
+        min_x, min_y, max_x, max_y = (float(v) for v in bounds)
+        expr &= ((ds.field("bbox", "xmax") >= min_x) & (ds.field("bbox", "xmin") <= max_x)
+                 & (ds.field("bbox", "ymax") >= min_y) & (ds.field("bbox", "ymin") <= max_y))
+    return expr
+
+def open_store(root=FEATURE_STORE_DIR):
+    return ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+
+def read_features(bundesland=None, landuse_type="all", geometry_type="all", bounds=None, root=FEATURE_STORE_DIR):
+    # bounds = (min_x, min_y, max_x, max_y); features whose geometry intersects them
+    if not Path(root).exists():
+        return empty_landuse_frame()
+    table = open_store(root).to_table(filter=store_filter(bundesland, landuse_type, geometry_type, bounds))
+    if table.num_rows == 0:
+        return empty_landuse_frame()
+
+    geometry = shapely.from_wkb(table.column("geometry").to_numpy(zero_copy_only=False))
+    df = table.select([c for c in LANDUSE_FRAME_COLUMNS if c != "geometry"]).to_pandas()
+    gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
+    if bounds is not None:
+        gdf = gdf[shapely.intersects(gdf.geometry.values, shapely.box(*bounds))].reset_index(drop=True)
+    return gdf
@@ -1,50 +1,448 @@
-from app.config.config_db import get_connection
+from app.config.config_db import get_connection, STATS_CELL_SIZE
+from app.utils.overpass_query import UNTAGGED_LANDUSE_TYPES
 
-def create_landuse_table():
+import math
+import pandas as pd
+
+LANDUSE_COLUMNS = ["id", "osm_id", "osm_type", "name", "landuse_type", "leisure", "natural_type",
+                   "city", "area", "minx", "miny", "maxx", "maxy", "geometry"]
+# column of each untagged landuse type (natural/leisure features without a landuse tag)
+UNTAGGED_COLUMNS = {"natural": "natural_type", "leisure": "leisure"}
+# the landuse_type features are filtered, counted and served by: the landuse tag, else the
+# untagged type they were kept for (same precedence as untagged_landuse_type)
+LANDUSE_TYPE_SQL = ("coalesce(landuse_type, CASE "
+                    + " ".join(f"WHEN {UNTAGGED_COLUMNS[t]} IS NOT NULL THEN '{t}'" for t in UNTAGGED_LANDUSE_TYPES)
+                    + " END)")
+
+def create_landuse_table(replace=True):
+    # replace=False keeps an existing store (incremental loads)
     conn = get_connection()
-    query = """DROP TABLE IF EXISTS landuse_by_h3;
-               CREATE TABLE landuse_by_h3(
+    if replace:
+        conn.execute("DROP TABLE IF EXISTS landuse_by_h3;")
+    query = """CREATE TABLE IF NOT EXISTS landuse_by_h3(
                 id VARCHAR, 
                 osm_id VARCHAR,
+                osm_type VARCHAR,
                 name VARCHAR,
                 landuse_type VARCHAR,
                 leisure VARCHAR,
+                natural_type VARCHAR,
                 city VARCHAR,
-                area VARCHAR,
-                geometry BLOB,              
+                area DOUBLE,
+                minx DOUBLE,
+                miny DOUBLE,
+                maxx DOUBLE,
+                maxy DOUBLE,
+                geometry GEOMETRY,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);"""
     conn.execute(query)
     conn.close()
 
-def add_landuse_data(parquet_path: str):
+def create_landuse_index(if_missing=False):
+    # Built after bulk loads: filling the R-tree once is much faster than maintaining it per insert;
+    # if_missing=True keeps an index that was maintained through smaller upserts
     conn = get_connection()
-    query = f"""
-        INSERT INTO landuse_by_h3 (id, osm_id, name, landuse_type, leisure, city, area, geometry)
-        SELECT id, osm_id, name, landuse_type, leisure, city, area, geometry
-        FROM read_parquet('{parquet_path}');
-    """
-    conn.execute(query)
+    if not if_missing:
+        conn.execute("DROP INDEX IF EXISTS landuse_geometry_idx;")
+    conn.execute("CREATE INDEX IF NOT EXISTS landuse_geometry_idx ON landuse_by_h3 USING RTREE (geometry);")
     conn.close()
-    
-def merge_geoparquet_files():
+
+def drop_landuse_index():
+    conn = get_connection()
+    conn.execute("DROP INDEX IF EXISTS landuse_geometry_idx;")
+    conn.close()
+
+def upgrade_landuse_table():
+    # Stores written before the GEOMETRY schema keep WKB blobs and a VARCHAR area; rewrite them in place
+    conn = get_connection()
+    types = dict(conn.execute("""SELECT column_name, data_type FROM information_schema.columns
+                                 WHERE table_name = 'landuse_by_h3';""").fetchall())
+    legacy = bool(types) and types.get("geometry") != "GEOMETRY"
+    if legacy:
+        print("Upgrading landuse_by_h3 to GEOMETRY columns")
+        conn.execute("""CREATE OR REPLACE TABLE landuse_by_h3 AS
+                        SELECT id, osm_id, osm_type, name, landuse_type, leisure, natural_type, city,
+                               TRY_CAST(area AS DOUBLE) AS area,
+                               coalesce(minx, ST_XMin(g)) AS minx, coalesce(miny, ST_YMin(g)) AS miny,
+                               coalesce(maxx, ST_XMax(g)) AS maxx, coalesce(maxy, ST_YMax(g)) AS maxy,
+                               g AS geometry, created_at
+                        FROM (SELECT *, ST_GeomFromWKB(geometry) AS g FROM landuse_by_h3);""")
+    conn.close()
+    if legacy:
+        create_landuse_index()
+
+def add_landuse_data(parquet_files):
+    # Bulk upsert of Overpass cell files (a glob pattern or a list of paths) in one read_parquet scan.
+    # Neighbouring cells return the same border-crossing features, only one copy per osm_type/osm_id is
+    # kept (the one with the most vertices) and it replaces what the store had for that feature.
+    # With the spatial extension loaded the GeoParquet geometry column is read as GEOMETRY already.
+    if isinstance(parquet_files, (list, tuple)):
+        source = "[" + ", ".join("'{}'".format(str(f).replace("'", "''")) for f in parquet_files) + "]"
+    else:
+        source = "'{}'".format(str(parquet_files).replace("'", "''"))
+
+    conn = get_connection()
+    conn.execute("BEGIN TRANSACTION;")
+    try:
+        conn.execute(f"""CREATE OR REPLACE TEMP TABLE incoming_landuse AS
+                         SELECT id, CAST(osm_id AS VARCHAR) AS osm_id, osm_type, name, landuse_type, leisure, city,
+                                TRY_CAST(area AS DOUBLE) AS area, geometry
+                         FROM read_parquet({source}, union_by_name = true)
+                         WHERE geometry IS NOT NULL
+                         QUALIFY row_number() OVER (PARTITION BY osm_type, CAST(osm_id AS VARCHAR)
+                                                    ORDER BY ST_NPoints(geometry) DESC, id) = 1;""")
+        stats = _table_exists(conn, "landuse_stats_by_cell")
+        if stats:
+            _add_stats(conn, "incoming_landuse", -1)
+        conn.execute("""DELETE FROM landuse_by_h3 l USING incoming_landuse i
+                        WHERE l.osm_type = i.osm_type AND l.osm_id = i.osm_id;""")
+        conn.execute("""INSERT INTO landuse_by_h3 (id, osm_id, osm_type, name, landuse_type, leisure, city, area,
+                                                   minx, miny, maxx, maxy, geometry)
+                        SELECT id, osm_id, osm_type, name, landuse_type, leisure, city, area,
+                               ST_XMin(geometry), ST_YMin(geometry), ST_XMax(geometry), ST_YMax(geometry), geometry
+                        FROM incoming_landuse;""")
+        if stats:
+            _add_stats(conn, "incoming_landuse", 1)
+        count = conn.execute("SELECT count(*) FROM incoming_landuse;").fetchone()[0]
+        conn.execute("DROP TABLE incoming_landuse;")
+        conn.execute("COMMIT;")
+    except Exception:
+        conn.execute("ROLLBACK;")
+        raise
+    finally:
+        conn.close()
+    return count
+
+def insert_landuse_features(df):
+    # df carries LANDUSE_COLUMNS with geometry as WKB bytes
+    conn = get_connection()
+    conn.register("features_view", df)
+    columns = ", ".join(LANDUSE_COLUMNS)
+    values = ", ".join("ST_GeomFromWKB(geometry)" if c == "geometry" else c for c in LANDUSE_COLUMNS)
+    conn.execute(f"INSERT INTO landuse_by_h3 ({columns}) SELECT {values} FROM features_view;")
+    conn.unregister("features_view")
+    conn.close()
+
+def _keys_view(conn, keys):
+    # keys: (osm_type, osm_id) pairs
+    df = pd.DataFrame(list(keys), columns=["osm_type", "osm_id"]).astype({"osm_id": str})
+    conn.register("keys_view", df)
+
+def delete_landuse_features(keys):
+    conn = get_connection()
+    _keys_view(conn, keys)
+    conn.execute("""DELETE FROM landuse_by_h3 l USING keys_view k
+                    WHERE l.osm_type = k.osm_type AND l.osm_id = k.osm_id;""")
+    conn.unregister("keys_view")
+    conn.close()
+
+def get_landuse_attributes(keys):
+    # stored tags of features whose geometry is rebuilt without a new version of their own
+    conn = get_connection()
+    _keys_view(conn, keys)
+    result = conn.execute("""SELECT l.osm_type, l.osm_id, l.name, l.landuse_type, l.leisure, l.natural_type, l.city
+                             FROM landuse_by_h3 l JOIN keys_view k
+                             ON l.osm_type = k.osm_type AND l.osm_id = k.osm_id;""").df()
+    conn.unregister("keys_view")
+    conn.close()
+    return result
+
+def _landuse_filters(landuse_type, geometry_type, type_sql=LANDUSE_TYPE_SQL):
+    # type_sql: landuse_by_h3 derives the type, the statistics tables store it
+    clauses, params = [], []
+    if landuse_type and landuse_type != "all":
+        clauses.append(f"{type_sql} = ?")
+        params.append(landuse_type)
+    else:
+        # like the Overpass "all" query: every feature with a landuse tag
+        clauses.append(f"{type_sql} NOT IN ({', '.join(repr(t) for t in UNTAGGED_LANDUSE_TYPES)})")
+
+    if geometry_type == "point":
+        clauses.append("osm_type = 'node'")
+    elif geometry_type in ("polygon", "multipolygon"):
+        clauses.append("osm_type IN ('way', 'relation')")
+    return clauses, params
+
+def _envelope_sql(bounds):
+    # The R-tree index is only used when the geometry ST_Intersects compares against is a constant
+    # in the query text, prepared-statement parameters hide it from the optimizer
+    min_x, min_y, max_x, max_y = (float(v) for v in bounds)
+    return f"ST_MakeEnvelope({min_x!r}, {min_y!r}, {max_x!r}, {max_y!r})"
+
+def get_landuse_by_bounds(bounds, landuse_type, geometry_type, boundary_wkb=None):
+    # bounds = (min_x, min_y, max_x, max_y); the R-tree finds candidates by bbox, the exact
+    # boundary test runs on those only. The boundary is bound as WKB: a state's WKT is megabytes
+    # of query text to parse, and the R-tree only needs the envelope to be a constant.
+    clauses, params = _landuse_filters(landuse_type, geometry_type)
+    if boundary_wkb is not None:
+        clauses.append("ST_Intersects(geometry, ST_GeomFromWKB(?))")
+        params.append(boundary_wkb)
+
     conn = get_connection()
-    query = """SELECT h3_index, ST_Union_Agg(geometry) AS merged_geom
+    query = f"""SELECT id, osm_id, osm_type, name, {LANDUSE_TYPE_SQL} AS landuse_type, leisure, city, area,
+                       ST_AsWKB(geometry) AS geometry
                 FROM landuse_by_h3
-                GROUP BY h3_index;
+                WHERE ST_Intersects(geometry, {_envelope_sql(bounds)})
+                AND {" AND ".join(clauses)};
             """
-    result = conn.execute(query).df()
+    result = conn.execute(query, params).df()
+    conn.close()
+    return result
+
+def get_landuse_mvt(z, x, y, bounds, landuse_type, geometry_type, tolerance, extent=4096, buffer=64, area_wkb=None):
+    # One Mapbox Vector Tile (layer "landuse"); bounds are the tile in lon/lat for the R-tree lookup,
+    # tolerance is the simplification in web-mercator metres, area_wkb the requested area (state or
+    # bbox) cut to the tile, tested on the R-tree candidates only
+    clauses, params = _landuse_filters(landuse_type, geometry_type)
+    if area_wkb is not None:
+        clauses.append("ST_Intersects(geometry, ST_GeomFromWKB(?))")
+        params.append(area_wkb)
+
+    conn = get_connection()
+    query = f"""WITH features AS (
+                    SELECT ST_AsMVTGeom(
+                               ST_SimplifyPreserveTopology(
+                                   ST_Transform(geometry, 'EPSG:4326', 'EPSG:3857', true), ?),
+                               ST_Extent(ST_TileEnvelope(?, ?, ?)), ?, ?, true) AS geometry,
+                           osm_id, name, {LANDUSE_TYPE_SQL} AS landuse_type, leisure, city, area
+                    FROM landuse_by_h3
+                    WHERE ST_Intersects(geometry, {_envelope_sql(bounds)})
+                    AND {" AND ".join(clauses)}
+                )
+                SELECT ST_AsMVT(features, 'landuse', ?, 'geometry') FROM features WHERE geometry IS NOT NULL;
+            """
+    row = conn.execute(query, [tolerance, z, x, y, extent, buffer, *params, extent]).fetchone()
+    conn.close()
+    return bytes(row[0]) if row and row[0] is not None else b""
+
+def create_landuse_source_table():
+    conn = get_connection()
+    query = """CREATE TABLE IF NOT EXISTS landuse_sources(
+                source VARCHAR,
+                minx DOUBLE,
+                miny DOUBLE,
+                maxx DOUBLE,
+                maxy DOUBLE,
+                ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);"""
+    conn.execute(query)
+    conn.close()
+
+def add_landuse_source(source: str, bounds=None):
+    # Without explicit bounds (e.g. no PBF header box) the extent of the stored features is used
+    conn = get_connection()
+    if bounds is None:
+        bounds = conn.execute("SELECT min(minx), min(miny), max(maxx), max(maxy) FROM landuse_by_h3;").fetchone()
+    conn.execute("INSERT INTO landuse_sources (source, minx, miny, maxx, maxy) VALUES (?, ?, ?, ?, ?);",
+                 [source, *bounds])
+    conn.close()
+
+def clear_landuse_sources():
+    conn = get_connection()
+    conn.execute("DELETE FROM landuse_sources;")
+    conn.close()
+
+def is_area_covered(bounds):
+    min_x, min_y, max_x, max_y = bounds
+    conn = get_connection()
+    try:
+        query = """SELECT count(*) FROM landuse_sources
+                   WHERE minx <= ? AND miny <= ? AND maxx >= ? AND maxy >= ?;"""
+        count = conn.execute(query, [min_x, min_y, max_x, max_y]).fetchone()[0]
+    except Exception:
+        # no local store has been ingested yet
+        count = 0
+    conn.close()
+    return count > 0
+
+def get_data_version():
+    # bumped by PBF ingests and change-file updates, part of every download artifact key; Overpass
+    # cell upserts leave it alone (ingest_cell_files)
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT value FROM store_meta WHERE key = 'data_version';").fetchone()
+    except Exception:
+        # nothing has been ingested yet
+        row = None
+    conn.close()
+    return int(row[0]) if row else 0
+
+def bump_data_version():
+    conn = get_connection()
+    conn.execute("CREATE TABLE IF NOT EXISTS store_meta(key VARCHAR PRIMARY KEY, value VARCHAR);")
+    row = conn.execute("SELECT value FROM store_meta WHERE key = 'data_version';").fetchone()
+    version = (int(row[0]) if row else 0) + 1
+    conn.execute("INSERT OR REPLACE INTO store_meta VALUES ('data_version', ?);", [str(version)])
+    conn.close()
+    return version
+
+def _table_exists(conn, table):
+    return conn.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = ?;",
+                        [table]).fetchone()[0] > 0
+
+def _stats_cell_size(conn):
+    row = conn.execute("SELECT value FROM store_meta WHERE key = 'stats_cell_size';").fetchone()
+    return float(row[0]) if row else None
+
+def _cell_sql(column_min, column_max, cell_size):
+    # a feature is counted in the cell its bbox centre falls into
+    return f"CAST(floor(({column_min} + {column_max}) / 2 / {cell_size!r}) AS INTEGER)"
+
+def _merge_stats(conn, table, key_columns, delta, fresh):
+    # a refresh appends to the emptied table, increments are merged into the existing rows
+    if fresh:
+        conn.execute(f"INSERT INTO {table} {delta};")
+        return
+    on = " AND ".join(f"t.{c} = d.{c}" for c in key_columns)
+    conn.execute(f"""MERGE INTO {table} t USING ({delta}) d ON {on}
+                     WHEN MATCHED THEN UPDATE SET feature_count = t.feature_count + d.feature_count,
+                                                  area = t.area + d.area
+                     WHEN NOT MATCHED THEN INSERT BY NAME;""")
+
+def _add_stats(conn, keys_table, sign):
+    # Adds (sign=1) or subtracts (sign=-1) the stored features listed in keys_table (osm_type, osm_id)
+    # to the summary tables; keys_table=None takes every feature
+    cell_size = _stats_cell_size(conn)
+    where = "" if keys_table is None else f"""AND EXISTS (SELECT 1 FROM {keys_table} k
+                                                          WHERE k.osm_type = l.osm_type AND k.osm_id = l.osm_id)"""
+    # rows ordered by cell so bbox range queries skip most row groups
+    _merge_stats(conn, "landuse_stats_by_cell", ["cell_x", "cell_y", "landuse_type", "osm_type"],
+                 f"""SELECT {_cell_sql("l.minx", "l.maxx", cell_size)} AS cell_x,
+                            {_cell_sql("l.miny", "l.maxy", cell_size)} AS cell_y,
+                            {LANDUSE_TYPE_SQL} AS landuse_type, l.osm_type, {sign} * count(*) AS feature_count,
+                            {sign} * coalesce(sum(l.area), 0) AS area
+                     FROM landuse_by_h3 l
+                     WHERE {LANDUSE_TYPE_SQL} IS NOT NULL AND l.minx IS NOT NULL {where}
+                     GROUP BY ALL
+                     ORDER BY cell_x, cell_y""", keys_table is None)
+    if _table_exists(conn, "landuse_stats_boundaries"):
+        # area of features crossing a state border is split by the share of the geometry inside
+        _merge_stats(conn, "landuse_stats_by_state", ["bundesland", "landuse_type", "osm_type"],
+                     f"""SELECT b.bundesland, {LANDUSE_TYPE_SQL} AS landuse_type, l.osm_type,
+                                {sign} * count(*) AS feature_count,
+                                {sign} * coalesce(sum(l.area * CASE WHEN l.area IS NULL OR
+                                                                         ST_ContainsProperly(b.geometry, l.geometry)
+                                                                    THEN 1
+                                                                    ELSE ST_Area(ST_Intersection(l.geometry, b.geometry))
+                                                                         / nullif(ST_Area(l.geometry), 0) END), 0) AS area
+                         FROM landuse_by_h3 l
+                         JOIN landuse_stats_boundaries b
+                           ON l.maxx >= b.minx AND l.minx <= b.maxx AND l.maxy >= b.miny AND l.miny <= b.maxy
+                          AND ST_Intersects(l.geometry, b.geometry)
+                         WHERE {LANDUSE_TYPE_SQL} IS NOT NULL {where}
+                         GROUP BY ALL""", keys_table is None)
+    if sign < 0:
+        conn.execute("""DELETE FROM landuse_stats_by_cell WHERE feature_count <= 0;
+                        DELETE FROM landuse_stats_by_state WHERE feature_count <= 0;""")
+
+def refresh_landuse_stats(boundaries=None, cell_size=STATS_CELL_SIZE):
+    # Rebuilds the summary tables from the whole store (after a bulk ingest). boundaries: DataFrame
+    # with bundesland, minx, miny, maxx, maxy and geometry as WKB; None keeps the stored ones
+    conn = get_connection()
+    conn.execute("BEGIN TRANSACTION;")
+    try:
+        conn.execute("""CREATE TABLE IF NOT EXISTS store_meta(key VARCHAR PRIMARY KEY, value VARCHAR);
+                        CREATE OR REPLACE TABLE landuse_stats_by_state(
+                         bundesland VARCHAR,
+                         landuse_type VARCHAR,
+                         osm_type VARCHAR,
+                         feature_count BIGINT,
+                         area DOUBLE);
+                        CREATE OR REPLACE TABLE landuse_stats_by_cell(
+                         cell_x INTEGER,
+                         cell_y INTEGER,
+                         landuse_type VARCHAR,
+                         osm_type VARCHAR,
+                         feature_count BIGINT,
+                         area DOUBLE);""")
+        if boundaries is not None:
+            conn.register("boundaries_view", boundaries)
+            conn.execute("""CREATE OR REPLACE TABLE landuse_stats_boundaries AS
+                            SELECT bundesland, minx, miny, maxx, maxy, ST_GeomFromWKB(geometry) AS geometry
+                            FROM boundaries_view;""")
+            conn.unregister("boundaries_view")
+        conn.execute("INSERT OR REPLACE INTO store_meta VALUES ('stats_cell_size', ?);", [str(float(cell_size))])
+        _add_stats(conn, None, 1)
+        conn.execute("COMMIT;")
+    except Exception:
+        conn.execute("ROLLBACK;")
+        raise
+    finally:
+        conn.close()
+
+def has_landuse_stats():
+    conn = get_connection()
+    exists = _table_exists(conn, "landuse_stats_by_cell")
+    conn.close()
+    return exists
+
+def adjust_landuse_stats(keys, sign):
+    # Incremental upkeep around feature upserts: subtract the old versions of keys before they are
+    # deleted, add the new ones after they are inserted. No-op for stores without statistics.
+    conn = get_connection()
+    if _table_exists(conn, "landuse_stats_by_cell"):
+        _keys_view(conn, keys)
+        _add_stats(conn, "keys_view", sign)
+        conn.unregister("keys_view")
+    conn.close()
+
+def get_state_stats(bundesland, landuse_type, geometry_type):
+    # landuse_type, feature_count, area per landuse type of one state
+    clauses, params = _landuse_filters(landuse_type, geometry_type, "landuse_type")
+    conn = get_connection()
+    query = f"""SELECT landuse_type, sum(feature_count) AS feature_count, sum(area) AS area
+                FROM landuse_stats_by_state
+                WHERE lower(bundesland) = lower(?) AND {" AND ".join(clauses)}
+                GROUP BY landuse_type
+                ORDER BY area DESC, landuse_type;"""
+    result = conn.execute(query, [bundesland, *params]).df()
     conn.close()
     return result
 
+def _cell_range(low, high, cell_size):
+    # first and last cell touching [low, high], at least one; edges on a grid line (up to float
+    # noise, 13.3 / 0.01 is 1329.999...) do not pull in the neighbouring cell
+    first = math.floor(round(low / cell_size, 9))
+    last = math.ceil(round(high / cell_size, 9)) - 1
+    return first, max(first, last)
+
+def get_bounds_stats(bounds, landuse_type, geometry_type):
+    # Answered from the grid cells alone: the cells bounds touches, so the counted extent is
+    # bounds grown to the grid (returned as cell_bounds with the rows)
+    clauses, params = _landuse_filters(landuse_type, geometry_type, "landuse_type")
+    min_x, min_y, max_x, max_y = (float(v) for v in bounds)
+
+    conn = get_connection()
+    cell_size = _stats_cell_size(conn)
+    x0, x1 = _cell_range(min_x, max_x, cell_size)
+    y0, y1 = _cell_range(min_y, max_y, cell_size)
+    query = f"""SELECT landuse_type, sum(feature_count) AS feature_count, sum(area) AS area
+                FROM landuse_stats_by_cell
+                WHERE cell_x BETWEEN ? AND ? AND cell_y BETWEEN ? AND ? AND {" AND ".join(clauses)}
+                GROUP BY landuse_type
+                ORDER BY area DESC, landuse_type;"""
+    result = conn.execute(query, [x0, x1, y0, y1, *params]).df()
+    conn.close()
+    cell_bounds = (x0 * cell_size, y0 * cell_size, (x1 + 1) * cell_size, (y1 + 1) * cell_size)
+    return result, cell_bounds
+
 def clip_landuse_by_bundesland(bundesland):
     conn = get_connection()
-    query =  """SELECT ST_Intersection(l.geometry, b.geometry) AS clipped_geom,l.landuse_type
+    # the state's bbox is looked up first so the landuse side is an indexed range scan
+    bounds = conn.execute("SELECT minx, miny, maxx, maxy FROM bundesland WHERE bundesland = ?;",
+                          [bundesland]).fetchone()
+    if bounds is None:
+        conn.close()
+        return pd.DataFrame(columns=["clipped_geom", "landuse_type"])
+    # features entirely inside the state are returned as they are, only crossing ones are intersected
+    query = f"""SELECT ST_AsWKB(CASE WHEN ST_ContainsProperly(b.geometry, l.geometry) THEN l.geometry
+                                     ELSE ST_Intersection(l.geometry, b.geometry) END) AS clipped_geom,
+                       {LANDUSE_TYPE_SQL} AS landuse_type
                 FROM landuse_by_h3 l
-                JOIN bundesland b
+                JOIN bundesland b ON ST_Intersects(l.geometry, b.geometry)
                 WHERE b.bundesland = ?
-                AND ST_Intersects(l.geometry, b.geometry);
+                AND ST_Intersects(l.geometry, {_envelope_sql(bounds)});
             """
-    result = conn.execute(query,[bundesland]).df()
+    result = conn.execute(query, [bundesland]).df()
     conn.close()
     return result
 
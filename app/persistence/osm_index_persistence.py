@@ -0,0 +1,154 @@
+from app.config.config_db import get_connection
+
+import contextlib
+import pandas as pd
+
+# Way node lists, relation members and node locations of everything the landuse store was built
+# from, so OSM change files can be applied without a full re-ingest
+
+def create_osm_index_tables(replace=False):
+    conn = get_connection()
+    if replace:
+        conn.execute("DROP TABLE IF EXISTS osm_nodes; DROP TABLE IF EXISTS osm_way_nodes; "
+                      "DROP TABLE IF EXISTS osm_relation_members;")
+    query = """CREATE TABLE IF NOT EXISTS osm_nodes(
+                id BIGINT PRIMARY KEY,
+                lon DOUBLE,
+                lat DOUBLE);
+               CREATE TABLE IF NOT EXISTS osm_way_nodes(
+                way_id BIGINT,
+                seq INTEGER,
+                node_id BIGINT);
+               CREATE TABLE IF NOT EXISTS osm_relation_members(
+                relation_id BIGINT,
+                seq INTEGER,
+                member_type VARCHAR,
+                member_id BIGINT,
+                role VARCHAR);"""
+    conn.execute(query)
+    conn.close()
+
+def create_osm_index_indexes():
+    # reverse lookups for updates: which ways use a node, which relations use a way
+    conn = get_connection()
+    conn.execute("""CREATE INDEX IF NOT EXISTS osm_way_nodes_way_idx ON osm_way_nodes (way_id);
+                    CREATE INDEX IF NOT EXISTS osm_way_nodes_node_idx ON osm_way_nodes (node_id);
+                    CREATE INDEX IF NOT EXISTS osm_relation_members_relation_idx ON osm_relation_members (relation_id);
+                    CREATE INDEX IF NOT EXISTS osm_relation_members_member_idx ON osm_relation_members (member_id);""")
+    conn.close()
+
+def has_osm_index():
+    conn = get_connection()
+    count = conn.execute("""SELECT count(*) FROM information_schema.tables
+                            WHERE table_name IN ('osm_nodes', 'osm_way_nodes', 'osm_relation_members');""").fetchone()[0]
+    conn.close()
+    return count == 3
+
+@contextlib.contextmanager
+def store_transaction():
+    # every persistence call of this thread runs on the same pooled cursor, so they all join it
+    conn = get_connection()
+    conn.execute("BEGIN TRANSACTION;")
+    try:
+        yield
+    except Exception:
+        conn.execute("ROLLBACK;")
+        raise
+    else:
+        conn.execute("COMMIT;")
+    finally:
+        conn.close()
+
+def upsert_node_locations(df):
+    # df: id, lon, lat
+    if df.empty:
+        return
+    df = df.drop_duplicates("id", keep="last")
+    conn = get_connection()
+    conn.register("nodes_view", df)
+    conn.execute("INSERT OR REPLACE INTO osm_nodes SELECT id, lon, lat FROM nodes_view;")
+    conn.unregister("nodes_view")
+    conn.close()
+
+def delete_node_locations(ids):
+    _delete_ids("osm_nodes", "id", ids)
+
+def add_way_nodes(df):
+    # df: way_id, seq, node_id
+    _insert("osm_way_nodes", df, ["way_id", "seq", "node_id"])
+
+def add_relation_members(df):
+    # df: relation_id, seq, member_type ('n'/'w'/'r'), member_id, role
+    _insert("osm_relation_members", df, ["relation_id", "seq", "member_type", "member_id", "role"])
+
+def replace_way_nodes(way_ids, df):
+    # df holds the new versions of way_ids; ways that are no longer tracked have no rows
+    _delete_ids("osm_way_nodes", "way_id", way_ids)
+    add_way_nodes(df)
+
+def replace_relation_members(relation_ids, df):
+    _delete_ids("osm_relation_members", "relation_id", relation_ids)
+    add_relation_members(df)
+
+def _insert(table, df, columns):
+    if df.empty:
+        return
+    conn = get_connection()
+    conn.register("rows_view", df)
+    names = ", ".join(columns)
+    conn.execute(f"INSERT INTO {table} ({names}) SELECT {names} FROM rows_view;")
+    conn.unregister("rows_view")
+    conn.close()
+
+def _delete_ids(table, column, ids):
+    ids = list(ids)
+    if not ids:
+        return
+    conn = get_connection()
+    conn.register("ids_view", pd.DataFrame({"id": pd.Series(ids, dtype="int64")}))
+    conn.execute(f"DELETE FROM {table} WHERE {column} IN (SELECT id FROM ids_view);")
+    conn.unregister("ids_view")
+    conn.close()
+
+def _select_by_ids(query, ids):
+    conn = get_connection()
+    conn.register("ids_view", pd.DataFrame({"id": pd.Series(list(ids), dtype="int64")}))
+    result = conn.execute(query).df()
+    conn.unregister("ids_view")
+    conn.close()
+    return result
+
+def get_known_nodes(ids):
+    return set(_select_by_ids("SELECT id FROM osm_nodes WHERE id IN (SELECT id FROM ids_view);", ids)["id"])
+
+def get_ways_using_nodes(node_ids):
+    return set(_select_by_ids("""SELECT DISTINCT way_id FROM osm_way_nodes
+                                 WHERE node_id IN (SELECT id FROM ids_view);""", node_ids)["way_id"])
+
+def get_member_ways(way_ids):
+    # the given ways that are members of a tracked relation
+    return set(_select_by_ids("""SELECT DISTINCT member_id FROM osm_relation_members
+                                 WHERE member_type = 'w' AND member_id IN (SELECT id FROM ids_view);""",
+                              way_ids)["member_id"])
+
+def get_relations_using_ways(way_ids):
+    return set(_select_by_ids("""SELECT DISTINCT relation_id FROM osm_relation_members
+                                 WHERE member_type = 'w' AND member_id IN (SELECT id FROM ids_view);""",
+                              way_ids)["relation_id"])
+
+def get_relation_member_ways(relation_ids):
+    return set(_select_by_ids("""SELECT DISTINCT member_id FROM osm_relation_members
+                                 WHERE member_type = 'w' AND relation_id IN (SELECT id FROM ids_view);""",
+                              relation_ids)["member_id"])
+
+def get_way_coordinates(way_ids):
+    # way_id, seq, node_id, lon, lat in node order; lon/lat are NULL for nodes without a known location
+    return _select_by_ids("""SELECT w.way_id, w.seq, w.node_id, n.lon, n.lat
+                             FROM osm_way_nodes w LEFT JOIN osm_nodes n ON n.id = w.node_id
+                             WHERE w.way_id IN (SELECT id FROM ids_view)
+                             ORDER BY w.way_id, w.seq;""", way_ids)
+
+def get_relation_members(relation_ids):
+    return _select_by_ids("""SELECT relation_id, seq, member_type, member_id, role FROM osm_relation_members
+                             WHERE relation_id IN (SELECT id FROM ids_view)
+                             ORDER BY relation_id, seq;""", relation_ids)
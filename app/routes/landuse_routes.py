@@ -1,8 +1,17 @@
 from flask import send_file, request, jsonify, Response
 from flask_restx import Namespace, Resource
 from app.services.landuse_service import normalize_landuse_data, normalize_bundesland_landuse
-from app.services.file_export_service import export_formats
-from app.services.tiles_export_service import generate_pmtiles
+from app.services.file_export_service import EXPORT_WRITERS
+from app.services.artifact_cache_service import snap_bbox, artifact_key, cached_artifact, export_artifact
+from app.services.tiles_export_service import get_or_build_pmtiles
+from app.services.local_store_service import local_store_covers
+from app.services.landuse_stats_service import landuse_stats
+from app.services.vector_tile_service import get_vector_tile
+from app.services.pmtiles_service import pmtiles_version
+from app.services.job_service import get_job_manager
+from app.utils.boundary_registry import get_boundary_registry
+from app.config.config_export import MVT_MIN_ZOOM, MVT_MAX_ZOOM
+from urllib.parse import urlencode
 import geopandas as gpd
 import os
 from pathlib import Path
@@ -10,55 +19,216 @@ APP_DIR = Path(__file__).resolve().parents[1]
 STATIC_DIR = APP_DIR / "static" / "tiles"
 
 landuse_ns = Namespace("landuse", description="Landuse Queries")
-        
+
+NO_FEATURES = {"message": "No landuse features found for the selected options"}
+
+def _request_area(args):
+    # (area, bounds) from the bbox or bundesland argument, (None, None) without either.
+    # bbox values are snapped so nearby requests share cached results; raises ValueError on a bad bbox.
+    bbox_str = args.get("bbox")
+    bundesland = args.get("bundesland")
+    if bbox_str:
+        bbox = snap_bbox(tuple(map(float, bbox_str.split(","))))
+        return ("bbox", bbox), (bbox[1], bbox[0], bbox[3], bbox[2])
+    if bundesland:
+        boundary = get_boundary_registry().geometry(bundesland)
+        return ("bundesland", bundesland), (boundary.bounds if boundary is not None else None)
+    return None, None
+
+def _load_area(area, landuse_type, geometry_type):
+    # (df, lost), lost > 0 when tiles or cells of the area could not be fetched
+    if area[0] == "bbox":
+        return normalize_landuse_data(area[1], landuse_type, geometry_type)
+    return normalize_bundesland_landuse(area[1], landuse_type, geometry_type)
+
+def _area_args(area):
+    # the request arguments _request_area reads the area back from
+    kind, value = area
+    return {kind: ",".join(map(str, value)) if kind == "bbox" else value}
+
+def _vector_tiles(area, bounds, landuse_type, geometry_type):
+    # Areas in the local store are tiled on demand, the map shows the first tiles right away.
+    # The tile URL carries the area, tiles only show features of the state or bbox asked for.
+    if bounds is None or not local_store_covers(bounds):
+        return None
+    query = urlencode({"landuse_type": landuse_type or "all", "geometry": geometry_type or "", **_area_args(area)})
+    return {"tiles_url": f"/landuse/tiles/{{z}}/{{x}}/{{y}}.mvt?{query}",
+            "minzoom": MVT_MIN_ZOOM, "maxzoom": MVT_MAX_ZOOM, "bounds": list(bounds)}
+
+def _pmtiles_url(pmtiles_path):
+    return f"/static/tiles/{Path(pmtiles_path).name}?v={pmtiles_version(pmtiles_path)}"
+
 @landuse_ns.route("/filter")
 class LanduseFilter(Resource):
     def get(self):
         landuse_type = request.args.get("landuse_type")
         geometry_type = request.args.get("geometry")
-        bbox_str = request.args.get("bbox")
-        bundesland = request.args.get("bundesland")
-
-        if bbox_str:
-            try:
-                bbox = tuple(map(float, bbox_str.split(",")))
-            except ValueError:
-                return {"error": "Invalid bbox format"}, 400
-            df = normalize_landuse_data(bbox, landuse_type, geometry_type)
-        elif bundesland:
-            from app.services.landuse_service import normalize_bundesland_landuse
-            df = normalize_bundesland_landuse(bundesland, landuse_type, geometry_type)
-        else:
+
+        try:
+            area, bounds = _request_area(request.args)
+        except ValueError:
+            return {"error": "Invalid bbox format"}, 400
+        if area is None:
             return {"error": "Missing bbox or bundesland"}, 400
 
-        if df.empty:
-            return {"message": "No landuse features found for the selected options"}, 400
+        tiles = _vector_tiles(area, bounds, landuse_type, geometry_type)
+        if tiles is not None:
+            return tiles
+
+        # Generate PMTiles, or reuse the archive of an identical filter
+        key = artifact_key(area, landuse_type, geometry_type, "pmtiles")
+        pmtiles_path = get_or_build_pmtiles(key, lambda: _load_area(area, landuse_type, geometry_type))
+        if pmtiles_path is None:
+            return NO_FEATURES, 400
+
+        return {"pmtiles_url": _pmtiles_url(pmtiles_path)}
+
+@landuse_ns.route("/stats")
+class LanduseStats(Resource):
+    def get(self):
+        # Feature count and area (web-mercator m², like the feature "area" property) per landuse_type,
+        # answered from the summary tables of the local store. States count every feature that
+        # intersects them with the area inside; a bbox adds up the grid cells it covers (cell_bounds) and
+        # counts each feature in the cell of its bbox centre.
+        landuse_type = request.args.get("landuse_type")
+        geometry_type = request.args.get("geometry")
 
-        # Generate PMTiles
-        pmtiles_path = generate_pmtiles(df)
-        pmtiles_url = f"/static/tiles/{Path(pmtiles_path).name}"
+        try:
+            area, bounds = _request_area(request.args)
+        except ValueError:
+            return {"error": "Invalid bbox format"}, 400
+        if area is None:
+            return {"error": "Missing bbox or bundesland"}, 400
+        if bounds is None or not local_store_covers(bounds):
+            return {"error": "No local landuse data for this area"}, 404
 
-        return {"pmtiles_url": pmtiles_url}
+        stats = landuse_stats(area, bounds, landuse_type, geometry_type)
+        if stats is None:
+            return {"error": "Landuse statistics have not been built yet"}, 503
+        return stats
+
+@landuse_ns.route("/tiles/<int:z>/<int:x>/<int:y>.mvt")
+class LanduseVectorTile(Resource):
+    def get(self, z, x, y):
+        landuse_type = request.args.get("landuse_type", "all")
+        geometry_type = request.args.get("geometry", "")
+
+        try:
+            area, _ = _request_area(request.args)
+            data, etag = get_vector_tile(z, x, y, landuse_type, geometry_type, area)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        if not data:
+            return Response(status=204)
+        response = Response(data, mimetype="application/vnd.mapbox-vector-tile")
+        response.set_etag(etag)
+        # tiles only change with the data version, which is part of the ETag
+        response.headers["Cache-Control"] = "public, max-age=300"
+        return response.make_conditional(request)
 
 @landuse_ns.route("/download")
 class LanduseDownload(Resource):
     def get(self):
+        # GeoJSON, CSV and GeoParquet are streamed batch by batch; shapefile and FlatGeobuf exports
+        # are written to a temp dir in full first (stream_shapefile_zip, stream_flatgeobuf)
         landuse_type = request.args.get("landuse_type", "all")
         geometry_type = request.args.get("geometry_type", "")
         format = request.args.get("format", "").lower()
-        bbox_str = request.args.get("bbox")
-        bundesland = request.args.get("bundesland")
-
-        if bbox_str:
-            bbox = tuple(map(float, bbox_str.split(",")))
-            df = normalize_landuse_data(bbox, landuse_type,geometry_type)
-        elif bundesland:
-            df = normalize_bundesland_landuse(bundesland, landuse_type,geometry_type)
-        else:
+
+        if format not in EXPORT_WRITERS:
+            return {"error": f"Unsupported format {format}"}, 400
+
+        try:
+            area, _ = _request_area(request.args)
+        except ValueError:
+            return {"error": "Invalid bbox format"}, 400
+        if area is None:
             return {"error": "Missing bbox or bundesland"}, 400
 
+        # finished exports are served from disk with ETag, 304 and Range support
+        key = artifact_key(area, landuse_type, geometry_type, format)
+        cached = cached_artifact(key, format)
+        if cached is not None:
+            return cached
+
+        df, lost = _load_area(area, landuse_type, geometry_type)
         if df.empty:
-            return {"message": "No landuse features found for the selected options"}, 400
+            return NO_FEATURES, 400
+
+        # an incomplete result is sent once and not kept under the filter's key
+        if lost:
+            print(f"{lost} tiles or cells missing, the download is not cached")
+            key = None
+        return export_artifact(df, key, format)
+
+@landuse_ns.route("/jobs")
+class LanduseJobs(Resource):
+    def post(self):
+        # Long-running filters/downloads (mostly bundeslaender) as background jobs:
+        # kind=filter|download plus the arguments of /filter or /download
+        args = request.get_json(silent=True) or request.args
+        kind = args.get("kind", "filter")
+        landuse_type = args.get("landuse_type", "all")
+        geometry_type = args.get("geometry_type", args.get("geometry", ""))
+        format = (args.get("format") or "").lower() or None
+
+        if kind not in ("filter", "download"):
+            return {"error": f"Unsupported job kind {kind}"}, 400
+        if kind == "download" and format not in EXPORT_WRITERS:
+            return {"error": f"Unsupported format {format}"}, 400
+        try:
+            area, bounds = _request_area(args)
+        except ValueError:
+            return {"error": "Invalid bbox format"}, 400
+        if area is None:
+            return {"error": "Missing bbox or bundesland"}, 400
+
+        if kind == "filter":
+            tiles = _vector_tiles(area, bounds, landuse_type, geometry_type)
+            if tiles is not None:
+                return tiles
+        key = artifact_key(area, landuse_type, geometry_type, format if kind == "download" else "pmtiles")
+        if kind == "download" and key is None:
+            return {"error": "Downloads cannot be prepared right now"}, 503
+
+        job, attached = get_job_manager().submit(key, kind, area, landuse_type, geometry_type, format)
+        return {"job_id": job.id, "status_url": f"/landuse/jobs/{job.id}", "attached": attached}, 202
+
+def _job_info(job):
+    info = job.to_dict()
+    info["status_url"] = f"/landuse/jobs/{job.id}"
+    result = info.pop("result", None)
+    if result is None:
+        return info
+    if job.kind == "filter":
+        if result["pmtiles_path"] is None:
+            info.update(NO_FEATURES)
+        else:
+            info["pmtiles_url"] = _pmtiles_url(result["pmtiles_path"])
+    elif result["empty"]:
+        info.update(NO_FEATURES)
+    else:
+        params = job.params
+        query = {**_area_args((params["area"], params["value"])),
+                 "landuse_type": params["landuse_type"], "geometry_type": params["geometry_type"],
+                 "format": params["format"]}
+        info["download_url"] = f"/landuse/download?{urlencode(query)}"
+        if result.get("incomplete"):
+            # some tiles or cells failed, the download fetches them again instead of a cached file
+            info["incomplete"] = True
+    return info
 
-        return export_formats(df, format)         
+@landuse_ns.route("/jobs/<string:job_id>")
+class LanduseJob(Resource):
+    def get(self, job_id):
+        job = get_job_manager().get(job_id)
+        if job is None:
+            return {"error": f"Job {job_id} not found"}, 404
+        return _job_info(job)
 
+    def delete(self, job_id):
+        job = get_job_manager().cancel(job_id)
+        if job is None:
+            return {"error": f"Job {job_id} not found"}, 404
+        return _job_info(job)
@@ -0,0 +1,124 @@
+from app.services.file_export_service import EXPORT_WRITERS, export_chunks, export_response
+from app.persistence.landuse_persistence import get_data_version
+from app.utils.disk_cache import DiskCache
+from app.config.config_export import (ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_TTL, ARTIFACT_CACHE_MAX_BYTES,
+                                      ARTIFACT_BBOX_SNAP)
+
+import hashlib
+import json
+import math
+import threading
+import geopandas as gpd
+from flask import send_file
+
+artifact_cache = DiskCache(ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_TTL, ARTIFACT_CACHE_MAX_BYTES,
+                           suffix=".artifact", compress=False)
+
+# strong ETags are content hashes; remembered per (path, mtime, size) so a file is hashed at most once
+_etags = {}
+_etags_lock = threading.Lock()
+
+def snap_bbox(bbox, step=ARTIFACT_BBOX_SNAP):
+    # (south, west, north, east) snapped outward, the download covers at least the requested area.
+    # Idempotent: the quotient is rounded first so snapped values do not drift a step on float noise.
+    south, west, north, east = bbox
+    digits = max(0, -math.floor(math.log10(step))) + 2
+    down = lambda v: round(math.floor(round(v / step, 6)) * step, digits)
+    up = lambda v: round(math.ceil(round(v / step, 6)) * step, digits)
+    return (down(south), down(west), up(north), up(east))
+
+def artifact_key(area, landuse_type, geometry_type, format):
+    # area: ("bbox", snapped bbox) or ("bundesland", name). None when the data version is unknown.
+    try:
+        version = get_data_version()
+    except Exception as e:
+        print(f"Data version unavailable, download is not cached: {e}")
+        return None
+    value = area[1].lower() if isinstance(area[1], str) else area[1]
+    parts = [area[0], value, str(landuse_type).lower(), str(geometry_type).lower(), format, version]
+    return DiskCache.key(json.dumps(parts, default=str))
+
+def _stat_key(path):
+    stat = path.stat()
+    return (str(path), stat.st_mtime_ns, stat.st_size)
+
+def _remember_etag(path, etag):
+    with _etags_lock:
+        _etags[_stat_key(path)] = etag
+
+def _file_etag(path):
+    stat_key = _stat_key(path)
+    with _etags_lock:
+        etag = _etags.get(stat_key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        etag = digest.hexdigest()
+        with _etags_lock:
+            _etags[stat_key] = etag
+    return etag
+
+def cached_artifact(key, format):
+    # send_file answers If-None-Match with 304 and Range/If-Range with 206 (or 416)
+    if key is None:
+        return None
+    path = artifact_cache.lookup(key)
+    if path is None:
+        return None
+    _, mimetype, filename = EXPORT_WRITERS[format]
+    try:
+        # send_file resolves relative paths against the app root, not the working directory
+        response = send_file(path.resolve(), mimetype=mimetype, as_attachment=True, download_name=filename,
+                             conditional=True, etag=_file_etag(path))
+    except FileNotFoundError:
+        # evicted between lookup and open
+        return None
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def _tee(chunks, writer):
+    # The first download streams to the client and into the cache at the same time; an aborted
+    # download (GeneratorExit) or a failing writer leaves nothing behind
+    digest = hashlib.sha256()
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+            digest.update(chunk)
+            yield chunk
+    except BaseException:
+        writer.discard()
+        raise
+    path = writer.commit()
+    _remember_etag(path, digest.hexdigest())
+
+def export_artifact(df, key, format):
+    if not isinstance(df, gpd.GeoDataFrame):
+        df = gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
+    chunks = export_chunks(df, format)
+    if key is not None:
+        chunks = _tee(chunks, artifact_cache.writer(key))
+    response = export_response(chunks, format)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def build_artifact(df, key, format, cancel=None):
+    # Writes the export straight into the artifact cache (background jobs), no client attached
+    if not isinstance(df, gpd.GeoDataFrame):
+        df = gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
+    writer = artifact_cache.writer(key)
+    digest = hashlib.sha256()
+    try:
+        for chunk in export_chunks(df, format):
+            if cancel is not None and cancel.is_set():
+                writer.discard()
+                return None
+            writer.write(chunk)
+            digest.update(chunk)
+    except BaseException:
+        writer.discard()
+        raise
+    path = writer.commit()
+    _remember_etag(path, digest.hexdigest())
+    return path
@@ -0,0 +1,115 @@
+from app.services.landuse_by_bundesland_service import fetch_overpass_file, OverpassOverloaded, _process_pool
+from app.utils.overpass_query import build_overpass_query
+from app.utils.utils import parse_overpass_file, tiles_for_bounds, tile_bounds, empty_landuse_frame
+from app.utils.disk_cache import DiskCache
+from app.config.config_overpass import (BBOX_TILE_ZOOM, BBOX_MAX_TILES, BBOX_TILE_CACHE_DIR,
+                                        BBOX_TILE_CACHE_MAX_BYTES, OVERPASS_CACHE_TTL, PARSE_WORKERS)
+
+import asyncio
+import io
+import aiohttp
+import pandas as pd
+from concurrent.futures.process import BrokenProcessPool
+import geopandas as gpd
+from shapely.geometry import box
+
+tile_cache = DiskCache(BBOX_TILE_CACHE_DIR, OVERPASS_CACHE_TTL, BBOX_TILE_CACHE_MAX_BYTES,
+                       suffix=".geoparquet", compress=False)
+
+def _tile_key(zoom, x, y, landuse_type, geometry_type):
+    return tile_cache.key(f"{zoom}/{x}/{y}|{landuse_type}|{geometry_type}")
+
+def choose_tile_zoom(bounds):
+    # large bboxes fall back to coarser tiles so a single request never fans out too far
+    zoom = BBOX_TILE_ZOOM
+    while zoom > 6 and len(tiles_for_bounds(bounds, zoom)) > BBOX_MAX_TILES:
+        zoom -= 1
+    return zoom
+
+def _read_tile(key):
+    path = tile_cache.lookup(key)
+    if path is None:
+        return None
+    try:
+        return gpd.read_parquet(path)
+    except (OSError, ValueError):
+        return None
+
+def _write_tile(key, gdf):
+    buffer = io.BytesIO()
+    gdf.to_parquet(buffer, index=False)
+    tile_cache.put(key, buffer.getvalue())
+
+async def _fetch_tiles(tiles, zoom, landuse_type, geometry_type, max_concurrent=5):
+    # (frames, failed): failed counts the tiles that could not be fetched or parsed
+    sem = asyncio.Semaphore(max_concurrent)
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=600)) as session:
+        queries = [build_overpass_query(box(*tile_bounds(x, y, zoom)), landuse_type, geometry_type)
+                   for x, y in tiles]
+        responses = await asyncio.gather(*(fetch_overpass_file(session, q, sem) for q in queries),
+                                         return_exceptions=True)
+
+    for path in responses:
+        if isinstance(path, BaseException) and not isinstance(path, (OverpassOverloaded, aiohttp.ClientError)):
+            raise path
+    fetched, failed = [], 0
+    for (x, y), path in zip(tiles, responses):
+        if path is None or isinstance(path, BaseException):
+            print(f"Tile {zoom}/{x}/{y} failed, it will be fetched again next time")
+            failed += 1
+        else:
+            fetched.append(((x, y), path))
+    if not fetched:
+        return [], failed
+
+    # parsing is CPU-bound, it runs in the parse processes and not under the web process's GIL
+    loop = asyncio.get_running_loop()
+    with _process_pool(min(PARSE_WORKERS, len(fetched))) as pool:
+        parsed = await asyncio.gather(*(loop.run_in_executor(pool, parse_overpass_file, path)
+                                        for _, path in fetched), return_exceptions=True)
+
+    frames = []
+    for ((x, y), _), gdf in zip(fetched, parsed):
+        if isinstance(gdf, (ValueError, BrokenProcessPool)):
+            print(f"Tile {zoom}/{x}/{y} skipped, its response could not be parsed: {gdf!r}")
+            failed += 1
+            continue
+        if isinstance(gdf, BaseException):
+            raise gdf
+        # empty tiles are cached too, otherwise empty areas would be queried on every request
+        await asyncio.to_thread(_write_tile, _tile_key(zoom, x, y, landuse_type, geometry_type), gdf)
+        frames.append(gdf)
+    return frames, failed
+
+def get_landuse_by_tiles(bbox, landuse_type, geometry_type):
+    # bbox in Overpass order (south, west, north, east), like the /landuse endpoints receive it.
+    # Returns (gdf, failed), failed is the number of tiles missing from gdf.
+    landuse_type = landuse_type.lower()
+    geometry_type = str(geometry_type).lower()
+    bounds = (bbox[1], bbox[0], bbox[3], bbox[2])
+    zoom = choose_tile_zoom(bounds)
+    tiles = tiles_for_bounds(bounds, zoom)
+
+    frames, missing = [], []
+    for x, y in tiles:
+        gdf = _read_tile(_tile_key(zoom, x, y, landuse_type, geometry_type))
+        if gdf is None:
+            missing.append((x, y))
+        else:
+            frames.append(gdf)
+    print(f"bbox → {len(tiles)} z{zoom} tiles, {len(tiles) - len(missing)} cached, {len(missing)} to fetch")
+
+    failed = 0
+    if missing:
+        fetched, failed = asyncio.run(_fetch_tiles(missing, zoom, landuse_type, geometry_type))
+        frames += fetched
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return empty_landuse_frame(), failed
+
+    gdf = pd.concat(frames, ignore_index=True)
+    # features crossing tile borders come back from every tile they touch
+    gdf = gdf.drop_duplicates(subset=["osm_type", "osm_id"]).reset_index(drop=True)
+    gdf = gdf[gdf.intersects(box(*bounds))].reset_index(drop=True)
+    return gpd.GeoDataFrame(gdf, geometry="geometry", crs="EPSG:4326"), failed
@@ -0,0 +1,128 @@
+from app.config.config_overpass import CLIP_WORKERS, CLIP_PIECE_VERTICES, CLIP_MIN_DEPTH, CLIP_PARALLEL_MIN
+
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import geopandas as gpd
+import shapely
+from shapely import STRtree
+
+INSIDE, CROSSING, OUTSIDE = 0, 1, 2
+
+class BoundaryPieces:
+    # The boundary cut into a quadtree (like ST_Subdivide): interior cells lie entirely inside the
+    # boundary and are plain boxes, edge pieces are small polygons with few vertices each. Cells are
+    # split at least min_depth times so even a coarse boundary gets interior boxes.
+
+    def __init__(self, boundary, max_vertices=CLIP_PIECE_VERTICES, min_depth=CLIP_MIN_DEPTH):
+        self.boundary = boundary
+        shapely.prepare(boundary)
+        interior, edge = [], []
+        stack = [(shapely.box(*boundary.bounds), 0)]
+        while stack:
+            cell, depth = stack.pop()
+            if boundary.contains(cell):
+                interior.append(cell)
+                continue
+            piece = shapely.intersection(boundary, cell)
+            if piece.is_empty or piece.area == 0:
+                continue
+            if depth >= min_depth and shapely.get_num_coordinates(piece) <= max_vertices:
+                edge.append(piece)
+            else:
+                min_x, min_y, max_x, max_y = cell.bounds
+                mid_x, mid_y = (min_x + max_x) / 2, (min_y + max_y) / 2
+                stack += [(q, depth + 1) for q in (
+                    shapely.box(min_x, min_y, mid_x, mid_y), shapely.box(mid_x, min_y, max_x, mid_y),
+                    shapely.box(min_x, mid_y, mid_x, max_y), shapely.box(mid_x, mid_y, max_x, max_y))]
+
+        self.interior = np.array(interior, dtype=object)
+        self.edge = np.array(edge, dtype=object)
+        shapely.prepare(self.edge)
+        self.interior_tree = STRtree(self.interior)
+        self.pieces = np.concatenate([self.interior, self.edge])
+        self.pieces_tree = STRtree(self.pieces)
+
+    def classify(self, geoms):
+        # INSIDE/CROSSING/OUTSIDE per geometry; most features sit inside an interior box and never
+        # touch the detailed boundary
+        result = np.full(len(geoms), CROSSING, dtype=np.int8)
+        if len(self.interior):
+            idx, _ = self.interior_tree.query(geoms, predicate="within")
+            result[np.unique(idx)] = INSIDE
+
+        rest = np.flatnonzero(result == CROSSING)
+        inside = shapely.contains_properly(self.boundary, geoms[rest])
+        result[rest[inside]] = INSIDE
+        rest = rest[~inside]
+        result[rest[~shapely.intersects(self.boundary, geoms[rest])]] = OUTSIDE
+        return result
+
+    def clip(self, geom):
+        # intersection with the boundary, assembled from the pieces the geometry overlaps
+        idx = self.pieces_tree.query(geom, predicate="intersects")
+        parts = [shapely.clip_by_rect(geom, *self.pieces[i].bounds) if i < len(self.interior)
+                 else shapely.intersection(geom, self.pieces[i]) for i in idx]
+        parts = [p for p in parts if not p.is_empty]
+        if not parts:
+            return None
+        if len(parts) == 1:
+            return parts[0]
+        polygonal = [p for p in parts if shapely.get_type_id(p) in (3, 6)]
+        if len(polygonal) == len(parts):
+            # the pieces don't overlap, so neither do the parts: coverage union only dissolves shared edges
+            return shapely.coverage_union_all(parts)
+        return shapely.line_merge(shapely.union_all(parts)) if shapely.get_type_id(geom) in (1, 5) \
+            else shapely.union_all(parts)
+
+@functools.lru_cache(maxsize=8)
+def _pieces_for(boundary_wkb, max_vertices):
+    return BoundaryPieces(shapely.from_wkb(boundary_wkb), max_vertices)
+
+def boundary_pieces(boundary, max_vertices=CLIP_PIECE_VERTICES):
+    # states are clipped against again and again, the quadtree is built once per boundary
+    return _pieces_for(shapely.to_wkb(boundary), max_vertices)
+
+_worker_pieces = None
+
+def _init_worker(boundary_wkb, max_vertices):
+    global _worker_pieces
+    _worker_pieces = _pieces_for(boundary_wkb, max_vertices)
+
+def _clip_chunk(wkbs):
+    return shapely.to_wkb(np.array([_worker_pieces.clip(g) for g in shapely.from_wkb(wkbs)], dtype=object))
+
+def _clip_parallel(geoms, boundary, max_vertices, workers):
+    try:
+        context = multiprocessing.get_context("forkserver")
+    except ValueError:
+        context = multiprocessing.get_context("spawn")
+    chunks = np.array_split(shapely.to_wkb(geoms), workers * 4)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(shapely.to_wkb(boundary), max_vertices)) as pool:
+        return shapely.from_wkb(np.concatenate(list(pool.map(_clip_chunk, chunks))))
+
+def clip_to_boundary(gdf, boundary, workers=CLIP_WORKERS, max_vertices=CLIP_PIECE_VERTICES):
+    # Same result as gdf.geometry.intersection(boundary) without the empty rows: features inside are
+    # kept as they are, outside ones dropped, only crossing ones are intersected (in parallel when many)
+    if gdf.empty:
+        return gdf
+    pieces = boundary_pieces(boundary, max_vertices)
+    geoms = np.asarray(gdf.geometry.values)
+    state = pieces.classify(geoms)
+
+    clipped = geoms.copy()
+    crossing = np.flatnonzero(state == CROSSING)
+    if workers > 1 and len(crossing) >= CLIP_PARALLEL_MIN:
+        clipped[crossing] = _clip_parallel(geoms[crossing], boundary, max_vertices, workers)
+    else:
+        clipped[crossing] = [pieces.clip(g) for g in geoms[crossing]]
+
+    keep = state != OUTSIDE
+    keep[crossing] &= ~shapely.is_missing(clipped[crossing]) & ~shapely.is_empty(clipped[crossing])
+    result = gdf[keep].copy()
+    result[gdf.geometry.name] = gpd.GeoSeries(clipped[keep], index=result.index, crs=gdf.crs)
+    print(f"✂️ Clipped {len(gdf)} features: {int((state == INSIDE).sum())} inside, {len(crossing)} crossing, "
+          f"{int((state == OUTSIDE).sum())} outside")
+    return result
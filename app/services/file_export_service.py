@@ -1,7 +1,177 @@
 import geopandas as gpd
-import io, os, tempfile, zipfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+import io, json, os, shutil, tempfile, zipfile
 from flask import Response
 
+EXPORT_BATCH_SIZE = 5000
+PARQUET_ROW_GROUP_SIZE = 50_000
+FILE_CHUNK_SIZE = 1 << 20
+# per-feature zoom range, written as the feature's "tippecanoe" member instead of properties
+TIPPECANOE_MINZOOM = "tippecanoe_minzoom"
+TIPPECANOE_MAXZOOM = "tippecanoe_maxzoom"
+
+class _StreamSink(io.RawIOBase):
+    # Write-only, unseekable file object whose content is drained into the response after every write
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _batches(df, size=EXPORT_BATCH_SIZE):
+    for start in range(0, len(df), size):
+        yield df.iloc[start:start + size]
+
+def _attachment(filename):
+    return {"Content-Disposition": f"attachment; filename={filename}"}
+
+def _properties(batch):
+    # one JSON object per row; NaN/NaT become null like in GDAL's GeoJSON output
+    props = pd.DataFrame(batch.drop(columns=batch.geometry.name))
+    if props.empty:
+        return ["{}"] * len(batch)
+    lines = props.to_json(orient="records", lines=True, force_ascii=False, double_precision=15,
+                          date_format="iso", default_handler=str)
+    return lines.rstrip("\n").split("\n")
+
+def _zoom_members(batch):
+    if TIPPECANOE_MINZOOM not in batch.columns or TIPPECANOE_MAXZOOM not in batch.columns:
+        return batch, [""] * len(batch)
+    members = [f', "tippecanoe": {{"minzoom": {int(lo)}, "maxzoom": {int(hi)}}}'
+               for lo, hi in zip(batch[TIPPECANOE_MINZOOM], batch[TIPPECANOE_MAXZOOM])]
+    return batch.drop(columns=[TIPPECANOE_MINZOOM, TIPPECANOE_MAXZOOM]), members
+
+def _feature_lines(batch):
+    # one GeoJSON Feature per string, no newlines inside
+    batch, zooms = _zoom_members(batch)
+    geometries = shapely.to_geojson(batch.geometry.values)
+    return [f'{{"type": "Feature"{zoom}, "properties": {props}, "geometry": {"null" if geometry is None else geometry}}}'
+            for zoom, props, geometry in zip(zooms, _properties(batch), geometries)]
+
+def stream_geojson(df):
+    yield b'{"type": "FeatureCollection", "features": [\n'
+    first = True
+    for batch in _batches(df):
+        chunk = ",\n".join(_feature_lines(batch))
+        yield ((",\n" if not first else "") + chunk).encode("utf-8")
+        first = False
+    yield b"\n]}\n"
+
+def stream_ndjson(df, columns=None):
+    # newline-delimited GeoJSON features, only `columns` as properties when given
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns] + [df.geometry.name]]
+    for batch in _batches(df):
+        yield ("\n".join(_feature_lines(batch)) + "\n").encode("utf-8")
+
+def stream_csv(df):
+    header = True
+    for batch in _batches(df):
+        yield batch.to_csv(index=False, header=header).encode("utf-8")
+        header = False
+
+def _geo_metadata(df):
+    # GeoParquet 1.0 metadata for the whole frame, every row group shares it
+    column = {
+        "encoding": "WKB",
+        "geometry_types": sorted(df.geometry.geom_type.dropna().unique().tolist()),
+    }
+    if len(df):
+        column["bbox"] = [float(v) for v in df.total_bounds]
+    if df.crs is not None:
+        column["crs"] = df.crs.to_json_dict()
+    return {"version": "1.0.0", "primary_column": df.geometry.name, "columns": {df.geometry.name: column}}
+
+def _arrow_batch(batch, schema):
+    table = pd.DataFrame(batch.drop(columns=batch.geometry.name))
+    table[batch.geometry.name] = shapely.to_wkb(batch.geometry.values)
+    return pa.Table.from_pandas(table, schema=schema, preserve_index=False)
+
+def stream_parquet(df):
+    geometry = df.geometry.name
+    attributes = pd.DataFrame(df.drop(columns=geometry))
+    schema = pa.Schema.from_pandas(attributes, preserve_index=False).append(pa.field(geometry, pa.binary()))
+    schema = schema.with_metadata({**(schema.metadata or {}), b"geo": json.dumps(_geo_metadata(df)).encode()})
+
+    sink = _StreamSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in _batches(df, PARQUET_ROW_GROUP_SIZE):
+            writer.write_table(_arrow_batch(batch, schema))
+            yield sink.drain()
+    # the footer is written on close
+    yield sink.drain()
+
+def _stream_file(path):
+    with open(path, "rb") as f:
+        while chunk := f.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+def stream_shapefile_zip(df):
+    # Not streamed record by record: the .shp/.shx headers carry the file length and extent, so OGR
+    # writes the whole shapefile into a temp dir first (as much disk as the export) and the first
+    # byte leaves only after that. The zip around the finished files is streamed.
+    tmpdir = tempfile.mkdtemp()
+    try:
+        df.to_file(os.path.join(tmpdir, "landuse.shp"))
+        sink = _StreamSink()
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
+            for fname in sorted(os.listdir(tmpdir)):
+                with zipf.open(fname, "w") as entry:
+                    for chunk in _stream_file(os.path.join(tmpdir, fname)):
+                        entry.write(chunk)
+                        yield sink.drain()
+        yield sink.drain()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+def stream_flatgeobuf(df):
+    # The FlatGeobuf spatial index needs every feature before the header can be written,
+    # so it goes through a temp file and is streamed from there
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, "landuse.fgb")
+        df.to_file(path, driver="FlatGeobuf")  # ✅ requires GDAL >= 3.1
+        yield from _stream_file(path)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+EXPORT_WRITERS = {
+    "geojson": (stream_geojson, "application/geo+json", "landuse.geojson"),
+    "shapefile": (stream_shapefile_zip, "application/zip", "landuse_shapefile.zip"),
+    "shp": (stream_shapefile_zip, "application/zip", "landuse_shapefile.zip"),
+    "parquet": (stream_parquet, "application/x-parquet", "landuse.parquet"),
+    "geoparquet": (stream_parquet, "application/x-parquet", "landuse.parquet"),
+    "fgb": (stream_flatgeobuf, "application/octet-stream", "landuse.fgb"),
+    "flatgeobuf": (stream_flatgeobuf, "application/octet-stream", "landuse.fgb"),
+    "csv": (stream_csv, "text/csv", "landuse.csv"),
+}
+
+def export_response(chunks, format: str):
+    _, mimetype, filename = EXPORT_WRITERS[format]
+    return Response(chunks, mimetype=mimetype, headers=_attachment(filename))
+
+def export_chunks(df, format: str):
+    writer, _, _ = EXPORT_WRITERS[format]
+    return writer(df)
+
 def export_formats(df, format: str):
     # 🔑 Ensure df is a GeoDataFrame with CRS set
     if not isinstance(df, gpd.GeoDataFrame):
@@ -9,64 +179,8 @@ def export_formats(df, format: str):
             return {"error": "No geometry column found"}, 400
         df = gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
 
-    # --- GEOJSON ---
-    if format == "geojson":
-        buffer = io.BytesIO()
-        df.to_file(buffer, driver="GeoJSON")
-        return Response(
-            buffer.getvalue(),
-            mimetype="application/geo+json",
-            headers={"Content-Disposition": "attachment; filename=landuse.geojson"}
-        )
-
-    # --- SHAPEFILE ---
-    elif format in ("shapefile", "shp"):
-        with tempfile.TemporaryDirectory() as tmpdir:
-            shapefile_path = os.path.join(tmpdir, "landuse.shp")
-            df.to_file(shapefile_path)   # ✅ GeoDataFrame
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, "w") as zipf:
-                for fname in os.listdir(tmpdir):
-                    fpath = os.path.join(tmpdir, fname)
-                    zipf.write(fpath, arcname=fname)
-            zip_buffer.seek(0)
-            return Response(
-                zip_buffer,
-                mimetype="application/zip",
-                headers={"Content-Disposition": "attachment; filename=landuse_shapefile.zip"}
-            )
-
-    # --- PARQUET / GEOPARQUET ---
-    elif format in ("parquet", "geoparquet"):
-        buffer = io.BytesIO()
-        df.to_parquet(buffer, engine="pyarrow")
-        buffer.seek(0)
-        return Response(
-            buffer,
-            mimetype="application/x-parquet",
-            headers={"Content-Disposition": "attachment; filename=landuse.parquet"}
-        )
-
-    # --- FLATGEOBUF ---
-    elif format in ("fgb", "flatgeobuf"):
-        buffer = io.BytesIO()
-        df.to_file(buffer, driver="FlatGeobuf")  # ✅ requires GDAL >= 3.1
-        buffer.seek(0)
-        return Response(
-            buffer,
-            mimetype="application/octet-stream",
-            headers={"Content-Disposition": "attachment; filename=landuse.fgb"}
-        )
-
-    # --- CSV ---
-    elif format == "csv":
-        buffer = io.StringIO()
-        df.to_csv(buffer, index=False)
-        return Response(
-            buffer.getvalue(),
-            mimetype="text/csv",
-            headers={"Content-Disposition": "attachment; filename=landuse.csv"}
-        )
-
-    else:
+    if format not in EXPORT_WRITERS:
         return {"error": f"Unsupported format {format}"}, 400
+
+    # the body is produced batch by batch while it is sent
+    return export_response(export_chunks(df, format), format)
@@ -0,0 +1,165 @@
+from app.services.landuse_service import normalize_landuse_data, normalize_bundesland_landuse
+from app.services.tiles_export_service import get_or_build_pmtiles
+from app.services.artifact_cache_service import build_artifact
+from app.config.config_export import JOB_WORKERS, JOB_RETENTION
+
+from concurrent.futures import ThreadPoolExecutor, CancelledError, wait
+import threading
+import time
+import uuid
+
+class JobCancelled(Exception):
+    pass
+
+def _check(cancel):
+    if cancel.is_set():
+        raise JobCancelled()
+
+def run_job(kind, area, landuse_type, geometry_type, format, key, progress, cancel, previous=None):
+    # Runs in a job thread. progress is the job's dict: the current stage plus the Overpass
+    # pipeline counters (cells/fetched/features/...), cancel an Event. previous is the future of an
+    # identical job that is still cancelling, it writes the same artifact and is left to stop first.
+    if previous is not None:
+        wait([previous])
+    _check(cancel)
+    progress["stage"] = "fetch"
+
+    def load_frame():
+        if area[0] == "bbox":
+            df, lost = normalize_landuse_data(area[1], landuse_type, geometry_type)
+        else:
+            df, lost = normalize_bundesland_landuse(area[1], landuse_type, geometry_type, report=progress,
+                                                    cancel=cancel)
+        _check(cancel)
+        progress["features"] = len(df)
+        progress["lost"] = lost
+        return df, lost
+
+    if kind == "filter":
+        def load_for_tiles():
+            loaded = load_frame()
+            progress["stage"] = "tile"
+            return loaded
+
+        pmtiles_path = get_or_build_pmtiles(key, load_for_tiles)
+        return {"pmtiles_path": pmtiles_path}
+
+    df, lost = load_frame()
+    if df.empty:
+        return {"empty": True}
+    if lost:
+        # nothing incomplete goes into the artifact cache, the download URL loads the area again
+        return {"empty": False, "incomplete": True}
+    progress["stage"] = "export"
+    build_artifact(df, key, format, cancel)
+    _check(cancel)
+    return {"empty": False}
+
+class Job:
+
+    def __init__(self, job_id, key, kind, params, progress, cancel):
+        self.id = job_id
+        self.key = key
+        self.kind = kind
+        self.params = params
+        self.progress = progress
+        self.cancel_event = cancel
+        self.future = None
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def status(self):
+        if self.future.cancelled():
+            return "cancelled"
+        if not self.future.done():
+            if self.cancel_event.is_set():
+                return "cancelling"
+            return "running" if self.future.running() else "queued"
+        error = self.future.exception()
+        if isinstance(error, JobCancelled):
+            return "cancelled"
+        return "failed" if error is not None else "done"
+
+    def to_dict(self):
+        status = self.status
+        info = {"job_id": self.id, "kind": self.kind, "status": status, "params": self.params,
+                "created": self.created}
+        info["progress"] = dict(self.progress)
+        if status == "failed":
+            info["error"] = str(self.future.exception())
+        elif status == "done":
+            info["result"] = self.future.result()
+        return info
+
+class JobManager:
+    # Jobs run in a bounded thread pool of the web process, not in job processes: they query the local
+    # store through the app's handle, which DuckDB lets only one process hold. The CPU-heavy steps leave
+    # the process: Overpass responses (states and bbox tiles) are parsed in the parse pool, large clips
+    # run in the clip pool, tiles are cut by tippecanoe. Export and zoom-level preparation stay in the
+    # job thread. Identical submissions attach to the running job.
+
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION):
+        self.workers = workers
+        self.retention = retention
+        self._jobs = {}
+        self._running = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _ensure_started(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+
+    def _expire(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.future.done() and now - (job.finished or now) > self.retention:
+                del self._jobs[job_id]
+
+    def _finished(self, job):
+        job.finished = time.time()
+        with self._lock:
+            if self._running.get(job.key) is job:
+                del self._running[job.key]
+
+    def submit(self, key, kind, area, landuse_type, geometry_type, format=None):
+        # returns (job, attached): attached is True when an identical job was already running
+        with self._lock:
+            self._ensure_started()
+            self._expire()
+            previous = self._running.get(key) if key else None
+            if previous is not None and not previous.cancel_event.is_set():
+                return previous, True
+
+            job_id = uuid.uuid4().hex
+            params = {"area": area[0], "value": area[1], "landuse_type": landuse_type,
+                      "geometry_type": geometry_type, "format": format}
+            job = Job(job_id, key, kind, params, {"stage": "queued"}, threading.Event())
+            job.future = self._pool.submit(run_job, kind, area, landuse_type, geometry_type, format, key,
+                                           job.progress, job.cancel_event,
+                                           previous.future if previous is not None else None)
+            self._jobs[job_id] = job
+            if key:
+                self._running[key] = job
+        job.future.add_done_callback(lambda _: self._finished(job))
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        # queued jobs never start, running ones stop at the next cell or stage boundary. The job keeps
+        # its key until it has stopped (_finished), a new identical submission waits for it.
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        job.future.cancel()
+        return job
+
+_job_manager = JobManager()
+
+def get_job_manager():
+    return _job_manager
@@ -1,8 +1,27 @@
-from app.utils.utils import load_bundesland_boundaries, choose_grid_size, split_polygon, parse_overpass_json_data
-from app.persistence.landuse_persistence import create_landuse_table, add_landuse_data, merge_geoparquet_files,clip_landuse_by_bundesland
+from app.utils.utils import (choose_grid_size, split_polygon, subdivide_cell, subdivide_to_depth, grid_cell_key,
+                             get_learned_depths, remember_depths, parse_overpass_file)
+from app.utils.overpass_stream import CHUNK_SIZE
+from app.utils.boundary_registry import get_boundary_registry
+from app.utils.overpass_cache import overpass_cache, overpass_cache_key, payload_remark
+from app.utils.overpass_query import build_overpass_query
+from app.utils.adaptive_limiter import AdaptiveLimiter
+from app.services.clip_service import clip_to_boundary
+from app.services.landuse_stats_service import ensure_stats
+from app.config.config_overpass import (OVERPASS_URL, OVERPASS_URLS, MAX_CELL_ELEMENTS, MAX_CELL_BYTES,
+                                        MIN_CELL_SIZE_DEG, OVERPASS_MAX_RETRIES, OVERPASS_BACKOFF_SECONDS,
+                                        PARSE_WORKERS)
+from app.persistence.landuse_persistence import (create_landuse_table, add_landuse_data, upgrade_landuse_table,
+                                                 create_landuse_index, get_landuse_by_bounds)
 
 import asyncio
 import aiohttp
+import itertools
+import json
+import math
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 import pandas as pd
 import geopandas as gpd
@@ -10,104 +29,271 @@ import uuid
 import time
 from shapely.geometry import Polygon, Point, LineString, box
 
-async def fetch_overpass_api(session, overpass_query, sem):
-    url = "https://overpass-api.de/api/interpreter"
+CELL_CACHE_DIR = Path("data/landuse_bundesland_cache")
+# cell files older than this that were never ingested are removed by the next ingest of the state
+CELL_FILE_MAX_AGE = 6 * 3600
+# parse pools replaced after a worker process died (OOM kill) before the whole run is given up
+MAX_POOL_RESTARTS = 3
+
+class OverpassOverloaded(Exception):
+    # The cell was too much for the server (timeout, 429/504, byte budget) and should be split
+    def __init__(self, reason, status=None, retry_after=None):
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = retry_after
+
+def _retry_after(resp):
+    try:
+        return float(resp.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+async def fetch_overpass_file(session, overpass_query, sem, url=OVERPASS_URL):
+    # Streams the response straight into the compressed cache and returns the cache file path,
+    # the payload is never held in memory. Raises OverpassOverloaded or returns None on failure.
+    key = overpass_cache_key(overpass_query)
+    cached_path = await asyncio.to_thread(overpass_cache.lookup, key)
+    if cached_path is not None:
+        return cached_path
+
     async with sem:
         start = time.time()
         print(f"➡️ Sending request at {start:.2f}: {overpass_query[:50]}...")
-        async with session.post(url, data={"data": overpass_query}, timeout=600) as resp:
-            if resp.status != 200:
-                print(f"Overpass API error {resp.status}")
-                return {"elements": []}
-            try:
+        writer = None
+        try:
+            async with session.post(url, data={"data": overpass_query}, timeout=600) as resp:
+                if resp.status != 200:
+                    print(f"Overpass API error {resp.status}")
+                    if resp.status in (429, 504):
+                        raise OverpassOverloaded(f"HTTP {resp.status}", resp.status, _retry_after(resp))
+                    return None
+
+                # fast compression level, this runs on the event loop
+                writer = overpass_cache.writer(key, compresslevel=1)
+                size, tail = 0, b""
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > MAX_CELL_BYTES:
+                        raise OverpassOverloaded(f"response larger than {MAX_CELL_BYTES} bytes")
+                    writer.write(chunk)
+                    tail = (tail + chunk)[-4096:]
                 end = time.time()
                 print(f"✅ Response received at {end:.2f}, took {end - start:.2f}s")
-                return await resp.json()
-
-            except:
-                return {"elements": []}
-
-def build_query(bbox, landuse_type, geometry_type):
-    minx, miny, maxx, maxy = bbox.bounds
-    bbox_str = f"{miny},{minx},{maxy},{maxx}"
-    landuse_filter = f'["landuse"="{landuse_type}"]' if landuse_type != "all" else '["landuse"]'
-
-    if geometry_type == "point":
-        return f"""
-        [out:json][timeout:60];
-        node{landuse_filter}({bbox_str});
-        out geom;
-        """
-    elif geometry_type in ["polygon", "multipolygon"]:
-        return f"""
-        [out:json][timeout:60];
-        (
-          way{landuse_filter}({bbox_str});
-          relation{landuse_filter}["type"="multipolygon"]({bbox_str});
-        );
-        out geom; >; out qt;
-        """
-    else:  # "all"
-        return f"""
-        [out:json][timeout:60];
-        (
-          node["landuse"]({bbox_str});
-          way["landuse"]({bbox_str});
-          relation["landuse"]({bbox_str});
-          way["natural"]({bbox_str});
-          relation["natural"]({bbox_str});
-          way["leisure"]({bbox_str});
-          relation["leisure"]({bbox_str});
-        );
-        out geom; >; out qt;
-        """
-
-async def fetch_all_overpass(bundesland, bboxes, landuse_type, geometry_type, max_concurrent=5):
-    results = []
-    sem = asyncio.Semaphore(max_concurrent)
+        except asyncio.TimeoutError:
+            if writer:
+                writer.discard()
+            raise OverpassOverloaded("client timeout")
+        except BaseException:
+            if writer:
+                writer.discard()
+            raise
 
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=600)) as session:
-        tasks = [fetch_overpass_api(session, build_query(b, landuse_type, geometry_type), sem) for b in bboxes]
-        responses = await asyncio.gather(*tasks)
-        
+    # server-side timeouts/out-of-memory arrive as a 200 with an error remark
+    remark = payload_remark(tail)
+    if remark and "error" in remark.lower():
+        writer.discard()
+        raise OverpassOverloaded(remark)
 
-        for i, r in enumerate(responses):
-            if not r or "elements" not in r:
-                continue
+    return await asyncio.to_thread(writer.commit)
 
-            # Parse JSON → DataFrame
-            df = parse_overpass_json_data(r)
-            if df is None or df.empty:
-                continue
+def _cell_size(cell):
+    min_x, _, max_x, _ = cell.bounds
+    return max_x - min_x
 
-            # Convert to GeoDataFrame
-            gdf = gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
+def _max_depth(cell):
+    # the splits a base cell allows before its quadrants would be smaller than MIN_CELL_SIZE_DEG
+    size = _cell_size(cell)
+    return max(0, math.floor(math.log2(size / MIN_CELL_SIZE_DEG))) if size > 0 else 0
+
+def _next_depth(seen):
+    # Split depth of a base cell for the next run: deeper as soon as one of its cells was overloaded
+    # or heavy, one level shallower once every cell came back complete at under a quarter of the
+    # budget (a merged quadrant would still fit), otherwise unchanged
+    if seen["needed"] > seen["depth"]:
+        return min(seen["needed"], seen["max_depth"])
+    if seen["complete"] and seen["depth"] > 0 and seen["peak"] * 4 <= MAX_CELL_ELEMENTS:
+        return seen["depth"] - 1
+    return seen["depth"]
+
+def parse_and_write_cell(path, filename):
+    # Runs in the parse process pool: streaming decode of the cached response, geometry build, GeoParquet write
+    gdf = parse_overpass_file(path)
+    if gdf.empty:
+        return 0
+    gdf.to_parquet(filename, index=False)
+    return len(gdf)
+
+def _process_pool(workers):
+    # forkserver children don't inherit the Flask threads of the parent
+    try:
+        context = multiprocessing.get_context("forkserver")
+    except ValueError:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+async def _fetch_with_retries(session, query, limiter, endpoints, report):
+    for attempt in range(OVERPASS_MAX_RETRIES + 1):
+        try:
+            path = await fetch_overpass_file(session, query, limiter, next(endpoints))
+        except OverpassOverloaded as e:
+            if e.status not in (429, 504) or attempt == OVERPASS_MAX_RETRIES:
+                raise
+            limiter.throttle(e.retry_after)
+            report["retries"] += 1
+            delay = e.retry_after or OVERPASS_BACKOFF_SECONDS * 2 ** attempt * (1 + random.random())
+            print(f"⏳ {e}, retrying in {delay:.1f}s (attempt {attempt + 1}/{OVERPASS_MAX_RETRIES})")
+            await asyncio.sleep(delay)
+            continue
+        if path is not None:
+            limiter.succeed()
+        return path
+
+async def fetch_all_overpass(bundesland, bboxes, landuse_type, geometry_type, max_concurrent=5, boundary=None,
+                             report=None, cancel=None):
+    # Streaming pipeline: every cell is parsed and written by the process pool as soon as it arrives,
+    # overloaded cells are split and queued again. `report` (dict) receives timing and lost-cell counts,
+    # once `cancel` (an Event) is set the remaining cells are dropped.
+    # bboxes is the base grid; each base cell starts split as deep as earlier runs needed there.
+    started = time.time()
+    report = report if report is not None else {}
+    report.update({"cells": 0, "fetched": 0, "split": 0, "lost": 0, "retries": 0, "features": 0,
+                   "pool_restarts": 0})
+    output_dir = CELL_CACHE_DIR
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    queue = asyncio.Queue()
+    learned = get_learned_depths(bundesland, landuse_type)
+    # per base cell: the depth it started at, the depth it turned out to need, the largest element
+    # count of its cells and whether all of them arrived
+    seen = {}
+    for b in bboxes:
+        key = grid_cell_key(b)
+        depth = min(int(learned.get(key, 0)), _max_depth(b))
+        seen[key] = {"depth": depth, "needed": depth, "max_depth": _max_depth(b), "peak": 0, "complete": True}
+        for cell in subdivide_to_depth(b, depth, boundary):
+            queue.put_nowait((cell, key, depth))
+    report["cells"] = queue.qsize()
+    limiter = AdaptiveLimiter(initial=max_concurrent, maximum=max_concurrent * 2)
+    endpoints = itertools.cycle(OVERPASS_URLS)
+    loop = asyncio.get_running_loop()
+    pool = _process_pool(PARSE_WORKERS)
+    # set when the parse processes keep dying, the remaining cells are dropped and the run fails
+    fatal = None
 
-            # Unique filename per bbox/grid
-            file_id = uuid.uuid4().hex[:8]
-            filename = f"data/landuse_bundesland_cache/{bundesland}_grid_{i}_{file_id}.geoparquet"
+    async def parse(path, filename):
+        # a dead worker breaks the whole pool: the first cell to notice replaces it, every cell that
+        # was in flight is tried once more on the new one
+        nonlocal pool, fatal
+        for attempt in range(2):
+            current = pool
+            try:
+                return await loop.run_in_executor(current, parse_and_write_cell, path, filename)
+            except BrokenProcessPool as e:
+                if pool is current:
+                    if report["pool_restarts"] >= MAX_POOL_RESTARTS:
+                        fatal = e
+                        raise
+                    print(f"Parse pool broke ({e}), starting a new one")
+                    report["pool_restarts"] += 1
+                    current.shutdown(wait=False, cancel_futures=True)
+                    pool = _process_pool(PARSE_WORKERS)
+                if attempt:
+                    raise
 
-            # Save to GeoParquet
-            gdf.to_parquet(filename, index=False)
-            print(f"💾 Saved grid {i+1}/{len(bboxes)} → {filename}")
+    async def handle(cell, key, depth, session):
+        base = seen[key]
+        size = _cell_size(cell)
+        query = build_overpass_query(cell, landuse_type, geometry_type, boundary=boundary)
+        if query is None:
+            return
+        try:
+            path = await _fetch_with_retries(session, query, limiter, endpoints, report)
+        except OverpassOverloaded as e:
+            if size / 2 < MIN_CELL_SIZE_DEG:
+                print(f"Cell {cell.bounds} still overloaded at minimum size: {e}")
+                report["lost"] += 1
+                base["complete"] = False
+                return
+            print(f"✂️ Splitting cell {cell.bounds}: {e}")
+            quadrants = subdivide_cell(cell, boundary)
+            report["split"] += 1
+            report["cells"] += len(quadrants)
+            base["needed"] = max(base["needed"], depth + 1)
+            for q in quadrants:
+                queue.put_nowait((q, key, depth + 1))
+            return
+        except aiohttp.ClientError as e:
+            print(f"Cell {cell.bounds} failed: {e}")
+            report["lost"] += 1
+            base["complete"] = False
+            return
+        if path is None:
+            report["lost"] += 1
+            base["complete"] = False
+            return
 
+        report["fetched"] += 1
+        filename = f"{output_dir}/{bundesland}_grid_{report['fetched']}_{uuid.uuid4().hex[:8]}.geoparquet"
+        try:
+            count = await parse(path, filename)
+        except Exception as e:
+            # malformed responses (ValueError, KeyError, TypeError, ...) and dead parse processes
+            print(f"Cell {cell.bounds} could not be parsed: {e!r}")
+            report["lost"] += 1
+            base["complete"] = False
+            return
+        # complete but heavy: kept, but this base cell is split one level deeper next time
+        base["peak"] = max(base["peak"], count)
+        if count > MAX_CELL_ELEMENTS:
+            base["needed"] = max(base["needed"], depth + 1)
+        if count:
+            report["features"] += count
             results.append(filename)
+            print(f"💾 Saved grid {report['fetched']}/{report['cells']} → {filename}")
+
+    async def worker(session):
+        # an error in one cell must not end the worker, queue.join() would wait forever once all are gone
+        while True:
+            cell, key, depth = await queue.get()
+            try:
+                if (cancel is None or not cancel.is_set()) and fatal is None:
+                    await handle(cell, key, depth, session)
+            except Exception as e:
+                print(f"Cell {cell.bounds} failed: {e!r}")
+                report["lost"] += 1
+                seen[key]["complete"] = False
+            finally:
+                queue.task_done()
+
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=600)) as session:
+            workers = [asyncio.create_task(worker(session)) for _ in range(limiter.maximum)]
+            await queue.join()
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    if fatal is not None:
+        raise RuntimeError(f"Parse processes for {bundesland} keep dying: {fatal}")
 
-    print(f"Completed {len(results)} GeoParquet files for {bundesland}")
+    if not (cancel is not None and cancel.is_set()):
+        remember_depths(bundesland, landuse_type, {key: _next_depth(s) for key, s in seen.items()})
+
+    report["wall_time_s"] = round(time.time() - started, 2)
+    report["throttled"] = limiter.throttled
+    print(f"Completed {len(results)} GeoParquet files for {bundesland}: {report}")
+    print(f"Overpass cache: {overpass_cache.stats()}")
     return results
 
-def get_landuse_data_by_bundesland(bundesland_ip,landuse_type,geometry_type):
+def get_landuse_data_by_bundesland(bundesland_ip,landuse_type,geometry_type, report=None, cancel=None):
     landuse_type = landuse_type.lower()
     geometry_type = str(geometry_type).lower()
     
-    bundesland_df = load_bundesland_boundaries()
-    bundesland_gdf = gpd.GeoDataFrame(bundesland_df, geometry="geometry", crs="EPSG:4326")
-    selected_row = bundesland_gdf[bundesland_gdf['bundesland'].str.lower() == bundesland_ip.lower()]
-    
-    if selected_row.empty:
+    boundary = get_boundary_registry().geometry(bundesland_ip)
+    if boundary is None:
         raise ValueError(f"{bundesland_ip} not found")
-  
-    boundary = selected_row.geometry.unary_union  
     
     grid_size_deg, _ = choose_grid_size(bundesland_ip, landuse_type=landuse_type)
     
@@ -117,7 +303,8 @@ def get_landuse_data_by_bundesland(bundesland_ip,landuse_type,geometry_type):
         bboxes = split_polygon(boundary, grid_size_deg)
 
     parquet_files = asyncio.run(
-        fetch_all_overpass(bundesland_ip, bboxes, landuse_type, geometry_type)
+        fetch_all_overpass(bundesland_ip, bboxes, landuse_type, geometry_type, boundary=boundary, report=report,
+                           cancel=cancel)
     )
 
     print(f" {len(parquet_files)} GeoParquet files saved for {bundesland_ip}")
@@ -125,26 +312,55 @@ def get_landuse_data_by_bundesland(bundesland_ip,landuse_type,geometry_type):
     return parquet_files
 
 
+def clean_cell_files(bundesland, ingested, max_age=CELL_FILE_MAX_AGE):
+    # the ingested files are in the store now; older ones are leftovers of runs that never got ingested
+    ingested = {Path(f) for f in ingested}
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in CELL_CACHE_DIR.glob(f"{bundesland}_grid_*.geoparquet"):
+        try:
+            if path in ingested or path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+def ingest_cell_files(bundesland, parquet_files):
+    # One bulk upsert for all cells of a run, duplicates across cell borders are collapsed on the way in.
+    # The data version is left alone: cells only come from states outside the PBF coverage, whose
+    # downloads, archives and tiles never read the store, and a bump would invalidate every area.
+    if not parquet_files:
+        return 0
+    start = time.time()
+    create_landuse_table(replace=False)
+    upgrade_landuse_table()
+    # the upsert keeps existing statistics up to date, a store without them gets them built once
+    count = add_landuse_data(parquet_files)
+    create_landuse_index(if_missing=True)
+    ensure_stats()
+    removed = clean_cell_files(bundesland, parquet_files)
+    print(f"✅ Upserted {count} unique features from {len(parquet_files)} cells in {time.time() - start:.1f}s, "
+          f"removed {removed} cell files")
+    return count
+
 def process_geoparquet_files(bundesland_ip,landuse_type,geometry_type):
     landuse_type = landuse_type.lower()
     geometry_type = str(geometry_type).lower()
-    
-    landuse_data = get_landuse_data_by_bundesland(bundesland_ip, landuse_type, geometry_type)
-    
-    create_landuse_table()
-    add_landuse_data()
-    
-    parquet_path = Path("data/landuse_bundesland_cache")
-    parquet_files = glob.glob(str(parquet_path / "*.geoparquet"))
-    merged_data = merge_geoparquet_files(parquet_files)
-    
-    merged_data = merge_geoparquet_files(parquet_path)
-    clipped_df = clip_landuse_by_bundesland(bundesland_ip)
-    if clipped_df.empty:
+
+    parquet_files = get_landuse_data_by_bundesland(bundesland_ip, landuse_type, geometry_type)
+    if not ingest_cell_files(bundesland_ip, parquet_files):
+        return None
+
+    boundary = get_boundary_registry().geometry(bundesland_ip)
+    df = get_landuse_by_bounds(boundary.bounds, landuse_type, geometry_type, boundary_wkb=boundary.wkb)
+    if df.empty:
         return None
 
-    # ✅ Convert to GeoDataFrame
-    gdf = gpd.GeoDataFrame(clipped_df, geometry="clipped_geom", crs="EPSG:4326")
+    # ✅ Convert to GeoDataFrame, clipped to the state
+    df["geometry"] = gpd.GeoSeries.from_wkb([bytes(g) for g in df["geometry"]], crs="EPSG:4326")
+    gdf = gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
+    gdf = clip_to_boundary(gdf, boundary)
 
     # ✅ Save to GeoParquet
     output_dir = Path("data/merged_landuse")
@@ -153,5 +369,3 @@ def process_geoparquet_files(bundesland_ip,landuse_type,geometry_type):
 
     gdf.to_parquet(output_file, index=False)
     return output_file
-    
-    
\ No newline at end of file
@@ -1,99 +1,73 @@
-from app.utils.utils import get_landuse_data,load_bundesland_boundaries
-from app.services.landuse_by_bundesland_service import get_landuse_data_by_bundesland
+from app.utils.utils import empty_landuse_frame
+from app.utils.boundary_registry import get_boundary_registry
+from app.services.landuse_by_bundesland_service import (get_landuse_data_by_bundesland, ingest_cell_files,
+                                                       clean_cell_files)
+from app.persistence.feature_store import store_covers, read_features, write_features
+from app.services.local_store_service import query_local_bbox, query_local_boundary
+from app.services.bbox_tile_service import get_landuse_by_tiles
+from app.services.clip_service import clip_to_boundary
 import pandas as pd
 import geopandas as gpd
 
-import uuid
-from shapely import Polygon, Point, LineString
-
 
 
 def normalize_landuse_data(bbox,landuse_type,geometry_type):   
-    json_data = get_landuse_data(bbox,landuse_type,geometry_type)
+    # Answer from the ingested PBF store when it covers the bbox, Overpass is only the fallback.
+    # Both loaders return (df, lost): lost counts the tiles or cells missing from df, results with
+    # lost > 0 are served but never cached.
+    local_df = query_local_bbox(bbox, landuse_type, geometry_type)
+    if local_df is not None:
+        return local_df, 0
+
     try:
-        df = parse_overpass_json_data(json_data)
+        df, lost = get_landuse_by_tiles(bbox,landuse_type,geometry_type)
         if df.empty:
-            return (f"No data is returned for {landuse_type}")
-        return df
+            print(f"No data is returned for {landuse_type}")
+        return df, lost
     except Exception as e:
         raise RuntimeError(f"Error: {e}")
     
             
-def normalize_bundesland_landuse(bundesland,landuse_type,geometry_type):             
-    bundesland_df = load_bundesland_boundaries()
-    bundesland_gdf = gpd.GeoDataFrame(bundesland_df, geometry='geometry', crs='EPSG:4326')
-    
-    selected = bundesland_gdf[bundesland_gdf['bundesland'].str.lower() == bundesland.lower()]
-    if selected.empty:
+def normalize_bundesland_landuse(bundesland,landuse_type,geometry_type, report=None, cancel=None):
+    # report/cancel are passed through to the Overpass pipeline (job progress and cancellation)
+    boundary = get_boundary_registry().geometry(bundesland)
+    if boundary is None:
         raise ValueError(f"{bundesland} not found in boundary data.")
-    json_data = get_landuse_data_by_bundesland(bundesland,landuse_type,geometry_type)
+
+    # features crossing the state border are cut to it, whichever source they come from
+    local_df = query_local_boundary(boundary, landuse_type, geometry_type)
+    if local_df is not None:
+        return clip_to_boundary(local_df, boundary), 0
+
+    # states fetched before are read from the partitioned feature store until they expire
+    if store_covers(bundesland, landuse_type, geometry_type):
+        return read_features(bundesland, landuse_type, geometry_type), 0
+
+    report = report if report is not None else {}
+    parquet_files = get_landuse_data_by_bundesland(bundesland,landuse_type,geometry_type, report=report,
+                                                   cancel=cancel)
     
     try:
-        df = parse_overpass_json_data(json_data)
+        frames = [gpd.read_parquet(f) for f in parquet_files]
+        df = pd.concat(frames, ignore_index=True) if frames else empty_landuse_frame()
         print(f"size of the prse data:{df.shape}")
         if df.empty:
-            return (f"No data is returned for {landuse_type}")
-        return df
+            print(f"No data is returned for {landuse_type}")
+            return df, report.get("lost", 0)
     except Exception as e:
         raise RuntimeError(f"Error: {e}")
-    
-       
-    
-def parse_overpass_json_data(json_data):   
-    data = []
-    
-    elements = []
-    if isinstance(json_data, dict) and "elements" in json_data:
-        elements = json_data["elements"]
-    elif isinstance(json_data, list):
-        elements = json_data
-    else:
-        return pd.DataFrame()
-        
-    for item in elements: 
-        tags = item.get("tags")        
-        if not tags or "landuse" not in tags:
-            continue      
-         
-       # Geometry of landuse 
-        coords = [(pt["lon"],pt["lat"]) for pt in item.get("geometry",[])]
-        if not coords:
-           continue
-        
-        if item["type"] == "node":
-            geom = Point(coords) if coords else None
-        elif item["type"] == "way":
-            if coords[0] == coords[-1] and len(coords) >=4:
-                geom = Polygon(coords)
-            elif coords:
-                geom = LineString(coords) 
-        elif item["type"] == "relation": 
-            if coords and coords[0] == coords[-1] and len(coords) >= 4:
-                geom = Polygon(coords)  
-            else:
-                geom = None
-        else:
-            geom = None
 
-        area = None
-        if geom.geom_type in ["Polygon", "MultiPolygon"]:
-            temp_gdf = gpd.GeoDataFrame([{"geometry": geom}], crs="EPSG:4326").to_crs("EPSG:3857")
-            area = temp_gdf['geometry'].area.values[0]
-                
-        data.append({
-            "id": str(uuid.uuid1()),
-            "osm_id": item.get("id"),
-            "name": tags.get("name") or None,
-            "landuse_type" : tags["landuse"],
-            "leisure": tags.get("leisure") or None,
-            "city": tags.get("addr:city") or tags.get("is_in"),
-            "area" : area,
-            "geometry" : geom
-        })
-        
-        df = pd.DataFrame(data)
-        
-        if df is None:
-            print(f"df in parse json:{df}")
-    
-    return df
\ No newline at end of file
+    # cells reach past the border, the feature store keeps the clipped features
+    df = clip_to_boundary(df, boundary)
+
+    # only complete fetches go into the store, a cancelled or partly failed one would replace good data
+    if report.get("lost") or (cancel is not None and cancel.is_set()):
+        return df, report.get("lost", 0)
+    write_features(bundesland, landuse_type, geometry_type, df)
+    # the cells are upserted into the local store as well (deduplicated there), which removes them
+    try:
+        ingest_cell_files(bundesland, parquet_files)
+    except Exception as e:
+        print(f"Cells of {bundesland} not ingested into the local store: {e}")
+        clean_cell_files(bundesland, parquet_files)
+    return read_features(bundesland, landuse_type, geometry_type), 0
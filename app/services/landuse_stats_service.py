@@ -0,0 +1,55 @@
+from app.config.config_db import claim_store, close_connections
+from app.persistence.landuse_persistence import (refresh_landuse_stats, has_landuse_stats, get_state_stats,
+                                                 get_bounds_stats, get_data_version)
+from app.utils.boundary_registry import get_boundary_registry
+
+import time
+import pandas as pd
+import shapely
+
+def _boundaries():
+    # state boundaries for the per-state tables; None keeps the ones stored with the last refresh
+    try:
+        frame = get_boundary_registry().frame()
+    except FileNotFoundError as e:
+        print(f"No bundesland boundaries, state statistics keep their previous boundaries: {e}")
+        return None
+    df = pd.DataFrame(frame[["bundesland", "minx", "miny", "maxx", "maxy"]])
+    df["geometry"] = shapely.to_wkb(frame.geometry.values)
+    return df
+
+def refresh_stats():
+    start = time.time()
+    refresh_landuse_stats(_boundaries())
+    print(f"📊 Landuse statistics refreshed in {time.time() - start:.1f}s")
+
+def ensure_stats():
+    # stores ingested before the statistics existed get them on their next ingest
+    if not has_landuse_stats():
+        refresh_stats()
+
+def landuse_stats(area, bounds, landuse_type, geometry_type):
+    # area: ("bbox", bbox) or ("bundesland", name) as the routes parse it, bounds the matching
+    # (min_x, min_y, max_x, max_y). None when the store has no statistics.
+    if not has_landuse_stats():
+        return None
+    landuse_type, geometry_type = (landuse_type or "all").lower(), str(geometry_type or "").lower()
+    extent = {}
+    if area[0] == "bundesland":
+        df = get_state_stats(area[1], landuse_type, geometry_type)
+    else:
+        df, cell_bounds = get_bounds_stats(bounds, landuse_type, geometry_type)
+        extent = {"cell_bounds": [round(v, 6) for v in cell_bounds]}
+
+    rows = [{"landuse_type": row.landuse_type, "feature_count": int(row.feature_count), "area": float(row.area)}
+            for row in df.itertuples()]
+    return {area[0]: area[1], "landuse_type": landuse_type, "geometry": geometry_type or "all",
+            "feature_count": sum(r["feature_count"] for r in rows), "area": sum(r["area"] for r in rows),
+            "by_landuse_type": rows, "data_version": get_data_version(), **extent}
+
+if __name__ == "__main__":
+    claim_store()
+    try:
+        refresh_stats()
+    finally:
+        close_connections()
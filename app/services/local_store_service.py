@@ -0,0 +1,33 @@
+from app.persistence.landuse_persistence import get_landuse_by_bounds, is_area_covered
+
+import geopandas as gpd
+
+def _to_geodataframe(df):
+    df["geometry"] = gpd.GeoSeries.from_wkb([bytes(g) for g in df["geometry"]], crs="EPSG:4326")
+    return gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
+
+def _covered(bounds):
+    try:
+        return is_area_covered(bounds)
+    except Exception as e:
+        print(f"Local landuse store unavailable: {e}")
+        return False
+
+def local_store_covers(bounds):
+    # bounds = (min_x, min_y, max_x, max_y)
+    return _covered(bounds)
+
+def query_local_bbox(bbox, landuse_type, geometry_type):
+    # bbox arrives in Overpass order (south, west, north, east); None means "not in the local store"
+    bounds = (bbox[1], bbox[0], bbox[3], bbox[2])
+    if not _covered(bounds):
+        return None
+    df = get_landuse_by_bounds(bounds, landuse_type.lower(), str(geometry_type).lower())
+    return _to_geodataframe(df)
+
+def query_local_boundary(boundary, landuse_type, geometry_type):
+    if not _covered(boundary.bounds):
+        return None
+    df = get_landuse_by_bounds(boundary.bounds, landuse_type.lower(), str(geometry_type).lower(),
+                               boundary_wkb=boundary.wkb)
+    return _to_geodataframe(df)
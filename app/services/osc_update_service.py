@@ -0,0 +1,205 @@
+from app.config.config_db import claim_store, close_connections
+from app.persistence.landuse_persistence import (insert_landuse_features, delete_landuse_features,
+                                                 get_landuse_attributes, bump_data_version, upgrade_landuse_table,
+                                                 adjust_landuse_stats)
+from app.persistence.osm_index_persistence import (has_osm_index, store_transaction, upsert_node_locations,
+                                                   delete_node_locations, replace_way_nodes, replace_relation_members,
+                                                   get_known_nodes, get_ways_using_nodes, get_member_ways,
+                                                   get_relations_using_ways, get_way_coordinates,
+                                                   get_relation_members)
+from app.services.pbf_ingest_service import (AREA_RELATION_TYPES, WAY_NODE_COLUMNS, NODE_COLUMNS,
+                                             RELATION_MEMBER_COLUMNS, _keep, _load_osmium, build_feature_frame)
+from app.utils.utils import assemble_multipolygon
+
+import argparse
+import time
+from pathlib import Path
+import pandas as pd
+import shapely
+
+class OsmChanges:
+    # Newest version of every object over all change files: (deleted, payload, tags) per id,
+    # payload being (lon, lat) for nodes, node refs for ways and (type, ref, role) members for relations
+
+    def __init__(self):
+        self.nodes = {}
+        self.ways = {}
+        self.relations = {}
+        self._versions = {}
+
+    def add(self, kind, osm_id, version, entry):
+        key = (kind, osm_id)
+        if version >= self._versions.get(key, -1):
+            self._versions[key] = version
+            getattr(self, kind)[osm_id] = entry
+
+def read_changes(paths):
+    # .osc / .osc.gz files, applied in the given order
+    osmium = _load_osmium()
+    changes = OsmChanges()
+
+    class ChangeHandler(osmium.SimpleHandler):
+        def node(self, n):
+            location = (n.location.lon, n.location.lat) if n.location.valid() else None
+            changes.add("nodes", n.id, n.version, (n.deleted, location, {t.k: t.v for t in n.tags}))
+
+        def way(self, w):
+            changes.add("ways", w.id, w.version, (w.deleted, [n.ref for n in w.nodes], {t.k: t.v for t in w.tags}))
+
+        def relation(self, r):
+            members = [(m.type, m.ref, m.role) for m in r.members]
+            changes.add("relations", r.id, r.version, (r.deleted, members, {t.k: t.v for t in r.tags}))
+
+    for path in paths:
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(path)
+        ChangeHandler().apply_file(str(path))
+    return changes
+
+def _stored_tags(row):
+    # tags as build_feature_frame reads them, from a stored feature row
+    tags = {"landuse": row.landuse_type, "name": row.name, "leisure": row.leisure, "natural": row.natural_type,
+            "addr:city": row.city}
+    return {k: v for k, v in tags.items() if isinstance(v, str)}
+
+def _way_lines(coords):
+    # way_id -> coordinate array, ways with a node of unknown location are left out
+    lines = {}
+    for way_id, group in coords.groupby("way_id", sort=False):
+        if group["lon"].isna().any():
+            continue
+        lines[way_id] = group[["lon", "lat"]].to_numpy()
+    return lines
+
+def _way_geometry(points):
+    # closed ways are areas (they come out of osmium's area assembly at ingest), open ones lines
+    if len(points) >= 4 and (points[0] == points[-1]).all():
+        polygon = shapely.make_valid(shapely.Polygon(points))
+        return polygon if polygon.geom_type in ("Polygon", "MultiPolygon") else None
+    return shapely.LineString(points) if len(points) >= 2 else None
+
+def _relation_geometry(members, lines):
+    outer, inner = [], []
+    for member in members.itertuples():
+        if member.member_type != "w":
+            continue
+        if member.member_id not in lines:
+            return None
+        line = shapely.LineString(lines[member.member_id])
+        (inner if member.role == "inner" else outer).append(line)
+    return assemble_multipolygon(outer, inner) if outer else None
+
+def _apply(changes, report):
+    deleted = set()
+
+    # Relations: members of the tracked ones are replaced, the rest leave the store
+    relation_ids = set(changes.relations)
+    tracked_relations = {rid for rid, (gone, _, tags) in changes.relations.items()
+                         if not gone and _keep(tags) and tags.get("type") in AREA_RELATION_TYPES}
+    members = [(rid, seq, *member) for rid in tracked_relations
+               for seq, member in enumerate(changes.relations[rid][1])]
+    replace_relation_members(relation_ids, pd.DataFrame(members, columns=RELATION_MEMBER_COLUMNS))
+    deleted |= {("relation", str(rid)) for rid in relation_ids - tracked_relations}
+
+    # Ways: feature ways and member ways of tracked relations keep their node lists
+    way_ids = set(changes.ways)
+    member_ways = get_member_ways(way_ids) if way_ids else set()
+    feature_ways = {wid for wid, (gone, _, tags) in changes.ways.items() if not gone and _keep(tags)}
+    indexed_ways = {wid for wid, (gone, _, _) in changes.ways.items()
+                    if not gone and (wid in feature_ways or wid in member_ways)}
+    way_nodes = [(wid, seq, ref) for wid in indexed_ways for seq, ref in enumerate(changes.ways[wid][1])]
+    replace_way_nodes(way_ids, pd.DataFrame(way_nodes, columns=WAY_NODE_COLUMNS))
+    deleted |= {("way", str(wid)) for wid in way_ids - feature_ways}
+
+    # Nodes: locations of indexed nodes and of nodes new ways refer to; tagged nodes are point features
+    node_ids = set(changes.nodes)
+    gone_nodes = {nid for nid, (gone, _, _) in changes.nodes.items() if gone}
+    referenced = {ref for _, _, ref in way_nodes}
+    known = get_known_nodes(node_ids - gone_nodes) if node_ids else set()
+    located = {nid: location for nid, (gone, location, _) in changes.nodes.items()
+               if not gone and location is not None and (nid in known or nid in referenced)}
+    upsert_node_locations(pd.DataFrame([(nid, *xy) for nid, xy in located.items()], columns=NODE_COLUMNS))
+    delete_node_locations(gone_nodes)
+    feature_nodes = {nid for nid, (gone, location, tags) in changes.nodes.items()
+                     if not gone and location is not None and _keep(tags)}
+    deleted |= {("node", str(nid)) for nid in node_ids - feature_nodes}
+
+    # Geometries to rebuild: changed features, ways whose nodes moved, relations whose ways changed
+    moved_ways = get_ways_using_nodes(set(located) & known) - way_ids if located else set()
+    touched_ways = indexed_ways | moved_ways
+    touched_relations = tracked_relations | (get_relations_using_ways(touched_ways) if touched_ways else set())
+
+    # tags of features rebuilt only for their geometry come from the store
+    stored = get_landuse_attributes([("way", str(w)) for w in moved_ways]
+                                    + [("relation", str(r)) for r in touched_relations - tracked_relations])
+    stored_tags = {(row.osm_type, int(row.osm_id)): _stored_tags(row) for row in stored.itertuples()}
+
+    relation_members = get_relation_members(touched_relations) if touched_relations else \
+        pd.DataFrame(columns=RELATION_MEMBER_COLUMNS)
+    needed_ways = (feature_ways | moved_ways
+                   | set(relation_members.loc[relation_members["member_type"] == "w", "member_id"]))
+    lines = _way_lines(get_way_coordinates(needed_ways)) if needed_ways else {}
+
+    rows, unresolved = [], 0
+    for nid in feature_nodes:
+        rows.append(("node", nid, changes.nodes[nid][2], shapely.to_wkb(shapely.Point(changes.nodes[nid][1]))))
+    for wid in feature_ways | {w for w in moved_ways if ("way", w) in stored_tags}:
+        tags = changes.ways[wid][2] if wid in changes.ways else stored_tags[("way", wid)]
+        geometry = _way_geometry(lines[wid]) if wid in lines else None
+        if geometry is None:
+            unresolved += 1
+            deleted.discard(("way", str(wid)))
+            continue
+        rows.append(("way", wid, tags, shapely.to_wkb(geometry)))
+    for rid, group in relation_members.groupby("relation_id"):
+        tags = changes.relations[rid][2] if rid in tracked_relations else stored_tags.get(("relation", rid))
+        if tags is None:
+            continue
+        geometry = _relation_geometry(group, lines)
+        if geometry is None:
+            # a member way or node location is not in the store; the stored version stays
+            unresolved += 1
+            continue
+        rows.append(("relation", rid, tags, shapely.to_wkb(geometry)))
+
+    rebuilt = {(osm_type, str(osm_id)) for osm_type, osm_id, _, _ in rows}
+    adjust_landuse_stats(deleted | rebuilt, -1)
+    delete_landuse_features(deleted | rebuilt)
+    if rows:
+        insert_landuse_features(build_feature_frame(rows))
+        adjust_landuse_stats(rebuilt, 1)
+
+    report.update({"nodes": len(node_ids), "ways": len(way_ids), "relations": len(relation_ids),
+                   "deleted": len(deleted - rebuilt), "rebuilt": len(rows), "moved_ways": len(moved_ways),
+                   "unresolved": unresolved})
+
+def apply_changes(paths):
+    # Applies OSM change files to the local store in one transaction and bumps the data version
+    if not has_osm_index():
+        raise RuntimeError("The landuse store has no OSM index; ingest the extract again with this version "
+                           "before applying change files")
+    start = time.time()
+    changes = read_changes(paths)
+    upgrade_landuse_table()
+
+    report = {}
+    with store_transaction():
+        _apply(changes, report)
+        report["data_version"] = bump_data_version()
+    report["seconds"] = round(time.time() - start, 1)
+    print(f"✅ Applied {len(paths)} change file(s): {report}")
+    if report["unresolved"]:
+        print(f"{report['unresolved']} features reference ways or nodes the store never indexed and kept their "
+              f"previous version; a periodic full ingest picks them up")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply OSM change files (.osc/.osc.gz) to the local landuse store")
+    parser.add_argument("change_files", nargs="+")
+    args = parser.parse_args()
+    claim_store()
+    try:
+        apply_changes(args.change_files)
+    finally:
+        close_connections()
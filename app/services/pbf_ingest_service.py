@@ -0,0 +1,228 @@
+from app.config.config_db import claim_store, close_connections
+from app.persistence.landuse_persistence import (create_landuse_table, insert_landuse_features,
+                                                 create_landuse_source_table, add_landuse_source,
+                                                 clear_landuse_sources, bump_data_version,
+                                                 create_landuse_index, drop_landuse_index,
+                                                 upgrade_landuse_table)
+from app.persistence.osm_index_persistence import (create_osm_index_tables, create_osm_index_indexes, add_way_nodes,
+                                                   add_relation_members, replace_way_nodes, replace_relation_members,
+                                                   upsert_node_locations)
+from app.services.landuse_stats_service import refresh_stats
+
+import argparse
+import time
+import uuid
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+KEEP_TAGS = ("landuse", "natural", "leisure")
+# relation types osmium assembles into areas
+AREA_RELATION_TYPES = ("multipolygon", "boundary")
+BATCH_SIZE = 50_000
+WAY_NODE_COLUMNS = ["way_id", "seq", "node_id"]
+NODE_COLUMNS = ["id", "lon", "lat"]
+RELATION_MEMBER_COLUMNS = ["relation_id", "seq", "member_type", "member_id", "role"]
+
+def _load_osmium():
+    try:
+        import osmium
+    except ImportError as e:
+        raise RuntimeError("PBF ingestion needs pyosmium: poetry install -E pbf (or pip install osmium)") from e
+    return osmium
+
+def _keep(tags):
+    return any(key in tags for key in KEEP_TAGS)
+
+def build_feature_frame(rows):
+    # rows: (osm_type, osm_id, tags dict, wkb bytes) -> frame matching landuse_by_h3
+    osm_types, osm_ids, tags, wkbs = zip(*rows)
+    geoms = shapely.from_wkb(np.array(wkbs, dtype=object))
+
+    # osmium assembles every area as a MultiPolygon; single-part ones are stored as Polygon
+    single = (shapely.get_type_id(geoms) == 6) & (shapely.get_num_geometries(geoms) == 1)
+    geoms[single] = shapely.get_geometry(geoms[single], 0)
+
+    polygonal = np.isin(shapely.get_type_id(geoms), [3, 6])
+    area = np.full(len(geoms), np.nan)
+    if polygonal.any():
+        area[polygonal] = gpd.GeoSeries(geoms[polygonal], crs="EPSG:4326").to_crs("EPSG:3857").area.values
+    bounds = shapely.bounds(geoms)
+
+    batch_id = uuid.uuid4().hex
+    return pd.DataFrame({
+        "id": [f"{batch_id}_{i}" for i in range(len(osm_ids))],
+        "osm_id": [str(i) for i in osm_ids],
+        "osm_type": osm_types,
+        "name": [t.get("name") for t in tags],
+        "landuse_type": [t.get("landuse") for t in tags],
+        "leisure": [t.get("leisure") for t in tags],
+        "natural_type": [t.get("natural") for t in tags],
+        "city": [t.get("addr:city") or t.get("is_in") for t in tags],
+        "area": area,
+        "minx": bounds[:, 0],
+        "miny": bounds[:, 1],
+        "maxx": bounds[:, 2],
+        "maxy": bounds[:, 3],
+        "geometry": shapely.to_wkb(geoms),
+    })
+
+def _tracked_relations(osmium, pbf_path):
+    # First pass over the relations only: members of everything that becomes a landuse area,
+    # their ways are indexed in the main pass even when they carry no tags themselves
+    rows, member_ways = [], set()
+
+    class RelationHandler(osmium.SimpleHandler):
+        def relation(self, r):
+            if _keep(r.tags) and r.tags.get("type") in AREA_RELATION_TYPES:
+                for seq, m in enumerate(r.members):
+                    rows.append((r.id, seq, m.type, m.ref, m.role))
+                    if m.type == "w":
+                        member_ways.add(m.ref)
+
+    RelationHandler().apply_file(str(pbf_path))
+    return pd.DataFrame(rows, columns=RELATION_MEMBER_COLUMNS), member_ways
+
+class _OsmIndexBuffer:
+    # node lists and node locations of the indexed ways, for applying change files later
+
+    def __init__(self, member_ways, batch_size, append=False):
+        self.member_ways = member_ways
+        self.batch_size = batch_size
+        # extracts appended to a store overlap at their borders, ways already indexed are replaced
+        self.append = append
+        self.way_nodes = []
+        self.nodes = []
+
+    def add_way(self, w):
+        for seq, n in enumerate(w.nodes):
+            self.way_nodes.append((w.id, seq, n.ref))
+            if n.location.valid():
+                self.nodes.append((n.ref, n.lon, n.lat))
+        if len(self.way_nodes) >= self.batch_size * 10:
+            self.flush()
+
+    def flush(self):
+        way_nodes = pd.DataFrame(self.way_nodes, columns=WAY_NODE_COLUMNS)
+        if self.append:
+            replace_way_nodes(set(way_nodes["way_id"]), way_nodes)
+        else:
+            add_way_nodes(way_nodes)
+        upsert_node_locations(pd.DataFrame(self.nodes, columns=NODE_COLUMNS))
+        self.way_nodes, self.nodes = [], []
+
+def _make_handler(osmium, on_batch, batch_size, index=None):
+    class LanduseHandler(osmium.SimpleHandler):
+        def __init__(self):
+            super().__init__()
+            self.wkb = osmium.geom.WKBFactory()
+            self.rows = []
+            self.count = 0
+
+        def _add(self, osm_type, osm_id, tags, wkb_hex):
+            self.rows.append((osm_type, osm_id, {t.k: t.v for t in tags}, bytes.fromhex(wkb_hex)))
+            if len(self.rows) >= batch_size:
+                self.flush()
+
+        def flush(self):
+            if self.rows:
+                on_batch(build_feature_frame(self.rows))
+                self.count += len(self.rows)
+                print(f"💾 Ingested {self.count} features")
+                self.rows = []
+            if index is not None:
+                index.flush()
+
+        def node(self, n):
+            if _keep(n.tags):
+                self._add("node", n.id, n.tags, self.wkb.create_point(n))
+
+        def way(self, w):
+            keep = _keep(w.tags)
+            if index is not None and (keep or w.id in index.member_ways):
+                index.add_way(w)
+            # closed ways arrive through area(); open ones are kept as lines like the Overpass parser does
+            if w.is_closed() or len(w.nodes) < 2 or not keep:
+                return
+            try:
+                self._add("way", w.id, w.tags, self.wkb.create_linestring(w))
+            except (osmium.InvalidLocationError, RuntimeError):
+                pass
+
+        def area(self, a):
+            if not _keep(a.tags):
+                return
+            try:
+                wkb_hex = self.wkb.create_multipolygon(a)
+            except (osmium.InvalidLocationError, RuntimeError):
+                return
+            self._add("way" if a.from_way() else "relation", a.orig_id(), a.tags, wkb_hex)
+
+    return LanduseHandler()
+
+def _header_bounds(osmium, pbf_path):
+    reader = osmium.io.Reader(str(pbf_path), osmium.osm.osm_entity_bits.NOTHING)
+    try:
+        box = reader.header().box()
+    finally:
+        reader.close()
+    if not box.valid():
+        return None
+    return (box.bottom_left.lon, box.bottom_left.lat, box.top_right.lon, box.top_right.lat)
+
+def ingest_pbf(pbf_path, replace=True, batch_size=BATCH_SIZE, osm_index=True):
+    # osm_index=False skips the way/relation/node index that change files are applied with
+    osmium = _load_osmium()
+    pbf_path = Path(pbf_path)
+    if not pbf_path.exists():
+        raise FileNotFoundError(pbf_path)
+
+    start = time.time()
+    create_landuse_source_table()
+    if replace:
+        create_landuse_table()
+        clear_landuse_sources()
+    else:
+        upgrade_landuse_table()
+    # the R-tree is rebuilt once after loading instead of being updated for every batch
+    drop_landuse_index()
+
+    index = None
+    if osm_index:
+        create_osm_index_tables(replace=replace)
+        relation_members, member_ways = _tracked_relations(osmium, pbf_path)
+        if replace:
+            add_relation_members(relation_members)
+        else:
+            replace_relation_members(set(relation_members["relation_id"]), relation_members)
+        index = _OsmIndexBuffer(member_ways, batch_size, append=not replace)
+
+    handler = _make_handler(osmium, insert_landuse_features, batch_size, index)
+    handler.apply_file(str(pbf_path), locations=True)
+    handler.flush()
+    create_landuse_index()
+    if osm_index:
+        create_osm_index_indexes()
+    # the summary tables are rebuilt once per bulk load, change files keep them up to date afterwards
+    refresh_stats()
+
+    add_landuse_source(pbf_path.name, _header_bounds(osmium, pbf_path))
+    bump_data_version()
+    print(f"✅ Ingested {handler.count} features from {pbf_path.name} in {time.time() - start:.1f}s")
+    return handler.count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a Geofabrik .osm.pbf extract into the local landuse store")
+    parser.add_argument("pbf_path")
+    parser.add_argument("--append", action="store_true", help="keep previously ingested extracts")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--no-osm-index", action="store_true", help="don't keep what change files need (smaller store)")
+    args = parser.parse_args()
+    claim_store()
+    try:
+        ingest_pbf(args.pbf_path, replace=not args.append, batch_size=args.batch_size,
+                   osm_index=not args.no_osm_index)
+    finally:
+        close_connections()
@@ -0,0 +1,47 @@
+from app.utils.pmtiles_archive import open_archive
+
+from flask import Response
+import os
+from werkzeug.datastructures import ContentRange
+
+PMTILES_MIMETYPE = "application/vnd.pmtiles"
+
+def pmtiles_version(path):
+    # appended to archive URLs as ?v=, a rebuilt archive gets a new URL
+    # same value as PMTilesArchive.version, without mapping the archive
+    return f"{os.stat(path).st_mtime_ns:x}"
+
+def pmtiles_response(path, request):
+    # Single byte ranges are answered with 206/416 from the mapped archive, 304 on a matching ETag.
+    # Raises FileNotFoundError or ValueError for missing or invalid archives.
+    archive = open_archive(path)
+    length = archive.length
+
+    if request.if_none_match.contains(archive.etag):
+        response = Response(status=304)
+    else:
+        # If-Range with a date is treated as outdated, the archive ETag is what clients send
+        if_range = request.if_range
+        ranged = request.range is not None and ((if_range.etag is None and if_range.date is None) or
+                                                if_range.etag == archive.etag)
+        span = request.range.range_for_length(length) if ranged else None
+        if ranged and span is None and len(request.range.ranges) == 1:
+            response = Response(status=416)
+            response.content_range = ContentRange("bytes", None, None, length)
+        elif span is not None:
+            start, stop = span
+            response = Response(archive.read(start, stop), status=206, mimetype=PMTILES_MIMETYPE)
+            response.content_range = ContentRange("bytes", start, stop, length)
+        else:
+            # no, multiple or outdated (If-Range) ranges: the whole archive
+            response = Response(archive.iter_bytes(0, length), mimetype=PMTILES_MIMETYPE)
+            response.content_length = length
+
+    response.set_etag(archive.etag)
+    response.accept_ranges = "bytes"
+    if request.args.get("v") == archive.version:
+        # the URL names this exact build, it can never change
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = "no-cache"
+    return response
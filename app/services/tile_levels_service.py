@@ -0,0 +1,135 @@
+from app.config.config_export import (TILE_MIN_ZOOM, TILE_MAX_ZOOM, TILE_ZOOM_BANDS, TILE_MERGE_MAX_ZOOM,
+                                      TILE_MERGE_PIXELS)
+from app.services.file_export_service import TIPPECANOE_MINZOOM, TIPPECANOE_MAXZOOM
+
+import time
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+# small polygons are merged with the ones of the same type within cells of this many pixels
+MERGE_CELL_PIXELS = 16
+# what the map styles by: polygons are only merged with ones that look the same
+MERGE_KEY = ["landuse_type", "leisure"]
+# attributes of a single feature, empty on merged shapes
+MERGE_NULLS = ["osm_id", "name", "city"]
+
+def pixel_degrees(zoom):
+    # one pixel of a 256 px tile, in degrees of longitude
+    return 360 / (256 * 2 ** zoom)
+
+def simplify_coverage(geoms, px):
+    # Adjacent polygons are simplified together so their shared edges stay shared, simplifying each
+    # alone opens gaps and slivers between neighbouring fields. Polygons overlapping others are not
+    # a valid coverage and are simplified one by one, like points and lines.
+    out = shapely.simplify(geoms, px, preserve_topology=True)
+    idx = np.flatnonzero(np.isin(shapely.get_type_id(geoms), [3, 6]))
+    if len(idx):
+        idx = idx[shapely.is_empty(shapely.coverage_invalid_edges(geoms[idx]))]
+    if len(idx):
+        out[idx] = shapely.coverage_simplify(geoms[idx], px)
+    return out
+
+def _pieces(gdf, geoms, idx):
+    # small polygons as merge input: what the map styles them by and their area
+    area = pd.to_numeric(gdf["area"], errors="coerce").values[idx] if "area" in gdf.columns else np.zeros(len(idx))
+    pieces = pd.DataFrame({c: gdf[c].values[idx] if c in gdf.columns else None for c in MERGE_KEY})
+    pieces["area"] = area
+    return gpd.GeoDataFrame(pieces, geometry=geoms[idx], crs=gdf.crs)
+
+def _merge(pieces, band_max):
+    # One shape per type and grid cell: grown by a pixel, unioned and shrunk back, so fragments less
+    # than two pixels apart become one. Cells of coarser bands contain whole cells of finer ones,
+    # so each band merges the shapes of the previous band instead of all polygons again.
+    px = pixel_degrees(band_max)
+    bounds = pieces.geometry.bounds.values
+    cell = MERGE_CELL_PIXELS * px
+    keys = pieces[MERGE_KEY].fillna("").assign(
+        x=np.floor((bounds[:, 0] + bounds[:, 2]) / 2 / cell).astype(np.int64),
+        y=np.floor((bounds[:, 1] + bounds[:, 3]) / 2 / cell).astype(np.int64))
+    groups = list(keys.groupby(list(keys.columns), sort=False).indices.values())
+
+    # sub-pixel detail is gone at this zoom, the buffers run on a few vertices per shape
+    geoms = simplify_coverage(np.asarray(pieces.geometry.values), px)
+    grown = shapely.buffer(geoms, px, quad_segs=1)
+    merged = np.array([grown[pos[0]] if len(pos) == 1 else shapely.union_all(grown[pos]) for pos in groups],
+                      dtype=object)
+    merged = simplify_coverage(merged, px)
+    closed = simplify_coverage(shapely.buffer(merged, -px, quad_segs=1), px)
+    closed = np.where(shapely.is_empty(closed), merged, closed)
+
+    first = [pos[0] for pos in groups]
+    area = pieces["area"].values
+    frame = pd.DataFrame({c: pieces[c].values[first] for c in MERGE_KEY})
+    frame["area"] = [np.nansum(area[pos]) for pos in groups]
+    # a merged shape is no single OSM feature, explicit nulls instead of NaN in the popup
+    for column in MERGE_NULLS:
+        frame[column] = None
+    frame["merged"] = True
+    return gpd.GeoDataFrame(frame, geometry=closed, crs=pieces.crs)
+
+def build_zoom_levels(gdf, bands=TILE_ZOOM_BANDS, min_zoom=TILE_MIN_ZOOM, max_zoom=TILE_MAX_ZOOM,
+                      merge_max_zoom=TILE_MERGE_MAX_ZOOM, merge_pixels=TILE_MERGE_PIXELS):
+    # Multi-resolution feature set for tippecanoe, every row carries the zoom range it is shown at.
+    # Going from the finest band to the coarsest, a feature gets a new row only where simplifying it
+    # to one pixel of the band (topology preserving) drops vertices, otherwise its row reaches further
+    # down. Polygons smaller than merge_pixels² of a band up to merge_max_zoom leave the per-feature
+    # rows there and are drawn as merged per-type shapes instead, so no class thins out at overview zooms.
+    bands = sorted(band for band in bands if band[1] < max_zoom)
+    if gdf.empty or not bands:
+        return gdf
+    start = time.time()
+    bands[0] = (min(bands[0][0], min_zoom), bands[0][1])
+
+    geoms = np.asarray(gdf.geometry.values)
+    current = geoms.copy()
+    vertices = shapely.get_num_coordinates(current)
+    row_min = np.full(len(gdf), bands[-1][1] + 1)
+    row_max = np.full(len(gdf), max_zoom)
+    active = ~shapely.is_missing(geoms)
+    polygonal = np.isin(shapely.get_type_id(geoms), [3, 6])
+    area = shapely.area(geoms)
+    rows, merged = [], []
+    merged_small = np.zeros(len(gdf), dtype=bool)
+    pieces = None
+
+    def emit(idx):
+        rows.append((idx, current[idx], row_min[idx], row_max[idx]))
+
+    for band_min, band_max in reversed(bands):
+        px = pixel_degrees(band_max)
+        if band_max <= merge_max_zoom:
+            small = polygonal & (area < (merge_pixels * px) ** 2)
+            emit(np.flatnonzero(small & active))
+            active &= ~small
+            new = _pieces(gdf, current, np.flatnonzero(small & ~merged_small))
+            merged_small |= small
+            pieces = new if pieces is None else pd.concat([pieces, new], ignore_index=True)
+            if len(pieces):
+                pieces = _merge(pieces, band_max)
+                merged.append(pieces.assign(**{TIPPECANOE_MINZOOM: band_min, TIPPECANOE_MAXZOOM: band_max}))
+
+        idx = np.flatnonzero(active)
+        simplified = simplify_coverage(current[idx], px)
+        counts = shapely.get_num_coordinates(simplified)
+        fewer = counts < vertices[idx]
+        changed = idx[fewer]
+        emit(changed)
+        current[changed] = simplified[fewer]
+        vertices[changed] = counts[fewer]
+        row_max[changed] = band_max
+        row_min[idx] = band_min
+    emit(np.flatnonzero(active))
+
+    positions = np.concatenate([r[0] for r in rows])
+    levels = gdf.iloc[positions].copy()
+    levels[gdf.geometry.name] = gpd.GeoSeries(np.concatenate([r[1] for r in rows]), index=levels.index, crs=gdf.crs)
+    levels[TIPPECANOE_MINZOOM] = np.concatenate([r[2] for r in rows])
+    levels[TIPPECANOE_MAXZOOM] = np.concatenate([r[3] for r in rows])
+    merged = [m.rename_geometry(gdf.geometry.name) if m.geometry.name != gdf.geometry.name else m for m in merged]
+    levels = gpd.GeoDataFrame(pd.concat([levels, *merged], ignore_index=True), geometry=gdf.geometry.name,
+                              crs=gdf.crs)
+    print(f"🗺️ Zoom levels for {len(gdf)} features: {len(levels)} rows, "
+          f"{sum(len(m) for m in merged)} merged, in {time.time() - start:.1f}s")
+    return levels
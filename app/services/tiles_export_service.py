@@ -1,8 +1,17 @@
+from app.config.config_export import (PMTILES_MAX_BYTES, PMTILES_MAX_AGE, PMTILES_MIN_AGE, PMTILES_GC_INTERVAL,
+                                      PMTILES_RETRY_AFTER, TIPPECANOE_INPUT, TILE_MIN_ZOOM, TILE_MAX_ZOOM, TILE_ZOOM_BANDS)
+from app.services.file_export_service import stream_ndjson, TIPPECANOE_MINZOOM, TIPPECANOE_MAXZOOM
+from app.services.tile_levels_service import build_zoom_levels
+
 from pathlib import Path
+import contextlib
 import geopandas as gpd
 import uuid
 import os
 import subprocess
+import tempfile
+import threading
+import time
 
 from pathlib import Path
 
@@ -10,39 +19,223 @@ from pathlib import Path
 APP_DIR = Path(__file__).resolve().parents[1]   # /app/app
 STATIC_DIR = APP_DIR / "static" / "tiles"
 
-def generate_pmtiles(df, output_dir: Path = STATIC_DIR):
+# the only properties the map styles or shows in its popup; "merged" is only set on the merged
+# overview shapes of build_zoom_levels, tippecanoe drops the nulls of all other features
+TILE_ATTRIBUTES = ["osm_id", "name", "landuse_type", "leisure", "city", "area", "merged"]
+TIPPECANOE_OPTIONS = [
+    "--force",
+    "--quiet",
+    "--layer=landuse",
+    f"--minimum-zoom={TILE_MIN_ZOOM}",  # overview
+    f"--maximum-zoom={TILE_MAX_ZOOM}",  # detailed
+    # overview zooms get pre-simplified and merged features (build_zoom_levels), these only
+    # catch tiles that are still over the size limit
+    "--drop-densest-as-needed",
+    "--coalesce-densest-as-needed",
+]
+# streamed with every feature, the zoom range becomes its "tippecanoe" member
+TILE_COLUMNS = TILE_ATTRIBUTES + [TIPPECANOE_MINZOOM, TIPPECANOE_MAXZOOM]
+
+# one lock per archive name, concurrent identical requests wait for a single tippecanoe run; the
+# entry holds [lock, users] and goes away with its last user
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+# archive name -> (expires, error): builds without features (error None) or a failed tippecanoe run,
+# so the requests that waited for them and the ones right after don't load the data again
+_failed_builds = {}
+_gc_thread = None
+
+def pmtiles_path_for(key, output_dir: Path = STATIC_DIR):
+    # key: artifact key of the filter and data version, None when it could not be determined
+    stem = f"landuse_{key[:24]}" if key else f"landuse_{uuid.uuid4().hex}"
+    return output_dir / f"{stem}.pmtiles"
+
+def touch_pmtiles(path):
+    # the atime drives LRU retention, mounts with relatime would not update it on reads
+    try:
+        # nanosecond precision, the mtime is part of the archive's URL version and ETag
+        os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        return True
+    except FileNotFoundError:
+        return False
+
+@contextlib.contextmanager
+def _build_lock(name):
+    with _build_locks_guard:
+        entry = _build_locks.setdefault(name, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _build_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                _build_locks.pop(name, None)
+
+def _remember_failure(name, error):
+    now = time.monotonic()
+    with _build_locks_guard:
+        for stale in [n for n, (expires, _) in _failed_builds.items() if expires <= now]:
+            del _failed_builds[stale]
+        _failed_builds[name] = (now + PMTILES_RETRY_AFTER, error)
+
+def _recent_failure(name):
+    # (True, error) while a failed or empty build of the archive is remembered
+    with _build_locks_guard:
+        expires, error = _failed_builds.get(name, (0, None))
+    return (True, error) if expires > time.monotonic() else (False, None)
+
+def get_or_build_pmtiles(key, load_frame, output_dir: Path = STATIC_DIR):
+    # Existing archives are returned without touching Overpass or tippecanoe. load_frame() returns
+    # (df, lost) like the landuse loaders; None when it finds no features. After a failed tippecanoe
+    # run the same archive raises RuntimeError for PMTILES_RETRY_AFTER seconds without being built again.
+    pmtiles_path = pmtiles_path_for(key, output_dir)
+    if touch_pmtiles(pmtiles_path):
+        return str(pmtiles_path)
+
+    name = pmtiles_path.name
+    with _build_lock(name):
+        if touch_pmtiles(pmtiles_path):
+            return str(pmtiles_path)
+        failed, error = _recent_failure(name)
+        if failed:
+            if error is None:
+                return None
+            raise RuntimeError(f"Building {name} failed recently: {error}")
+        # errors of load_frame (Overpass, a cancelled job) are the caller's and not remembered
+        df, lost = load_frame()
+        if df.empty and not lost:
+            _remember_failure(name, None)
+            return None
+        if lost:
+            # tiles or cells are missing: served once under a throwaway name (collected like any
+            # unused archive), the next request for the filter builds the archive again
+            print(f"{lost} tiles or cells missing, {name} is not kept")
+            return generate_pmtiles(df, output_dir) if not df.empty else None
+        try:
+            return generate_pmtiles(df, output_dir, name)
+        except Exception as e:
+            _remember_failure(name, e)
+            raise
+
+def _run_tippecanoe_pipe(gdf, tmp_path):
+    # features go straight from the frame into tippecanoe's stdin, nothing is written in between
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(["tippecanoe", "-o", str(tmp_path), *TIPPECANOE_OPTIONS],
+                                stdin=subprocess.PIPE, stderr=stderr)
+        try:
+            for chunk in stream_ndjson(gdf, TILE_COLUMNS):
+                proc.stdin.write(chunk)
+            proc.stdin.close()
+        except BrokenPipeError:
+            # tippecanoe exited early, its stderr tells why
+            pass
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            returncode = proc.wait()
+        stderr.seek(0)
+        return returncode, stderr.read().decode("utf-8", "replace")
+
+def _run_tippecanoe_file(gdf, tmp_path, ndjson_path):
+    # line-delimited input lets tippecanoe split the file across its reader threads (-P)
+    with open(ndjson_path, "wb") as f:
+        for chunk in stream_ndjson(gdf, TILE_COLUMNS):
+            f.write(chunk)
+    proc = subprocess.run(["tippecanoe", "-o", str(tmp_path), "--read-parallel", *TIPPECANOE_OPTIONS,
+                           str(ndjson_path)], capture_output=True, text=True)
+    return proc.returncode, proc.stderr
+
+def generate_pmtiles(df, output_dir: Path = STATIC_DIR, filename=None, mode=TIPPECANOE_INPUT,
+                     zoom_bands=TILE_ZOOM_BANDS):
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    stem = f"landuse_{uuid.uuid4().hex}"
-    geojson_path = output_dir / f"{stem}.geojson"
-    pmtiles_path = output_dir / f"{stem}.pmtiles"
+    filename = filename or f"landuse_{uuid.uuid4().hex}.pmtiles"
+    # tippecanoe writes to a temp name, the final name only ever points at a complete archive
+    stem = f".{filename}.{uuid.uuid4().hex}"
+    ndjson_path = output_dir / f"{stem}.ndjson"
+    tmp_path = output_dir / f"{stem}.tmp.pmtiles"
+    pmtiles_path = output_dir / filename
 
-    gdf = gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
-    gdf.to_file(geojson_path, driver="GeoJSON")
+    gdf = build_zoom_levels(gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326"), zoom_bands)
 
     try:
-        proc = subprocess.run(
-            [
-                "tippecanoe",
-                "-o", str(pmtiles_path),
-                str(geojson_path),
-                "--force",
-                "--minimum-zoom=5",          # overview
-                "--maximum-zoom=14",         # detailed
-                "--drop-densest-as-needed",  # thin very dense data
-                "--coalesce-densest-as-needed"
-            ],
-            capture_output=True,
-            text=True
-        )
-        if proc.returncode != 0:
-            raise RuntimeError(f"Tippecanoe failed:\n{proc.stderr}")
-
-        with open(pmtiles_path, "rb") as f:
+        if mode == "file":
+            returncode, stderr = _run_tippecanoe_file(gdf, tmp_path, ndjson_path)
+        else:
+            returncode, stderr = _run_tippecanoe_pipe(gdf, tmp_path)
+        if returncode != 0:
+            raise RuntimeError(f"Tippecanoe failed:\n{stderr}")
+
+        with open(tmp_path, "rb") as f:
             if f.read(4) != b"PMTi":
                 raise RuntimeError(f"{pmtiles_path} is not valid PMTiles")
+        os.replace(tmp_path, pmtiles_path)
     finally:
-        if geojson_path.exists():
-            geojson_path.unlink()
+        if ndjson_path.exists():
+            ndjson_path.unlink()
+        if tmp_path.exists():
+            tmp_path.unlink()
 
     return str(pmtiles_path)
+
+def collect_pmtiles(output_dir: Path = STATIC_DIR, max_bytes=PMTILES_MAX_BYTES, max_age=PMTILES_MAX_AGE,
+                    min_age=PMTILES_MIN_AGE):
+    # Drops archives not served for max_age, then the least recently served ones until the
+    # directory is under 90% of max_bytes. Archives served within min_age are kept, their
+    # URL may just have been handed out. Leftovers of crashed builds are removed too.
+    if not output_dir.exists():
+        return 0
+    now = time.time()
+    entries, removed = [], 0
+    for path in output_dir.iterdir():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.name.startswith("."):
+            if now - stat.st_mtime > 3600:
+                path.unlink(missing_ok=True)
+            continue
+        if path.suffix != ".pmtiles":
+            continue
+        last_used = max(stat.st_atime, stat.st_mtime)
+        if now - last_used > max_age:
+            path.unlink(missing_ok=True)
+            removed += 1
+        else:
+            entries.append((last_used, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    if total > max_bytes:
+        target = max_bytes * 0.9
+        for last_used, size, path in sorted(entries):
+            if total <= target:
+                break
+            if now - last_used < min_age:
+                continue
+            path.unlink(missing_ok=True)
+            removed += 1
+            total -= size
+    if removed:
+        print(f"🧹 Removed {removed} PMTiles archives, {total / 1024 ** 2:.0f} MB left")
+    return removed
+
+def start_pmtiles_gc(output_dir: Path = STATIC_DIR, interval=PMTILES_GC_INTERVAL):
+    global _gc_thread
+    if _gc_thread is not None:
+        return _gc_thread
+
+    def run():
+        while True:
+            try:
+                collect_pmtiles(output_dir)
+            except Exception as e:
+                print(f"PMTiles collection failed: {e}")
+            time.sleep(interval)
+
+    _gc_thread = threading.Thread(target=run, name="pmtiles-gc", daemon=True)
+    _gc_thread.start()
+    return _gc_thread
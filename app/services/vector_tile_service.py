@@ -0,0 +1,108 @@
+from app.persistence.landuse_persistence import get_landuse_mvt, get_data_version
+from app.utils.boundary_registry import get_boundary_registry
+from app.utils.disk_cache import DiskCache
+from app.utils.utils import tile_bounds
+from app.config.config_export import (MVT_MIN_ZOOM, MVT_MAX_ZOOM, MVT_MEMORY_TILES, MVT_CACHE_DIR,
+                                      MVT_CACHE_MAX_BYTES, MVT_CACHE_TTL)
+
+from collections import OrderedDict
+import shapely
+import threading
+import time
+
+MVT_EXTENT = 4096
+EARTH_CIRCUMFERENCE = 40075016.686
+# the data version is re-read at most this often, not once per tile
+DATA_VERSION_TTL = 5
+
+mvt_cache = DiskCache(MVT_CACHE_DIR, MVT_CACHE_TTL, MVT_CACHE_MAX_BYTES, suffix=".mvt", compress=False)
+
+class TileLRU:
+    # In-process LRU in front of the disk cache, hot tiles never touch the filesystem
+
+    def __init__(self, max_tiles):
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._tiles.get(key)
+            if data is not None:
+                self._tiles.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._tiles[key] = data
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+memory_tiles = TileLRU(MVT_MEMORY_TILES)
+_data_version = (None, 0.0)
+_data_version_lock = threading.Lock()
+
+def current_data_version():
+    global _data_version
+    with _data_version_lock:
+        version, read_at = _data_version
+        if version is None or time.monotonic() - read_at > DATA_VERSION_TTL:
+            version = get_data_version()
+            _data_version = (version, time.monotonic())
+        return version
+
+def simplify_tolerance(z):
+    # one tile unit in web-mercator metres, finer detail disappears in the MVT grid anyway
+    return EARTH_CIRCUMFERENCE / 2 ** z / MVT_EXTENT
+
+def area_geometry(area):
+    # lon/lat geometry of a ("bbox", (south, west, north, east)) or ("bundesland", name) area
+    kind, value = area
+    if kind == "bbox":
+        south, west, north, east = value
+        return shapely.box(west, south, east, north)
+    boundary = get_boundary_registry().geometry(value)
+    if boundary is None:
+        raise ValueError(f"Unknown bundesland {value}")
+    return boundary
+
+def _area_in_tile(area, bounds):
+    # (intersects, wkb): the part of the area inside the tile, None when the tile lies inside it
+    # completely and needs no test per feature
+    geometry = area_geometry(area)
+    tile = shapely.box(*bounds)
+    shapely.prepare(geometry)
+    if not geometry.intersects(tile):
+        return False, None
+    if geometry.contains(tile):
+        return True, None
+    return True, shapely.to_wkb(geometry.intersection(tile))
+
+def get_vector_tile(z, x, y, landuse_type, geometry_type, area=None):
+    # (tile bytes, cache key); empty bytes for tiles without features, outside the area or outside
+    # MVT_MIN_ZOOM..MVT_MAX_ZOOM. Without an area the tile shows everything in the store.
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise ValueError(f"Tile {z}/{x}/{y} does not exist")
+    landuse_type = (landuse_type or "all").lower()
+    geometry_type = str(geometry_type).lower()
+    area_key = "" if area is None else f"{area[0]}={str(area[1]).lower()}"
+    key = DiskCache.key(f"{z}/{x}/{y}|{landuse_type}|{geometry_type}|{area_key}|{current_data_version()}")
+    if not (MVT_MIN_ZOOM <= z <= MVT_MAX_ZOOM):
+        return b"", key
+
+    data = memory_tiles.get(key)
+    if data is not None:
+        return data, key
+    data = mvt_cache.get(key)
+    if data is None:
+        bounds = tile_bounds(x, y, z)
+        intersects, area_wkb = _area_in_tile(area, bounds) if area is not None else (True, None)
+        if not intersects:
+            return b"", key
+        data = get_landuse_mvt(z, x, y, bounds, landuse_type, geometry_type,
+                               simplify_tolerance(z), extent=MVT_EXTENT, area_wkb=area_wkb)
+        # empty tiles are cached too, most of a state's tiles at high zoom have nothing in them
+        mvt_cache.put(key, data)
+    memory_tiles.put(key, data)
+    return data, key
@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+class AdaptiveLimiter:
+    # Concurrency limit for Overpass requests: grows by one slot per `limit` successes,
+    # halves on a 429/504 and pauses everyone for Retry-After when the server asks for it.
+
+    def __init__(self, initial, maximum, minimum=1):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.in_flight = 0
+        self.throttled = 0
+        self._paused_until = 0.0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            while self.in_flight >= int(self.limit):
+                await self._cond.wait()
+            self.in_flight += 1
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def succeed(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def throttle(self, retry_after=None):
+        self.throttled += 1
+        self.limit = max(self.minimum, self.limit / 2)
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
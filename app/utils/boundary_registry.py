@@ -0,0 +1,106 @@
+from pathlib import Path
+import json
+import os
+import threading
+import geopandas as gpd
+import shapely
+from shapely import Point, Polygon, MultiPolygon, STRtree
+
+BOUNDARY_JSON = Path("data") / "bundesland_boundaries.json"
+BOUNDARY_COMPILED = Path("data") / "bundesland_boundaries.parquet"
+
+def _parse_boundary_json(json_file):
+    with open(json_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    rows = []
+    for item in data["features"]:
+        properties = item.get("properties")
+        geometry = item.get("geometry")
+        coords = geometry["coordinates"]
+        if geometry["type"] == "Polygon" and coords:
+            geom = Polygon(coords[0])
+        elif geometry["type"] == "MultiPolygon":
+            geom = MultiPolygon([Polygon(part[0]) for part in coords])
+        else:
+            continue
+        rows.append({"id": properties["id"], "bundesland": properties["name"], "geometry": geom})
+
+    gdf = gpd.GeoDataFrame(rows, geometry="geometry", crs="EPSG:4326")
+    # one reprojection for all states instead of one per state
+    gdf["area"] = gdf.geometry.to_crs("EPSG:3857").area
+    gdf[["minx", "miny", "maxx", "maxy"]] = gdf.geometry.bounds.values
+    return gdf[["id", "bundesland", "area", "minx", "miny", "maxx", "maxy", "geometry"]]
+
+def compile_boundaries(json_file=BOUNDARY_JSON, compiled_file=BOUNDARY_COMPILED):
+    gdf = _parse_boundary_json(json_file)
+    gdf.to_parquet(compiled_file, index=False)
+    return compiled_file
+
+class BoundaryRegistry:
+    # Loaded once per process and reloaded only when the boundary file changes on disk
+
+    def __init__(self, json_file=BOUNDARY_JSON, compiled_file=BOUNDARY_COMPILED):
+        self.json_file = Path(json_file)
+        self.compiled_file = Path(compiled_file)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._gdf = None
+        self._tree = None
+        self._rows = []
+        self._names = []
+        self._by_name = {}
+
+    def _load(self, mtime):
+        compiled = self.compiled_file
+        if compiled.exists() and compiled.stat().st_mtime_ns >= mtime:
+            gdf = gpd.read_parquet(compiled)
+        else:
+            gdf = _parse_boundary_json(self.json_file)
+
+        shapely.prepare(gdf.geometry.values)
+        self._tree = STRtree(gdf.geometry.values)
+        self._rows = gdf.to_dict("records")
+        self._names = [row["bundesland"] for row in self._rows]
+        self._by_name = {name.lower(): row for name, row in zip(self._names, self._rows)}
+        self._gdf = gdf
+        self._mtime = mtime
+        print(f"Loaded {len(gdf)} bundesland boundaries")
+
+    def _ensure_loaded(self):
+        mtime = os.stat(self.json_file).st_mtime_ns
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load(mtime)
+        return self._gdf
+
+    def frame(self):
+        return self._ensure_loaded()
+
+    def get(self, name):
+        # row dict with id, bundesland, area, minx/miny/maxx/maxy and the prepared geometry
+        self._ensure_loaded()
+        return self._by_name.get(str(name).lower())
+
+    def geometry(self, name):
+        row = self.get(name)
+        return None if row is None else row["geometry"]
+
+    def find_by_point(self, lon, lat):
+        self._ensure_loaded()
+        idx = self._tree.query(Point(lon, lat), predicate="intersects")
+        return [self._names[i] for i in sorted(idx)]
+
+    def find_by_bbox(self, bounds):
+        self._ensure_loaded()
+        idx = self._tree.query(shapely.box(*bounds), predicate="intersects")
+        return [self._names[i] for i in sorted(idx)]
+
+_registry = BoundaryRegistry()
+
+def get_boundary_registry():
+    return _registry
+
+if __name__ == "__main__":
+    print(f"Compiled boundaries → {compile_boundaries()}")
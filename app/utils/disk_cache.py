@@ -0,0 +1,166 @@
+from pathlib import Path
+import gzip
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+class DiskCache:
+    # Content-addressed files under one directory. The mtime is the write time (TTL),
+    # the atime is bumped on every hit and drives LRU eviction once max_bytes is exceeded.
+
+    def __init__(self, directory, ttl, max_bytes, suffix=".gz", compress=True):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.compress = compress
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return self.directory / key[:2] / f"{key}{self.suffix}"
+
+    def _expired(self, stat, now):
+        return self.ttl is not None and now - stat.st_mtime > self.ttl
+
+    def lookup(self, key):
+        # Path of a fresh entry (counted as a hit) or None
+        path = self.path(key)
+        now = time.time()
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._count(hit=False)
+            return None
+        if self._expired(stat, now):
+            self._remove(path, stat.st_size)
+            self._count(hit=False)
+            return None
+        os.utime(path, (now, stat.st_mtime))
+        self._count(hit=True)
+        return path
+
+    def get(self, key):
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        return gzip.decompress(data) if self.compress else data
+
+    def put(self, key, data: bytes):
+        writer = self.writer(key)
+        writer.write(data)
+        return writer.commit()
+
+    def writer(self, key, compresslevel=6):
+        # for payloads that are streamed into the cache chunk by chunk
+        return CacheWriter(self, key, compresslevel)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _track(self, size):
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+            over_budget = self._size is None or self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def _remove(self, path, size):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self.evictions += 1
+            if self._size is not None:
+                self._size -= size
+
+    def _entries(self):
+        if not self.directory.exists():
+            return []
+        entries = []
+        for path in self.directory.glob(f"*/*{self.suffix}"):
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for path, stat in self._entries():
+            if self._expired(stat, now):
+                self._remove(path, stat.st_size)
+            else:
+                entries.append((path, stat))
+
+        total = sum(stat.st_size for _, stat in entries)
+        if total > self.max_bytes:
+            # least recently used first, down to 90% of the budget
+            target = self.max_bytes * 0.9
+            for path, stat in sorted(entries, key=lambda e: e[1].st_atime):
+                if total <= target:
+                    break
+                self._remove(path, stat.st_size)
+                total -= stat.st_size
+        with self._lock:
+            self._size = total
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "bytes": self._size}
+
+class CacheWriter:
+    # Writes to a temp file next to the entry; commit() publishes it atomically, discard() drops it
+
+    def __init__(self, cache, key, compresslevel):
+        self.cache = cache
+        self.path = cache.path(key)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.tmp")
+        self._raw = open(self.tmp_path, "wb")
+        self._file = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=compresslevel) \
+            if cache.compress else self._raw
+
+    def write(self, data: bytes):
+        self._file.write(data)
+
+    def _close(self):
+        if self._file is not self._raw:
+            self._file.close()
+        self._raw.close()
+
+    def commit(self):
+        self._close()
+        size = self.tmp_path.stat().st_size
+        os.replace(self.tmp_path, self.path)
+        self.cache._track(size)
+        return self.path
+
+    def discard(self):
+        self._close()
+        try:
+            self.tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+
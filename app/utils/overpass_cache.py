@@ -0,0 +1,22 @@
+import json
+from app.config.config_overpass import OVERPASS_CACHE_DIR, OVERPASS_CACHE_TTL, OVERPASS_CACHE_MAX_BYTES
+from app.utils.disk_cache import DiskCache
+
+overpass_cache = DiskCache(OVERPASS_CACHE_DIR, OVERPASS_CACHE_TTL, OVERPASS_CACHE_MAX_BYTES, suffix=".json.gz")
+
+def overpass_cache_key(overpass_query):
+    # whitespace and indentation differ between the query builders, the query itself doesn't
+    return overpass_cache.key(" ".join(overpass_query.split()))
+
+def payload_remark(raw: bytes):
+    # Overpass reports server-side timeouts/out-of-memory as a 200 with a "remark", which
+    # follows the elements array, so only the tail of the raw payload has to be decoded
+    start = raw.rfind(b'"remark"', max(0, len(raw) - 4096))
+    if start < 0:
+        return None
+    tail = raw[start + len(b'"remark"'):].decode("utf-8", "replace").lstrip().lstrip(":").lstrip()
+    try:
+        remark, _ = json.JSONDecoder().raw_decode(tail)
+    except ValueError:
+        return None
+    return remark if isinstance(remark, str) else None
@@ -0,0 +1,79 @@
+from app.config.config_overpass import BBOX_PRECISION
+
+import shapely
+
+QUERY_TIMEOUT = 60
+# longer poly filters are simplified (outward) until they fit, Overpass parses every vertex per statement
+POLY_MAX_VERTICES = 200
+
+# landuse_type values of features without a landuse tag, named after the tag they carry instead
+# (the PBF ingest keeps natural/leisure areas); "all" stays every feature with a landuse tag
+UNTAGGED_LANDUSE_TYPES = ("natural", "leisure")
+
+# The parser keeps elements with a landuse tag (or an untagged type's tag) only, so nothing else is
+# requested. Geometry comes inline with `out geom`; no `>;` recursion, which would send every member
+# node a second time.
+ELEMENT_TYPES = {
+    "point": ("node",),
+    "polygon": ("way", 'relation["type"="multipolygon"]'),
+    "all": ("node", "way", "relation"),
+}
+
+def _geometry_key(geometry_type):
+    geometry_type = str(geometry_type).lower()
+    if geometry_type in ("polygon", "multipolygon"):
+        return "polygon"
+    return "point" if geometry_type == "point" else "all"
+
+def untagged_landuse_type(tags):
+    # landuse_type of an element without a landuse tag, None when it has none of the untagged types
+    return next((key for key in UNTAGGED_LANDUSE_TYPES if tags.get(key)), None)
+
+def _landuse_filter(landuse_type):
+    landuse_type = str(landuse_type).lower()
+    if landuse_type == "all":
+        return '["landuse"]'
+    if landuse_type in UNTAGGED_LANDUSE_TYPES:
+        # the same precedence as untagged_landuse_type: leisure only where natural is missing too
+        before = UNTAGGED_LANDUSE_TYPES[:UNTAGGED_LANDUSE_TYPES.index(landuse_type)]
+        return f'["{landuse_type}"][!"landuse"]' + "".join(f'[!"{key}"]' for key in before)
+    return f'["landuse"="{landuse_type}"]'
+
+def _bbox_filter(bounds):
+    min_x, min_y, max_x, max_y = (round(c, BBOX_PRECISION) for c in bounds)
+    return f"({min_y},{min_x},{max_y},{max_x})"
+
+def _poly_ring(polygon):
+    # exterior ring only (a poly filter has no holes), simplified with an outward buffer so the
+    # filter still covers the whole part
+    tolerance = 10 ** -(BBOX_PRECISION - 1)
+    while True:
+        ring = polygon.buffer(tolerance, join_style="mitre").simplify(tolerance)
+        if shapely.get_num_coordinates(ring.exterior) <= POLY_MAX_VERTICES + 1:
+            break
+        tolerance *= 2
+    coords = list(ring.exterior.coords)[:-1]
+    return " ".join(f"{round(y, BBOX_PRECISION)} {round(x, BBOX_PRECISION)}" for x, y in coords)
+
+def area_filters(area, boundary=None):
+    # One filter per part: a bbox when the area is rectangular or lies inside the boundary,
+    # poly filters for the parts of the area that the boundary cuts
+    if boundary is not None and not boundary.contains(area):
+        area = shapely.intersection(area, boundary)
+    if area.is_empty:
+        return []
+    if area.equals(shapely.envelope(area)):
+        return [_bbox_filter(area.bounds)]
+    parts = [p for p in shapely.get_parts(area) if p.geom_type == "Polygon" and p.area > 0]
+    return [f'(poly:"{_poly_ring(p)}")' for p in parts]
+
+def build_overpass_query(area, landuse_type, geometry_type, boundary=None, timeout=QUERY_TIMEOUT):
+    # area: shapely geometry (a cell, tile or bbox box); boundary: state polygon the area is cut to.
+    # Returns None when nothing of the area lies inside the boundary.
+    filters = area_filters(area, boundary)
+    if not filters:
+        return None
+    landuse_filter = _landuse_filter(landuse_type)
+    statements = "\n".join(f"  {element}{landuse_filter}{f};"
+                           for element in ELEMENT_TYPES[_geometry_key(geometry_type)] for f in filters)
+    return f"[out:json][timeout:{timeout}];\n(\n{statements}\n);\nout geom qt;\n"
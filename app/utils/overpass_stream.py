@@ -0,0 +1,114 @@
+import codecs
+import gzip
+import json
+import re
+
+ELEMENT_BATCH_SIZE = 5000
+CHUNK_SIZE = 1 << 16
+
+_ELEMENTS_RE = re.compile(r'"elements"\s*:\s*\[')
+_SKIP = " \t\r\n,"
+# characters of a literal/number/escape sequence a chunk boundary can leave unfinished
+_TRUNCATED_TAIL = 8
+
+class OverpassElementDecoder:
+    # Incremental decoder for the "elements" array of an Overpass JSON response: feed() takes raw
+    # byte chunks as they arrive and returns the elements completed so far, so only the element
+    # being received is ever held as text. close() raises ValueError when the response ended before
+    # the closing "]"; a malformed element raises as soon as it is seen.
+
+    def __init__(self):
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        # text received while an incomplete element waits for more, joined only once there is enough
+        self._parts = []
+        self._pending = 0
+        self._wait_for = 0
+        self._in_array = False
+        self.done = False
+
+    def feed(self, chunk: bytes, final=False):
+        text = self._text.decode(chunk, final)
+        if self.done:
+            return []
+        self._parts.append(text)
+        self._pending += len(text)
+        # an element that did not parse is retried once the text after it has doubled, not on every
+        # chunk, so large elements are decoded a bounded number of times
+        if self._pending < self._wait_for and not final:
+            return []
+        self._buf = self._buf[self._pos:] + "".join(self._parts)
+        self._pos = 0
+        self._parts = []
+        self._wait_for = 0
+        elements = list(self._drain())
+        self._pending = len(self._buf) - self._pos
+        return elements
+
+    def close(self):
+        elements = self.feed(b"", final=True)
+        if not self._in_array:
+            raise ValueError("Overpass response has no elements array")
+        if not self.done:
+            raise ValueError("Overpass response ended inside the elements array")
+        return elements
+
+    def _drain(self):
+        buf = self._buf
+        if not self._in_array:
+            match = _ELEMENTS_RE.search(buf)
+            if match is None:
+                # keep a short tail in case the key is split across chunks
+                self._pos = max(0, len(buf) - 64)
+                return
+            self._pos = match.end()
+            self._in_array = True
+
+        while not self.done:
+            pos = self._pos
+            while pos < len(buf) and buf[pos] in _SKIP:
+                pos += 1
+            self._pos = pos
+            if pos >= len(buf):
+                return
+            if buf[pos] == "]":
+                self.done = True
+                self._pos = pos + 1
+                return
+            try:
+                element, end = self._decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if not _truncated(e, len(buf)):
+                    raise ValueError(f"Malformed element in Overpass response at offset {e.pos - pos}: {e.msg}")
+                self._wait_for = 2 * (len(buf) - pos)
+                return
+            self._pos = end
+            yield element
+
+def _truncated(error, length):
+    # JSON cut off by the chunk boundary fails at its very end (a partial literal, number or escape)
+    # or in a string that has no closing quote yet; errors anywhere else are malformed input
+    return error.msg.startswith("Unterminated string") or error.pos >= length - _TRUNCATED_TAIL
+
+def iter_element_batches(chunks, batch_size=ELEMENT_BATCH_SIZE):
+    decoder = OverpassElementDecoder()
+    batch = []
+    for chunk in chunks:
+        for element in decoder.feed(chunk):
+            batch.append(element)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    batch.extend(decoder.close())
+    if batch:
+        yield batch
+
+def iter_gzip_chunks(path, chunk_size=CHUNK_SIZE):
+    with gzip.open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
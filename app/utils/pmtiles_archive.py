@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from pathlib import Path
+import mmap
+import os
+import struct
+import threading
+
+HEADER_LENGTH = 127
+# pmtiles clients fetch the first 16 KiB (header + root directory) in one request
+HEAD_FETCH_LENGTH = 16384
+MAX_CACHED_LEAVES = 256
+MAX_OPEN_ARCHIVES = 64
+
+class PMTilesArchive:
+    # Memory-mapped PMTiles v3 archive. The header/root directory block and recently read leaf
+    # directories are kept as bytes, tile data is sliced straight from the map.
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.length = len(self._mm)
+
+        header = self._mm[:HEADER_LENGTH]
+        if len(header) < HEADER_LENGTH or header[:7] != b"PMTiles" or header[7] != 3:
+            raise ValueError(f"{self.path.name} is not a PMTiles v3 archive")
+        root_offset, root_length, _, _, leaf_offset, leaf_length = struct.unpack_from("<6Q", header, 8)
+
+        self._head = bytes(self._mm[:min(self.length, max(HEAD_FETCH_LENGTH, root_offset + root_length))])
+        self._leaf_range = (leaf_offset, leaf_offset + leaf_length)
+        self._leaves = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return f"{self.stat.st_mtime_ns:x}"
+
+    @property
+    def etag(self):
+        return f"{self.path.stem}-{self.version}-{self.length}"
+
+    def read(self, start, stop):
+        # bytes [start, stop) without touching the file descriptor
+        if stop <= len(self._head):
+            return self._head[start:stop]
+        leaf_start, leaf_stop = self._leaf_range
+        if leaf_start <= start and stop <= leaf_stop:
+            with self._lock:
+                data = self._leaves.get((start, stop))
+                if data is not None:
+                    self._leaves.move_to_end((start, stop))
+                    return data
+            data = self._mm[start:stop]
+            with self._lock:
+                self._leaves[(start, stop)] = data
+                while len(self._leaves) > MAX_CACHED_LEAVES:
+                    self._leaves.popitem(last=False)
+            return data
+        return self._mm[start:stop]
+
+    def iter_bytes(self, start, stop, chunk_size=1 << 20):
+        for offset in range(start, stop, chunk_size):
+            yield self.read(offset, min(offset + chunk_size, stop))
+
+_archives = OrderedDict()
+_archives_lock = threading.Lock()
+
+def open_archive(path):
+    # Archives stay mapped across requests; a rebuilt file (new mtime/size) is mapped again.
+    # Raises FileNotFoundError or ValueError.
+    path = Path(path)
+    stat = path.stat()
+    with _archives_lock:
+        archive = _archives.get(path)
+        if archive is not None and (archive.stat.st_mtime_ns, archive.stat.st_size) == (stat.st_mtime_ns,
+                                                                                          stat.st_size):
+            _archives.move_to_end(path)
+            return archive
+
+    # evicted maps are closed by the garbage collector once no request reads from them anymore
+    archive = PMTilesArchive(path)
+    with _archives_lock:
+        _archives[path] = archive
+        while len(_archives) > MAX_OPEN_ARCHIVES:
+            _archives.popitem(last=False)
+    return archive
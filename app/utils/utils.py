@@ -6,247 +6,236 @@ import geopandas as gpd
 from shapely import Polygon, MultiPolygon
 import math
 from shapely.geometry import box, shape, LineString, Point, Polygon
+import shapely
+import numpy as np
 import uuid
+from app.utils.boundary_registry import get_boundary_registry
+from app.utils.overpass_cache import overpass_cache, overpass_cache_key, payload_remark
+from app.utils.overpass_stream import iter_element_batches, iter_gzip_chunks, CHUNK_SIZE
+from app.utils.overpass_query import build_overpass_query, untagged_landuse_type
+from app.config.config_overpass import OVERPASS_URL, GRID_SIZES_FILE
 
     
-def get_landuse_data(bbox, landuse_type, geometry_type):
-    landuse_type = landuse_type.lower()
-    geometry_type = str(geometry_type).lower()
-
-    # Base filter
-    landuse_filter = f'["landuse"="{landuse_type}"]' if landuse_type != "all" else '["landuse"]'
-
-    # Geometry handling
-    if geometry_type == "point":
-        overpass_query = f"""
-        [out:json][timeout:30];
-        node{landuse_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-        out geom;
-        """
-
-    elif geometry_type in ["polygon", "multipolygon"]:
-        overpass_query = f"""
-        [out:json][timeout:30];
-        (
-        way{landuse_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-        relation{landuse_filter}["type"="multipolygon"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-        );
-        out geom; >; out qt;
-        """
-
-    elif geometry_type == "all":
-        if landuse_type == "all":
-            
-            overpass_query = f"""
-            [out:json][timeout:30];
-            (
-            node["landuse"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            way["landuse"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            relation["landuse"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            way["natural"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            relation["natural"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            way["leisure"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            relation["leisure"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            );
-            out geom; >; out qt;
-            """
-        else:
-            
-            overpass_query = f"""
-            [out:json][timeout:30];
-            (
-            node{landuse_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            way{landuse_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            relation{landuse_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            );
-            out geom; >; out qt;
-            """
-
-    url = "https://overpass-api.de/api/interpreter"
-    response = requests.post(url, data={"data": overpass_query}, timeout=600)
+def stream_overpass_query(overpass_query):
+    # The response is decoded element batch by element batch while it downloads (and is written
+    # compressed to the cache at the same time), so peak memory follows the batch size, not the payload.
+    key = overpass_cache_key(overpass_query)
+    cached_path = overpass_cache.lookup(key)
+    if cached_path is not None:
+        return parse_overpass_file(cached_path)
+
+    response = requests.post(OVERPASS_URL, data={"data": overpass_query}, timeout=600, stream=True)
 
     if response.status_code != 200:
         raise Exception(f"Overpass API error: {response.status_code}")
 
-    return response.json()
+    writer = overpass_cache.writer(key)
+    tail = b""
 
+    def chunks():
+        nonlocal tail
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            writer.write(chunk)
+            tail = (tail + chunk)[-4096:]
+            yield chunk
 
-def get_landuse_data_by_bundesland(bundesland_ip,landuse_type,geometry_type):
-    landuse_type = landuse_type.lower()
-    geometry_type = str(geometry_type).lower()
-    
-    bundesland_df = load_bundesland_boundaries()
-    bundesland_gdf = gpd.GeoDataFrame(bundesland_df, geometry="geometry", crs="EPSG:4326")
-    selected_row = bundesland_gdf[bundesland_gdf['bundesland'].str.lower() == bundesland_ip.lower()]
-    
-    if selected_row.empty:
-        raise ValueError(f"{bundesland_ip} not found")
-    boundary = selected_row.geometry.unary_union
-    min_x, min_y, max_x, max_y = boundary.bounds
-    bbox = [min_y, min_x, max_y, max_x]
-    print(f"print bindesand bbox:{bbox}")
-    
-    
-    # Base filter
-    landuse_filter = f'["landuse"="{landuse_type}"]' if landuse_type != "all" else '["landuse"]'
-
-    # Geometry handling
-    if geometry_type == "point":
-        overpass_query = f"""
-        [out:json][timeout:30];
-        node{landuse_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-        out geom;
-        """
-
-    elif geometry_type in ["polygon", "multipolygon"]:
-        overpass_query = f"""
-        [out:json][timeout:30];
-        (
-        way{landuse_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-        relation{landuse_filter}["type"="multipolygon"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-        );
-        out geom; >; out qt;
-        """
-
-    elif geometry_type == "all":
-        if landuse_type == "all":
-            
-            overpass_query = f"""
-            [out:json][timeout:30];
-            (
-            node["landuse"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            way["landuse"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            relation["landuse"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            way["natural"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            relation["natural"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            way["leisure"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            relation["leisure"]({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            );
-            out geom; >; out qt;
-            """
-        else:
-            
-            overpass_query = f"""
-            [out:json][timeout:30];
-            (
-            node{landuse_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            way{landuse_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            relation{landuse_filter}({bbox[0]},{bbox[1]},{bbox[2]},{bbox[3]});
-            );
-            out geom; >; out qt;
-            """
-    
-    url = "https://overpass-api.de/api/interpreter"
-    response = requests.post(url, data={"data": overpass_query}, timeout=600)
+    try:
+        gdf = parse_element_batches(iter_element_batches(chunks()))
+    except Exception:
+        writer.discard()
+        raise
+    finally:
+        response.close()
 
-    if response.status_code != 200:
-        raise Exception(f"Overpass API error: {response.status_code}")
+    remark = payload_remark(tail)
+    if remark and "error" in remark.lower():
+        writer.discard()
+        raise Exception(f"Overpass API error: {remark}")
+    writer.commit()
+    return gdf
 
-    return response.json()
+def get_landuse_data(bbox, landuse_type, geometry_type):
+    # bbox in Overpass order (south, west, north, east)
+    south, west, north, east = (float(c) for c in bbox)
+    return stream_overpass_query(build_overpass_query(box(west, south, east, north), landuse_type, geometry_type))
 
-def load_bundesland_boundaries():  
-    json_file = os.path.join("data","bundesland_boundaries.json")
-    with open(json_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
-    rows = []
-    for item in data['features']:
-        properties = item.get('properties')
-        id = properties['id']
-        bundesland = properties['name']
-        print(bundesland)
-        geometry = item.get('geometry')
-        
-        coords =  geometry["coordinates"]
-        if geometry['type'] == 'Polygon' and coords:
-            geom = Polygon(coords[0])
-        elif geometry['type'] == 'MultiPolygon':
-            geom = MultiPolygon([Polygon(part[0]) for part in coords])
+def load_bundesland_boundaries():
+    return get_boundary_registry().frame()[["id", "bundesland", "area", "geometry"]]
+
+LANDUSE_FRAME_COLUMNS = ["id", "osm_id", "osm_type", "name", "landuse_type", "leisure", "city", "area", "geometry"]
+
+def empty_landuse_frame():
+    return gpd.GeoDataFrame({c: [] for c in LANDUSE_FRAME_COLUMNS}, geometry="geometry", crs="EPSG:4326")
+
+def assemble_multipolygon(outer_lines, inner_lines=()):
+    # Relation rings are usually split over several member ways, polygonize stitches them back together
+    outer = shapely.union_all(shapely.get_parts(shapely.polygonize(outer_lines)))
+    if inner_lines:
+        outer = outer.difference(shapely.union_all(shapely.get_parts(shapely.polygonize(inner_lines))))
+    return None if outer.is_empty else outer
+
+def _relation_geometry(item):
+    outer_lines, inner_lines = [], []
+    for member in item.get("members", []):
+        pts = [pt for pt in member.get("geometry") or [] if pt]
+        if member.get("type") != "way" or len(pts) < 2:
+            continue
+        line = LineString([(pt["lon"], pt["lat"]) for pt in pts])
+        (inner_lines if member.get("role") == "inner" else outer_lines).append(line)
+    if not outer_lines:
+        return None
+    return assemble_multipolygon(outer_lines, inner_lines)
+
+def parse_overpass_elements(elements):
+    # Coordinates of all nodes/ways are collected into flat arrays first and turned into
+    # geometries with one shapely call per geometry kind, areas with a single reprojection.
+    attrs = {c: [] for c in LANDUSE_FRAME_COLUMNS if c not in ("id", "area", "geometry")}
+    point_pos, point_xy = [], []
+    line_pos, line_x, line_y, line_idx = [], [], [], []
+    poly_pos, poly_x, poly_y, poly_idx = [], [], [], []
+    other_pos, other_geoms = [], []
+
+    for item in elements:
+        tags = item.get("tags")
+        landuse_type = tags and (tags.get("landuse") or untagged_landuse_type(tags))
+        if not landuse_type:
+            continue
+
+        osm_type = item.get("type")
+        pts = item.get("geometry") or []
+        pos = len(attrs["osm_id"])
+
+        if osm_type == "node":
+            if "lat" in item:
+                point_xy.append((item["lon"], item["lat"]))
+            elif pts:
+                point_xy.append((pts[0]["lon"], pts[0]["lat"]))
+            else:
+                continue
+            point_pos.append(pos)
+        elif osm_type in ("way", "relation") and pts and None not in pts:
+            closed = len(pts) >= 4 and pts[0]["lon"] == pts[-1]["lon"] and pts[0]["lat"] == pts[-1]["lat"]
+            if closed:
+                poly_idx.extend([len(poly_pos)] * len(pts))
+                poly_x.extend([pt["lon"] for pt in pts])
+                poly_y.extend([pt["lat"] for pt in pts])
+                poly_pos.append(pos)
+            elif osm_type == "way" and len(pts) >= 2:
+                line_idx.extend([len(line_pos)] * len(pts))
+                line_x.extend([pt["lon"] for pt in pts])
+                line_y.extend([pt["lat"] for pt in pts])
+                line_pos.append(pos)
+            else:
+                continue
+        elif osm_type == "relation":
+            geom = _relation_geometry(item)
+            if geom is None:
+                continue
+            other_pos.append(pos)
+            other_geoms.append(geom)
         else:
             continue
-        
-        area = None
-        if geom.geom_type in ["Polygon", "MultiPolygon"]:
-            temp_gdf = gpd.GeoDataFrame([{"geometry": geom}], crs="EPSG:4326").to_crs("EPSG:3857")
-            area = temp_gdf['geometry'].area.values[0]
-            
-        rows.append({
-            'id':id,
-            'bundesland': bundesland,
-            'area' : area,
-            'geometry': geom
-        })
-        df = pd.DataFrame(rows)
-    print(df)
-    return df
-
-def parse_overpass_json_data(json_data):   
-    data = []
-    
-    elements = []
+
+        attrs["osm_id"].append(item.get("id"))
+        attrs["osm_type"].append(osm_type)
+        attrs["name"].append(tags.get("name") or None)
+        attrs["landuse_type"].append(landuse_type)
+        attrs["leisure"].append(tags.get("leisure") or None)
+        attrs["city"].append(tags.get("addr:city") or tags.get("is_in"))
+
+    count = len(attrs["osm_id"])
+    if count == 0:
+        return empty_landuse_frame()
+
+    geoms = np.empty(count, dtype=object)
+    if point_pos:
+        geoms[point_pos] = shapely.points(np.array(point_xy))
+    if line_pos:
+        geoms[line_pos] = shapely.linestrings(line_x, line_y, indices=line_idx)
+    if poly_pos:
+        geoms[poly_pos] = shapely.polygons(shapely.linearrings(poly_x, poly_y, indices=poly_idx))
+    if other_pos:
+        geoms[other_pos] = other_geoms
+
+    geometry = gpd.GeoSeries(geoms, crs="EPSG:4326")
+    polygonal = geometry.geom_type.isin(["Polygon", "MultiPolygon"]).values
+    area = np.full(count, np.nan)
+    if polygonal.any():
+        area[polygonal] = geometry[polygonal].to_crs("EPSG:3857").area.values
+
+    batch_id = uuid.uuid4().hex
+    return gpd.GeoDataFrame({
+        "id": [f"{batch_id}_{i}" for i in range(count)],
+        **attrs,
+        "area": area,
+        "geometry": geometry,
+    }, geometry="geometry", crs="EPSG:4326")
+
+def parse_element_batches(batches):
+    frames = [gdf for gdf in (parse_overpass_elements(batch) for batch in batches) if not gdf.empty]
+    if not frames:
+        return empty_landuse_frame()
+    gdf = pd.concat(frames, ignore_index=True)
+    return gpd.GeoDataFrame(gdf, geometry="geometry", crs="EPSG:4326")
+
+def parse_overpass_file(path):
+    # gzip-compressed response as stored by the Overpass cache
+    return parse_element_batches(iter_element_batches(iter_gzip_chunks(path)))
+
+def parse_overpass_json_data(json_data):
     if isinstance(json_data, dict) and "elements" in json_data:
         elements = json_data["elements"]
     elif isinstance(json_data, list):
         elements = json_data
     else:
-        return pd.DataFrame()
-        
-    for item in elements: 
-        tags = item.get("tags")        
-        if not tags or "landuse" not in tags:
-            continue      
-         
-       # Geometry of landuse 
-        coords = [(pt["lon"],pt["lat"]) for pt in item.get("geometry",[])]
-        if not coords:
-           continue
-        
-        if item["type"] == "node":
-            geom = Point(coords) if coords else None
-        elif item["type"] == "way":
-            if coords[0] == coords[-1] and len(coords) >=4:
-                geom = Polygon(coords)
-            elif coords:
-                geom = LineString(coords) 
-        elif item["type"] == "relation": 
-            if coords and coords[0] == coords[-1] and len(coords) >= 4:
-                geom = Polygon(coords)  
-            else:
-                geom = None
-        else:
-            geom = None
-
-        area = None
-        if geom.geom_type in ["Polygon", "MultiPolygon"]:
-            temp_gdf = gpd.GeoDataFrame([{"geometry": geom}], crs="EPSG:4326").to_crs("EPSG:3857")
-            area = temp_gdf['geometry'].area.values[0]
-                
-        data.append({
-            "id": str(uuid.uuid1()),
-            "osm_id": item.get("id"),
-            "name": tags.get("name") or None,
-            "landuse_type" : tags["landuse"],
-            "leisure": tags.get("leisure") or None,
-            "city": tags.get("addr:city") or tags.get("is_in"),
-            "area" : area,
-            "geometry" : geom
-        })
-        
-        df = pd.DataFrame(data)
-        
-        if df is None:
-            print(f"df in parse json:{df}")
-    
-    return df
+        return empty_landuse_frame()
+    return parse_overpass_elements(elements)
+
+
+def _grid_region(bundesland, landuse_type):
+    return f"{str(bundesland).lower()}|{landuse_type}"
+
+def _load_grid_sizes():
+    try:
+        with open(GRID_SIZES_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
 
+def grid_cell_key(cell):
+    # a base cell of the state grid by its corner and size, a different grid gets different keys
+    min_x, min_y, max_x, _ = cell.bounds
+    return f"{min_x:.4f},{min_y:.4f},{max_x - min_x:.4f}"
+
+def get_learned_depths(bundesland, landuse_type):
+    # grid_cell_key -> how often that base cell is split up front, learned from earlier runs
+    depths = _load_grid_sizes().get(_grid_region(bundesland, landuse_type))
+    # files from before per-cell learning hold one size per state, they are ignored
+    return depths if isinstance(depths, dict) else {}
+
+def remember_depths(bundesland, landuse_type, depths):
+    # replaces the state's entry, cells of an older grid and cells back at depth 0 are dropped
+    sizes = _load_grid_sizes()
+    depths = {key: depth for key, depth in depths.items() if depth > 0}
+    region = _grid_region(bundesland, landuse_type)
+    if depths:
+        sizes[region] = depths
+    elif sizes.pop(region, None) is None:
+        return
+    GRID_SIZES_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = GRID_SIZES_FILE.with_suffix(".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(sizes, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, GRID_SIZES_FILE)
 
 def choose_grid_size(bundesland, landuse_type ,target_size=15):
-    df = load_bundesland_boundaries()
-    df = df[df["bundesland"] == bundesland].iloc[0]
-    area = df["area"]
-    polygon = df ["geometry"]
-    print(area)
-    
+    # the base grid; dense parts of it are split further per cell (get_learned_depths)
+    row = get_boundary_registry().get(bundesland)
+    if row is None:
+        raise ValueError(f"{bundesland} not found")
+    area = row["area"]
+    polygon = row["geometry"]
+
     target_area = (area / 1e6) / target_size
     grid_size_deg = math.sqrt(target_area) / 111
     
@@ -269,4 +258,46 @@ def split_polygon(polygon, grid_size):
             y += grid_size
         x += grid_size
 
-    return bboxes
\ No newline at end of file
+    # cells outside the boundary (sea, enclaves like Berlin in Brandenburg) are never queried
+    shapely.prepare(polygon)
+    keep = shapely.intersects(np.array(bboxes, dtype=object), polygon)
+    return [b for b, k in zip(bboxes, keep) if k]
+
+def subdivide_to_depth(cell, depth, polygon=None):
+    # the cell split into quadrants depth times, parts outside polygon left out
+    cells = [cell]
+    for _ in range(depth):
+        cells = [q for c in cells for q in subdivide_cell(c, polygon)]
+    return cells
+
+def subdivide_cell(cell, polygon=None):
+    min_x, min_y, max_x, max_y = cell.bounds
+    mid_x, mid_y = (min_x + max_x) / 2, (min_y + max_y) / 2
+    quadrants = [box(min_x, min_y, mid_x, mid_y), box(mid_x, min_y, max_x, mid_y),
+                 box(min_x, mid_y, mid_x, max_y), box(mid_x, mid_y, max_x, max_y)]
+    if polygon is None:
+        return quadrants
+    return [q for q in quadrants if polygon.intersects(q)]
+
+def lonlat_to_tile(lon, lat, zoom):
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+def tile_bounds(x, y, zoom):
+    # (min_lon, min_lat, max_lon, max_lat) of a web-mercator tile
+    n = 2 ** zoom
+    min_lon = x / n * 360.0 - 180.0
+    max_lon = (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return min_lon, min_lat, max_lon, max_lat
+
+def tiles_for_bounds(bounds, zoom):
+    min_x, min_y, max_x, max_y = bounds
+    x0, y0 = lonlat_to_tile(min_x, max_y, zoom)
+    x1, y1 = lonlat_to_tile(max_x, min_y, zoom)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
@@ -0,0 +1,73 @@
+# Clipping a full state's features to its boundary:
+#   naive  - intersection of every feature with the detailed boundary (previous behaviour)
+#   engine - clip_to_boundary: classification against interior boxes, edge pieces for crossing features
+# Both results are compared feature by feature (count, summed area, area of the symmetric difference).
+#
+#   python -m benchmarks.bench_clip --bundesland Brandenburg --features 300000 --workers 4
+import argparse
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from app.services.clip_service import clip_to_boundary, boundary_pieces
+from app.utils.boundary_registry import get_boundary_registry
+
+def synthetic_frame(bounds, n, seed):
+    # landuse-sized squares and some open ways over the state's bbox (and a bit beyond)
+    rng = np.random.default_rng(seed)
+    min_x, min_y, max_x, max_y = bounds
+    x = rng.uniform(min_x - 0.1, max_x + 0.1, n)
+    y = rng.uniform(min_y - 0.1, max_y + 0.1, n)
+    size = rng.uniform(0.0005, 0.02, n)
+    geoms = shapely.box(x, y, x + size, y + size)
+    lines = rng.random(n) < 0.1
+    geoms[lines] = shapely.linestrings(np.stack([np.stack([x, x + size], axis=1),
+                                                 np.stack([y, y + size], axis=1)], axis=2)[lines])
+    return gpd.GeoDataFrame({"osm_id": np.arange(n).astype(str)}, geometry=geoms, crs="EPSG:4326")
+
+def naive(gdf, boundary):
+    result = gdf.copy()
+    result["geometry"] = gdf.geometry.intersection(boundary)
+    return result[~result.geometry.is_empty]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bundesland", default="Brandenburg")
+    parser.add_argument("--features", type=int, default=300_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    boundary = get_boundary_registry().geometry(args.bundesland)
+    gdf = synthetic_frame(boundary.bounds, args.features, 0)
+    print(f"{args.bundesland}: {shapely.get_num_coordinates(boundary)} boundary vertices, {len(gdf)} features")
+
+    start = time.perf_counter()
+    expected = naive(gdf, boundary)
+    print(f"naive : {time.perf_counter() - start:6.2f}s")
+
+    start = time.perf_counter()
+    pieces = boundary_pieces(boundary)
+    print(f"pieces: {time.perf_counter() - start:6.2f}s ({len(pieces.interior)} interior boxes, "
+          f"{len(pieces.edge)} edge pieces)")
+    start = time.perf_counter()
+    result = clip_to_boundary(gdf, boundary, workers=args.workers)
+    print(f"engine: {time.perf_counter() - start:6.2f}s")
+
+    expected = expected.set_index("osm_id").geometry
+    result = result.set_index("osm_id").geometry
+    if set(expected.index) != set(result.index):
+        raise RuntimeError(f"different features: {len(expected)} naive, {len(result)} engine")
+    result = result.loc[expected.index]
+    polygonal = expected.geom_type.isin(["Polygon", "MultiPolygon"]).values
+    difference = shapely.symmetric_difference(expected.values[polygonal], result.values[polygonal])
+    lines = ~polygonal
+    print(f"features {len(result)}, "
+          f"area {shapely.area(result.values).sum():.6f} vs {shapely.area(expected.values).sum():.6f}, "
+          f"symmetric difference {shapely.area(difference).sum():.2e}, "
+          f"line length {shapely.length(result.values[lines]).sum():.6f} vs "
+          f"{shapely.length(expected.values[lines]).sum():.6f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# Per-query overhead of the DuckDB access path: a fresh connection with the spatial extension
+# installed and loaded on every call (previous get_connection) against the pooled per-thread cursor.
+#
+#   python -m benchmarks.bench_db_connections --queries 500 --threads 8
+#
+# --processes N additionally runs N read-only server processes against the same file while a writer
+# process claims it now and then, the way the ingest/update CLIs share the store with the web app:
+# reports queries per second, how often opening had to wait for the file lock, failed queries and
+# the slowest query (readers wait out the writer's bursts).
+#
+# --without-spatial skips the extension on both sides, for machines that cannot download it.
+import argparse
+import multiprocessing
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import duckdb
+
+from app.config import config_db
+
+def legacy_connection(path, spatial):
+    conn = duckdb.connect(str(path))
+    if spatial:
+        conn.install_extension("spatial")
+        conn.load_extension("spatial")
+    return conn
+
+def pooled_manager(path, spatial, read_only=False):
+    manager = config_db.ConnectionManager(path, read_only=read_only)
+    if not spatial:
+        manager._open = lambda: duckdb.connect(str(path), read_only=read_only)
+    return manager
+
+def run(get_connection, queries, threads):
+    # the data version lookup, the query every tile/download request makes
+    def worker():
+        for _ in range(queries):
+            conn = get_connection()
+            conn.execute("SELECT value FROM store_meta WHERE key = 'data_version';").fetchone()
+            conn.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return (time.perf_counter() - start) / (queries * threads) * 1e6
+
+def _process_worker(path, spatial, duration, write, results):
+    # reader: a read-only lookup every few ms, like a server process under tile traffic; writer: an
+    # ingest/update CLI that claims the store, writes for a second and releases it again
+    manager = pooled_manager(path, spatial, read_only=not write)
+    queries = failed = 0
+    slowest = 0.0
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        if write:
+            time.sleep(1.0)
+            manager.claim_writer(timeout=duration)
+        burst_end = time.monotonic() + (1.0 if write else 0.0)
+        while True:
+            start = time.monotonic()
+            try:
+                conn = manager.cursor()
+                if write:
+                    conn.execute("UPDATE store_meta SET value = CAST(CAST(value AS INT) + 1 AS VARCHAR) "
+                                 "WHERE key = 'data_version';")
+                else:
+                    conn.execute("SELECT value FROM store_meta WHERE key = 'data_version';").fetchone()
+                conn.close()
+                queries += 1
+            except duckdb.Error:
+                failed += 1
+            slowest = max(slowest, time.monotonic() - start)
+            if time.monotonic() >= burst_end:
+                break
+            time.sleep(0.01)
+        if write:
+            manager.close()
+        else:
+            time.sleep(0.005)
+    manager.close()
+    results.put({"write": write, "queries": queries, "failed": failed, "lock_waits": manager.lock_waits,
+                 "slowest_ms": slowest * 1000})
+
+def run_processes(path, spatial, processes, duration):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [context.Process(target=_process_worker, args=(path, spatial, duration, i == 0, results))
+               for i in range(processes + 1)]
+    for w in workers:
+        w.start()
+    rows = [results.get() for _ in workers]
+    for w in workers:
+        w.join()
+    for row in sorted(rows, key=lambda r: not r["write"]):
+        role = "writer" if row["write"] else "reader"
+        print(f"{role}: {row['queries'] / duration:7.1f} queries/s, {row['failed']} failed, "
+              f"{row['lock_waits']} lock waits, slowest {row['slowest_ms']:.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--without-spatial", action="store_true")
+    parser.add_argument("--processes", type=int, default=0, help="reader processes next to one writer")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per process for --processes")
+    args = parser.parse_args()
+    spatial = not args.without_spatial
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.duckdb"
+        with duckdb.connect(str(path)) as conn:
+            conn.execute("CREATE TABLE store_meta(key VARCHAR PRIMARY KEY, value VARCHAR);")
+            conn.execute("INSERT INTO store_meta VALUES ('data_version', '1');")
+
+        manager = pooled_manager(path, spatial)
+        for threads in sorted({1, args.threads}):
+            legacy = run(lambda: legacy_connection(path, spatial), args.queries, threads)
+            pooled = run(manager.cursor, args.queries, threads)
+            print(f"{threads} thread(s): per query {legacy:9.1f} µs fresh connection, {pooled:7.1f} µs pooled "
+                  f"({legacy / pooled:.0f}x)")
+        manager.close()
+
+        if args.processes:
+            print(f"{args.processes} reader process(es) and 1 writer for {args.duration:.0f}s "
+                  f"(idle handles closed after {config_db.DB_IDLE_SECONDS or 'never'}s, writers claim the store):")
+            run_processes(path, spatial, args.processes, args.duration)
+
+if __name__ == "__main__":
+    main()
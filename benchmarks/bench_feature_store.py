@@ -0,0 +1,113 @@
+# bbox reads from the partitioned feature store against the loose per-cell files it replaces.
+#   cells - unsorted {bundesland}_grid_{i}_{uuid}.geoparquet files, every one read and filtered
+#   store - hive partitions, Hilbert sorted, bbox covering column used for row-group pruning
+#
+#   python -m benchmarks.bench_feature_store --features 1000000 --queries 30
+import argparse
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+import shapely
+
+from app.persistence import feature_store
+
+# roughly Brandenburg
+EXTENT = (11.2, 51.3, 14.8, 53.6)
+
+def synthetic_frame(n, seed):
+    rng = np.random.default_rng(seed)
+    min_x, min_y, max_x, max_y = EXTENT
+    x = rng.uniform(min_x, max_x, n)
+    y = rng.uniform(min_y, max_y, n)
+    size = rng.uniform(0.0005, 0.005, n)
+    types = np.array(["farmland", "forest", "residential", "meadow", "industrial", None], dtype=object)
+    return gpd.GeoDataFrame({
+        "id": [f"bench_{i}" for i in range(n)],
+        "osm_id": np.arange(n).astype(str),
+        "osm_type": np.where(rng.random(n) < 0.1, "node", "way"),
+        "name": None,
+        "landuse_type": types[rng.integers(0, len(types), n)],
+        "leisure": None,
+        "city": None,
+        "area": size * size * 7e9,
+    }, geometry=shapely.box(x, y, x + size, y + size), crs="EPSG:4326")
+
+def write_cells(gdf, directory, cells):
+    # cell files as the Overpass pipeline writes them: one per grid cell, no sort order
+    directory.mkdir(parents=True)
+    for part in np.array_split(np.random.default_rng(0).permutation(len(gdf)), cells):
+        gdf.iloc[part].to_parquet(directory / f"brandenburg_grid_{uuid.uuid4().hex[:8]}.geoparquet", index=False)
+    return sorted(directory.iterdir())
+
+def read_cells(files, bounds, landuse_type):
+    frames = [gpd.read_parquet(f) for f in files]
+    df = pd.concat(frames, ignore_index=True)
+    df = df[df["landuse_type"] == landuse_type]
+    return df[shapely.intersects(df.geometry.values, shapely.box(*bounds))]
+
+def bytes_touched(root, bounds, landuse_type):
+    # compressed row-group bytes surviving partition and statistics pruning
+    dataset = feature_store.open_store(root)
+    expr = feature_store.store_filter("brandenburg", landuse_type, "all", bounds)
+    row_filter = feature_store.store_filter(None, "all", "all", bounds)
+    touched = 0
+    for fragment in dataset.get_fragments(filter=expr):
+        for piece in fragment.split_by_row_group(row_filter):
+            touched += sum(fragment.metadata.row_group(rg.id).total_byte_size for rg in piece.row_groups)
+    return touched
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", type=int, default=1_000_000)
+    parser.add_argument("--cells", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--bbox", type=float, default=0.1, help="query bbox size in degrees")
+    args = parser.parse_args()
+
+    gdf = synthetic_frame(args.features, 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        files = write_cells(gdf, tmp / "cells", args.cells)
+        cell_bytes = sum(f.stat().st_size for f in files)
+
+        start = time.perf_counter()
+        feature_store.write_features("brandenburg", "all", "all", gdf, root=tmp / "store")
+        print(f"store written in {time.perf_counter() - start:.1f}s")
+        store_bytes = sum(f.stat().st_size for f in (tmp / "store").rglob("*.parquet"))
+        row_group_bytes = sum(fragment.metadata.row_group(i).total_byte_size
+                              for fragment in ds.dataset(tmp / "store", format="parquet").get_fragments()
+                              for i in range(fragment.metadata.num_row_groups))
+
+        rng = np.random.default_rng(1)
+        min_x, min_y, max_x, max_y = EXTENT
+        timings = {"cells": [], "store": []}
+        touched = []
+        for _ in range(args.queries):
+            x, y = rng.uniform(min_x, max_x - args.bbox), rng.uniform(min_y, max_y - args.bbox)
+            bounds = (x, y, x + args.bbox, y + args.bbox)
+
+            start = time.perf_counter()
+            expected = read_cells(files, bounds, "forest")
+            timings["cells"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            found = feature_store.read_features("brandenburg", "forest", "all", bounds, root=tmp / "store")
+            timings["store"].append(time.perf_counter() - start)
+            if len(found) != len(expected):
+                raise RuntimeError(f"store returned {len(found)} features, cells {len(expected)}")
+            touched.append(bytes_touched(tmp / "store", bounds, "forest") / row_group_bytes)
+
+        print(f"files: cells {cell_bytes / 1e6:.1f} MB, store {store_bytes / 1e6:.1f} MB")
+        for name, values in timings.items():
+            print(f"{name:>5}: median {statistics.median(values) * 1000:8.1f} ms")
+        print(f"store row-group bytes touched per query: median {statistics.median(touched) * 100:.2f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# /landuse/stats latency on a synthetic store (default 2M features): the grid-cell summary table
+# against aggregating landuse_by_h3 itself (what a download plus local aggregation boils down to).
+# Both count the same cells, results are compared.
+#
+#   python -m benchmarks.bench_landuse_stats --features 2000000 --queries 50
+#
+# --without-spatial stores no geometries, for machines that cannot download the extension
+# (the bbox statistics never read them).
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+import numpy as np
+
+from app.config import config_db
+from app.persistence import landuse_persistence
+
+# Germany, where the real features are
+EXTENT = (5.9, 47.3, 15.0, 55.1)
+
+def load(conn, n, seed, spatial):
+    min_x, min_y, max_x, max_y = EXTENT
+    geometry = "ST_MakeEnvelope(x, y, x + s, y + s)" if spatial else "NULL::BLOB"
+    conn.execute(f"SELECT setseed({seed / 1000});")
+    conn.execute(f"""CREATE TABLE landuse_by_h3 AS
+                     SELECT CAST(i AS VARCHAR) AS id, CAST(i AS VARCHAR) AS osm_id,
+                            (['way', 'relation', 'node'])[1 + i % 3] AS osm_type, NULL::VARCHAR AS name,
+                            (['farmland', 'forest', 'residential', 'meadow', 'industrial'])[1 + i % 5] AS landuse_type,
+                            NULL::VARCHAR AS leisure, NULL::VARCHAR AS natural_type, NULL::VARCHAR AS city,
+                            random() * 1e5 AS area, x AS minx, y AS miny, x + s AS maxx, y + s AS maxy,
+                            {geometry} AS geometry
+                     FROM (SELECT i, {min_x} + random() * {max_x - min_x} AS x, {min_y} + random() * {max_y - min_y} AS y,
+                                  0.0005 + random() * 0.005 AS s
+                           FROM range({n}) t(i));""")
+
+def scan_query(bounds, cell_size):
+    # the same cells get_bounds_stats adds up, aggregated from the features
+    x0, x1 = round(bounds[0] / cell_size), round(bounds[2] / cell_size) - 1
+    y0, y1 = round(bounds[1] / cell_size), round(bounds[3] / cell_size) - 1
+    return f"""SELECT landuse_type, count(*) AS feature_count, sum(area) AS area FROM landuse_by_h3
+               WHERE floor((minx + maxx) / 2 / {cell_size!r}) BETWEEN {x0} AND {x1}
+               AND floor((miny + maxy) / 2 / {cell_size!r}) BETWEEN {y0} AND {y1}
+               AND landuse_type IS NOT NULL
+               GROUP BY landuse_type ORDER BY landuse_type;"""
+
+def random_bounds(rng, size, count):
+    min_x, min_y, max_x, max_y = EXTENT
+    x = rng.uniform(min_x, max_x - size, count)
+    y = rng.uniform(min_y, max_y - size, count)
+    return [(a, b, a + size, b + size) for a, b in zip(x, y)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", type=int, default=2_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--without-spatial", action="store_true")
+    args = parser.parse_args()
+    spatial = not args.without_spatial
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.duckdb"
+        manager = config_db.ConnectionManager(path)
+        if not spatial:
+            manager._open = lambda: duckdb.connect(str(path))
+        config_db._manager = manager
+        conn = config_db.get_connection()
+        load(conn, args.features, args.seed, spatial)
+
+        start = time.perf_counter()
+        landuse_persistence.refresh_landuse_stats()
+        cells = conn.execute("SELECT count(*) FROM landuse_stats_by_cell;").fetchone()[0]
+        print(f"refresh: {time.perf_counter() - start:.1f}s, {cells} cell rows")
+
+        rng = np.random.default_rng(args.seed)
+        # a city, a region, a state, the whole country
+        for size in (0.2, 1.0, 3.0, 7.5):
+            stats_ms, scan_ms = [], []
+            for b in random_bounds(rng, size, args.queries):
+                start = time.perf_counter()
+                stats, _ = landuse_persistence.get_bounds_stats(b, "all", "")
+                stats_ms.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                scan = conn.execute(scan_query(b, config_db.STATS_CELL_SIZE)).df()
+                scan_ms.append((time.perf_counter() - start) * 1000)
+
+                stats = stats.sort_values("landuse_type").reset_index(drop=True)
+                if (list(stats["feature_count"]) != list(scan["feature_count"])
+                        or not np.allclose(stats["area"], scan["area"])):
+                    raise RuntimeError(f"statistics differ from the scan for {b}")
+            print(f"{size:>4}° bbox:  stats {statistics.median(stats_ms):7.2f} ms  "
+                  f"scan {statistics.median(scan_ms):7.2f} ms")
+        conn.close()
+        config_db.close_connections()
+
+if __name__ == "__main__":
+    main()
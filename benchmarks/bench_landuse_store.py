@@ -0,0 +1,142 @@
+# Query latency of the landuse store layouts on a synthetic table (default 1M features):
+#   blob     - WKB BLOB geometry, ST_Intersects on every row (previous clip_landuse_by_bundesland)
+#   bbox     - WKB BLOB geometry with the min/max x/y columns filtered first (previous bbox queries)
+#   geometry - GEOMETRY column with an R-tree index, the current schema
+# and, on the geometry layout, a state boundary inlined as WKT into the query text against the same
+# boundary bound as a WKB parameter (get_landuse_by_bounds), both behind the R-tree envelope.
+#
+#   python -m benchmarks.bench_landuse_store --features 1000000 --queries 50 --states Saarland Bayern
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+import numpy as np
+
+from app.utils.boundary_registry import get_boundary_registry
+
+# Germany, where the real features are
+EXTENT = (5.9, 47.3, 15.0, 55.1)
+
+def load(conn, n, seed):
+    min_x, min_y, max_x, max_y = EXTENT
+    conn.execute(f"SELECT setseed({seed / 1000});")
+    conn.execute(f"""CREATE TABLE boxes AS
+                     SELECT i AS id, x, y, x + s AS x2, y + s AS y2,
+                            (['farmland', 'forest', 'residential', 'meadow', 'industrial'])[1 + i % 5] AS landuse_type
+                     FROM (SELECT i, {min_x} + random() * {max_x - min_x} AS x, {min_y} + random() * {max_y - min_y} AS y,
+                                  0.0005 + random() * 0.005 AS s
+                           FROM range({n}) t(i));""")
+
+    start = time.perf_counter()
+    conn.execute("""CREATE TABLE landuse_blob AS
+                    SELECT id, landuse_type, CAST(x AS VARCHAR) AS area, x AS minx, y AS miny, x2 AS maxx, y2 AS maxy,
+                           ST_AsWKB(ST_MakeEnvelope(x, y, x2, y2)) AS geometry
+                    FROM boxes;""")
+    blob = time.perf_counter() - start
+
+    start = time.perf_counter()
+    conn.execute("""CREATE TABLE landuse_geom AS
+                    SELECT id, landuse_type, x AS area, x AS minx, y AS miny, x2 AS maxx, y2 AS maxy,
+                           ST_MakeEnvelope(x, y, x2, y2) AS geometry
+                    FROM boxes;""")
+    geom = time.perf_counter() - start
+    start = time.perf_counter()
+    conn.execute("CREATE INDEX landuse_geom_idx ON landuse_geom USING RTREE (geometry);")
+    index = time.perf_counter() - start
+    conn.execute("DROP TABLE boxes;")
+    print(f"load: blob {blob:.1f}s, geometry {geom:.1f}s + R-tree {index:.1f}s")
+
+def envelope(bounds):
+    return "ST_MakeEnvelope({!r}, {!r}, {!r}, {!r})".format(*(float(v) for v in bounds))
+
+QUERIES = {
+    "blob": lambda b: f"""SELECT count(*) FROM landuse_blob
+                          WHERE ST_Intersects(ST_GeomFromWKB(geometry), {envelope(b)});""",
+    "bbox": lambda b: f"""SELECT count(*) FROM landuse_blob
+                          WHERE maxx >= {b[0]} AND minx <= {b[2]} AND maxy >= {b[1]} AND miny <= {b[3]}
+                          AND ST_Intersects(ST_GeomFromWKB(geometry), {envelope(b)});""",
+    "geometry": lambda b: f"""SELECT count(*) FROM landuse_geom WHERE ST_Intersects(geometry, {envelope(b)});""",
+}
+
+BOUNDARY_QUERIES = {
+    "wkt": lambda b: (f"""SELECT count(*) FROM landuse_geom WHERE ST_Intersects(geometry, {envelope(b.bounds)})
+                          AND ST_Intersects(geometry, ST_GeomFromText('{b.wkt}'));""", []),
+    "wkb": lambda b: (f"""SELECT count(*) FROM landuse_geom WHERE ST_Intersects(geometry, {envelope(b.bounds)})
+                          AND ST_Intersects(geometry, ST_GeomFromWKB(?));""", [b.wkb]),
+}
+
+def bench_boundaries(conn, states, queries):
+    registry = get_boundary_registry()
+    for state in states:
+        boundary = registry.geometry(state)
+        if boundary is None:
+            raise ValueError(f"{state} not found in the bundesland boundaries")
+        counts = None
+        line = [f"{state} ({len(boundary.wkt) / 1024:.0f} KB WKT):"]
+        for name, query in BOUNDARY_QUERIES.items():
+            sql, params = query(boundary)
+            timings = []
+            for _ in range(queries):
+                start = time.perf_counter()
+                found = conn.execute(sql, params).fetchone()[0]
+                timings.append((time.perf_counter() - start) * 1000)
+            if counts is not None and found != counts:
+                raise RuntimeError(f"{name} returned different rows")
+            counts = found
+            line.append(f"{name} {statistics.median(timings):8.2f} ms")
+        line.append(f"({counts} rows)")
+        print("  ".join(line))
+
+def random_bounds(rng, size, count):
+    min_x, min_y, max_x, max_y = EXTENT
+    x = rng.uniform(min_x, max_x - size, count)
+    y = rng.uniform(min_y, max_y - size, count)
+    return [(a, b, a + size, b + size) for a, b in zip(x, y)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--states", nargs="*", default=["Saarland", "Bayern"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = duckdb.connect(str(Path(tmp) / "bench.duckdb"))
+        try:
+            conn.load_extension("spatial")
+        except duckdb.Error:
+            conn.install_extension("spatial")
+            conn.load_extension("spatial")
+        load(conn, args.features, args.seed)
+
+        rng = np.random.default_rng(args.seed)
+        # a city district, a city, a small state
+        for size in (0.02, 0.2, 2.0):
+            bounds = random_bounds(rng, size, args.queries)
+            counts = None
+            line = [f"{size:>5}° bbox:"]
+            for name, query in QUERIES.items():
+                timings, found = [], []
+                for b in bounds:
+                    start = time.perf_counter()
+                    found.append(conn.execute(query(b)).fetchone()[0])
+                    timings.append((time.perf_counter() - start) * 1000)
+                if counts is not None and found != counts:
+                    raise RuntimeError(f"{name} returned different rows")
+                counts = found
+                line.append(f"{name} {statistics.median(timings):8.2f} ms")
+            line.append(f"({statistics.mean(counts):.0f} rows)")
+            print("  ".join(line))
+
+        bench_boundaries(conn, args.states, max(1, args.queries // 10))
+
+        plan = conn.execute("EXPLAIN " + QUERIES["geometry"]((10.0, 50.0, 10.2, 50.2))).fetchall()
+        print("R-tree used:", "RTREE_INDEX_SCAN" in str(plan))
+        conn.close()
+
+if __name__ == "__main__":
+    main()
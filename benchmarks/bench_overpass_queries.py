@@ -0,0 +1,105 @@
+# Bytes transferred and server time per query shape, previous query text against the query compiler.
+# Talks to a real Overpass instance (OVERPASS_URL or --url); be gentle with public servers. --offline
+# replays the benchmark fixtures from the local stand-in instead and reports the bytes it sent, the
+# edge cell then comes from the state fixture.
+#
+#   python -m benchmarks.bench_overpass_queries --bbox 13.30,52.45,13.45,52.55 --bundesland Brandenburg
+#   python -m benchmarks.bench_overpass_queries --offline
+import argparse
+import time
+
+import requests
+from shapely import box
+
+from app.config.config_overpass import OVERPASS_URL
+from app.utils.boundary_registry import get_boundary_registry
+from app.utils.overpass_query import build_overpass_query
+from app.utils.overpass_stream import iter_element_batches
+from app.utils.utils import parse_element_batches, split_polygon
+from benchmarks.overpass_fixtures import FIXTURES, ensure_fixture
+from benchmarks.overpass_standin import OverpassStandIn
+
+def legacy_query(bounds, landuse_type, geometry_type):
+    # the text the three previous builders produced (bbox = the cell's bounds)
+    min_x, min_y, max_x, max_y = (round(c, 5) for c in bounds)
+    b = f"({min_y},{min_x},{max_y},{max_x})"
+    f = f'["landuse"="{landuse_type}"]' if landuse_type != "all" else '["landuse"]'
+    if geometry_type == "point":
+        return f"[out:json][timeout:60];\nnode{f}{b};\nout geom;\n"
+    if geometry_type == "polygon":
+        return (f'[out:json][timeout:60];\n(\nway{f}{b};\nrelation{f}["type"="multipolygon"]{b};\n);\n'
+                f"out geom; >; out qt;\n")
+    extra = (f'way["natural"]{b};\nrelation["natural"]{b};\nway["leisure"]{b};\nrelation["leisure"]{b};\n'
+             if landuse_type == "all" else "")
+    return f"[out:json][timeout:60];\n(\nnode{f}{b};\nway{f}{b};\nrelation{f}{b};\n{extra});\nout geom; >; out qt;\n"
+
+def run(url, query, server=None):
+    # (bytes, first byte, total seconds, features); the bytes are what the stand-in sent when there is one
+    sent = server.bytes_sent if server else 0
+    start = time.perf_counter()
+    size = 0
+    first = None
+
+    def chunks():
+        nonlocal size, first
+        with requests.post(url, data={"data": query}, timeout=600, stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                if first is None:
+                    first = time.perf_counter() - start
+                size += len(chunk)
+                yield chunk
+
+    features = len(parse_element_batches(iter_element_batches(chunks())))
+    if server:
+        size = server.bytes_sent - sent
+    return size, first or 0.0, time.perf_counter() - start, features
+
+def shapes(bbox, bundesland, landuse_type):
+    bounds = tuple(float(c) for c in bbox.split(","))
+    for geometry_type in ("point", "polygon", "all"):
+        for lt in (landuse_type, "all"):
+            area = box(*bounds)
+            yield (f"bbox {lt}/{geometry_type}", legacy_query(bounds, lt, geometry_type),
+                   build_overpass_query(area, lt, geometry_type))
+    if bundesland:
+        # a grid cell on the state border: bbox before, poly filter cut to the state now
+        boundary = get_boundary_registry().geometry(bundesland)
+        edge = [c for c in split_polygon(boundary, 0.25) if not boundary.contains(c)][0]
+        yield (f"{bundesland} edge cell {landuse_type}/polygon", legacy_query(edge.bounds, landuse_type, "polygon"),
+               build_overpass_query(edge, landuse_type, "polygon", boundary=boundary))
+
+def compare(url, query_shapes, pause, server=None):
+    for name, old, new in query_shapes:
+        results = []
+        for query in (old, new):
+            results.append(run(url, query, server))
+            time.sleep(pause)
+        (old_bytes, old_first, old_total, old_features), (new_bytes, new_first, new_total, new_features) = results
+        print(f"{name:<36} bytes {old_bytes / 1e6:8.2f} → {new_bytes / 1e6:8.2f} MB "
+              f"({100 * (1 - new_bytes / max(old_bytes, 1)):5.1f}% less)  "
+              f"first byte {old_first:6.2f} → {new_first:6.2f}s  total {old_total:6.2f} → {new_total:6.2f}s  "
+              f"features {old_features} → {new_features}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=OVERPASS_URL)
+    parser.add_argument("--bbox", default="13.30,52.45,13.45,52.55", help="min_lon,min_lat,max_lon,max_lat")
+    parser.add_argument("--bundesland", default="Brandenburg")
+    parser.add_argument("--landuse-type", default="forest")
+    parser.add_argument("--pause", type=float, default=5.0, help="seconds between queries")
+    parser.add_argument("--offline", action="store_true", help="query the fixture stand-in, not --url")
+    args = parser.parse_args()
+
+    url, bundesland, pause, server = args.url, args.bundesland, args.pause, None
+    if args.offline:
+        server = OverpassStandIn([ensure_fixture(name) for name in FIXTURES]).start()
+        url, bundesland, pause = server.url, FIXTURES["state"]["bundesland"], 0.0
+    try:
+        compare(url, shapes(args.bbox, bundesland, args.landuse_type), pause, server)
+    finally:
+        if server:
+            server.stop()
+
+if __name__ == "__main__":
+    main()
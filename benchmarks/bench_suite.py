@@ -0,0 +1,355 @@
+# End-to-end benchmark suite without network: recorded (or synthetic) Overpass responses from city bbox
+# to full state, replayed by a local stand-in server. Times every hot path per size, tracks peak memory
+# and writes everything as JSON; exits non-zero when a stage breaks its threshold in
+# benchmarks/thresholds.json or got slower/larger than a previous result (--baseline).
+#
+#   python -m benchmarks.bench_suite --output bench_results.json
+#   python -m benchmarks.bench_suite --baseline bench_results.json --tolerance 0.25 --stages parse fetch
+#
+# Stages: boundaries (load_bundesland_boundaries, cold), parse/<size> (parse_overpass_json_data on the
+# decoded response), parse_stream/<size> (parse_overpass_file, the streaming path cells take),
+# fetch/<size> (split_polygon + fetch_all_overpass against the stand-in, parse pool and cell files
+# included), export/<format>/<size> (export_formats on the largest size, body fully drained),
+# pmtiles/<size> (generate_pmtiles on the region, needs tippecanoe) and duckdb/... (landuse_persistence
+# on a store built from the fetched cells, needs the spatial extension).
+#
+# peak_mb is the tracemalloc peak of one extra run: Python objects and numpy buffers, not GEOS or DuckDB
+# native memory; max_rss_mb is the process high-water mark after the stage.
+import argparse
+import asyncio
+import contextlib
+import gc
+import gzip
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+import duckdb
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from app.config import config_db
+from app.persistence import landuse_persistence
+from app.services import landuse_by_bundesland_service
+from app.services.file_export_service import export_formats
+from app.services.landuse_stats_service import refresh_stats
+from app.services.tiles_export_service import generate_pmtiles
+from app.utils import utils
+from app.utils.boundary_registry import get_boundary_registry
+from app.utils.overpass_cache import overpass_cache
+from app.utils.utils import (load_bundesland_boundaries, parse_overpass_json_data, parse_overpass_file,
+                             split_polygon, choose_grid_size)
+from benchmarks.overpass_fixtures import FIXTURES, ensure_fixture, fixture_area, fixture_source
+from benchmarks.overpass_standin import OverpassStandIn
+
+THRESHOLDS_FILE = Path(__file__).parent / "thresholds.json"
+EXPORT_FORMATS = ["geojson", "csv", "shapefile", "geoparquet", "flatgeobuf"]
+# differences below these are noise, whatever the tolerance says
+MIN_SECONDS_DELTA = 0.05
+MIN_PEAK_MB_DELTA = 5.0
+
+def _max_rss_mb():
+    # kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def measure(fn, repeat, memory, quiet):
+    runs, result = [], None
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+            stack.enter_context(warnings.catch_warnings())
+            warnings.simplefilter("ignore")
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            result = fn()
+            runs.append(time.perf_counter() - start)
+        entry = {"seconds": round(statistics.median(runs), 4), "min_seconds": round(min(runs), 4),
+                 "runs": [round(r, 4) for r in runs]}
+        if memory:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                fn()
+                entry["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 1)
+            finally:
+                tracemalloc.stop()
+    entry["max_rss_mb"] = _max_rss_mb()
+    if isinstance(result, dict):
+        entry.update(result)
+    return entry
+
+def _drain(response):
+    return sum(len(chunk) for chunk in response.response)
+
+class Suite:
+
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.results = {"stages": {}, "skipped": {}, "errors": {}}
+        self.paths = {name: ensure_fixture(name, args.seed) for name in args.sizes}
+        self.cell_files = {}
+        self._runs = 0
+
+    def wanted(self, stage):
+        return not self.args.stages or any(stage == s or stage.startswith(f"{s}/") for s in self.args.stages)
+
+    def wants_duckdb(self):
+        return not self.args.stages or any(s == "duckdb" or s.startswith("duckdb/") for s in self.args.stages)
+
+    def run(self, stage, fn):
+        if not self.wanted(stage):
+            return
+        print(f"⏱️ {stage} ...", end=" ", flush=True)
+        try:
+            entry = measure(fn, self.args.repeat, not self.args.no_memory, not self.args.verbose)
+        except Exception as e:
+            message = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+            print(f"failed: {message}")
+            self.results["errors"][stage] = message
+            return
+        self.results["stages"][stage] = entry
+        print(f"{entry['seconds']:.3f}s" + (f", peak {entry['peak_mb']} MB" if "peak_mb" in entry else ""))
+
+    def skip(self, stage, reason):
+        if self.wanted(stage):
+            print(f"⏭️ {stage}: {reason}")
+            self.results["skipped"][stage] = reason
+
+    def boundaries(self):
+        registry = get_boundary_registry()
+
+        def load():
+            # cold: the registry reloads as if the file had changed
+            registry._mtime = None
+            return {"states": len(load_bundesland_boundaries())}
+        self.run("boundaries", load)
+
+    def parse(self):
+        for name, path in self.paths.items():
+            if self.wanted(f"parse/{name}"):
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.run(f"parse/{name}", lambda: {"features": len(parse_overpass_json_data(data))})
+                del data
+            self.run(f"parse_stream/{name}", lambda: {"features": len(parse_overpass_file(path))})
+
+    def _isolate_run(self):
+        # every run starts with an empty Overpass cache and cell directory, nothing is served from disk
+        self._runs += 1
+        run_dir = self.workdir / f"run_{self._runs}"
+        overpass_cache.directory = run_dir / "overpass_cache"
+        overpass_cache._size = None
+        landuse_by_bundesland_service.CELL_CACHE_DIR = run_dir / "cells"
+        return run_dir
+
+    def fetch(self, server):
+        landuse_by_bundesland_service.OVERPASS_URLS = [server.url]
+        utils.GRID_SIZES_FILE = self.workdir / "grid_sizes.json"
+        for name in self.paths:
+            area, boundary = fixture_area(name)
+            grid = FIXTURES[name]["grid"] or choose_grid_size(FIXTURES[name]["bundesland"], "all")[0]
+
+            def fetch_area():
+                self._isolate_run()
+                requests_before, bytes_before = server.requests, server.bytes_sent
+                cells = split_polygon(boundary if boundary is not None else area, grid)
+                report = {}
+                files = asyncio.run(landuse_by_bundesland_service.fetch_all_overpass(
+                    name, cells, "all", "all", boundary=boundary, report=report))
+                self.cell_files[name] = files
+                return {"cells": report["cells"], "requests": server.requests - requests_before,
+                        "bytes": server.bytes_sent - bytes_before, "features": report["features"],
+                        "lost": report["lost"]}
+            if self.wanted(f"fetch/{name}"):
+                self.run(f"fetch/{name}", fetch_area)
+            elif self.wants_duckdb():
+                # the store is built from the fetched cells, fetched once untimed
+                with contextlib.redirect_stdout(io.StringIO()):
+                    fetch_area()
+
+    def _frame(self, name):
+        gdf = parse_overpass_file(self.paths[name])
+        return gdf.drop_duplicates(["osm_type", "osm_id"]).reset_index(drop=True)
+
+    def export(self):
+        name = "state" if "state" in self.paths else list(self.paths)[-1]
+        if not any(self.wanted(f"export/{fmt}/{name}") for fmt in EXPORT_FORMATS):
+            return
+        gdf = self._frame(name)
+        # a shapefile holds one geometry type, the app's shapefile downloads are polygon downloads
+        polygons = gdf[gdf.geom_type.isin(["Polygon", "MultiPolygon"])]
+        for fmt in EXPORT_FORMATS:
+            frame = polygons if fmt == "shapefile" else gdf
+            self.run(f"export/{fmt}/{name}",
+                     lambda: {"features": len(frame), "bytes": _drain(export_formats(frame, fmt))})
+
+    def pmtiles(self):
+        name = "region" if "region" in self.paths else list(self.paths)[0]
+        if not self.wanted(f"pmtiles/{name}"):
+            return
+        if shutil.which("tippecanoe") is None:
+            self.skip(f"pmtiles/{name}", "tippecanoe not on PATH")
+            return
+        gdf = self._frame(name)
+        output_dir = self.workdir / "tiles"
+
+        def build():
+            path = Path(generate_pmtiles(gdf, output_dir, "bench.pmtiles"))
+            return {"features": len(gdf), "bytes": path.stat().st_size}
+        self.run(f"pmtiles/{name}", build)
+
+    def duckdb(self):
+        if not self.wants_duckdb():
+            return
+        stages = ["duckdb/ingest", "duckdb/refresh_stats", *(f"duckdb/bounds/{n}" for n in self.paths),
+                  f"duckdb/bounds_stats/{list(self.paths)[-1]}"]
+        if "state" in self.paths:
+            stages.append("duckdb/state_stats")
+        files = [f for name in self.paths for f in self.cell_files.get(name, [])]
+        if not files:
+            for stage in stages:
+                self.skip(stage, "no cell files, run the fetch stage first")
+            return
+        config_db._manager = config_db.ConnectionManager(self.workdir / "bench.duckdb")
+        try:
+            config_db.get_connection().close()
+        except (duckdb.Error, OSError) as e:
+            reason = f"DuckDB spatial extension unavailable: {str(e).splitlines()[0]}"
+            for stage in stages:
+                self.skip(stage, reason)
+            return
+
+        def ingest():
+            landuse_persistence.create_landuse_table(replace=True)
+            count = landuse_persistence.add_landuse_data(files)
+            landuse_persistence.create_landuse_index()
+            return {"cells": len(files), "features": count}
+        self.run("duckdb/ingest", ingest)
+        if "duckdb/ingest" in self.results["errors"]:
+            for stage in stages[1:]:
+                self.skip(stage, "the ingest failed")
+            config_db.close_connections()
+            return
+        self.run("duckdb/refresh_stats", refresh_stats)
+        for name in self.paths:
+            area, boundary = fixture_area(name)
+            wkb = boundary.wkb if boundary is not None else None
+            self.run(f"duckdb/bounds/{name}", lambda: {"features": len(
+                landuse_persistence.get_landuse_by_bounds(area.bounds, "all", "all", boundary_wkb=wkb))})
+        name = list(self.paths)[-1]
+        bounds = fixture_area(name)[0].bounds
+        self.run(f"duckdb/bounds_stats/{name}",
+                 lambda: {"rows": len(landuse_persistence.get_bounds_stats(bounds, "all", "")[0])})
+        if "state" in self.paths:
+            bundesland = FIXTURES["state"]["bundesland"]
+            self.run("duckdb/state_stats",
+                     lambda: {"rows": len(landuse_persistence.get_state_stats(bundesland, "all", ""))})
+        config_db.close_connections()
+
+def machine_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count(),
+            "commit": commit, "duckdb": duckdb.__version__, "shapely": shapely.__version__,
+            "geopandas": gpd.__version__, "pandas": pd.__version__}
+
+def check(results, thresholds, baseline, tolerance):
+    # list of failure messages: absolute thresholds (only for the fixture source they were set with)
+    # and regressions against a previous result
+    failures = []
+    sources = {f["source"] for f in results["fixtures"].values()}
+    limits = thresholds.get("stages", {}) if thresholds else {}
+    if limits and sources != {thresholds.get("fixture_source")}:
+        print(f"Thresholds were set for {thresholds.get('fixture_source')} fixtures, not checked against {sources}")
+        limits = {}
+    for stage, limit in limits.items():
+        entry = results["stages"].get(stage)
+        for key in ("seconds", "peak_mb"):
+            if entry and key in limit and key in entry and entry[key] > limit[key]:
+                failures.append(f"{stage}: {key} {entry[key]} above threshold {limit[key]}")
+
+    old_stages = (baseline or {}).get("stages", {})
+    for stage, error in results["errors"].items():
+        if stage in old_stages or stage in limits:
+            failures.append(f"{stage}: failed ({error})")
+    for stage, entry in results["stages"].items():
+        old = old_stages.get(stage)
+        # a stage that ran on other input (other fixtures, a different ingest) is not comparable
+        if not old or old.get("features") != entry.get("features"):
+            continue
+        for key, floor in (("seconds", MIN_SECONDS_DELTA), ("peak_mb", MIN_PEAK_MB_DELTA)):
+            if key not in entry or key not in old:
+                continue
+            if entry[key] > old[key] * (1 + tolerance) and entry[key] - old[key] > floor:
+                failures.append(f"{stage}: {key} {entry[key]} vs {old[key]} in the baseline "
+                                f"(+{tolerance:.0%} allowed)")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--sizes", nargs="+", default=list(FIXTURES), choices=list(FIXTURES))
+    parser.add_argument("--stages", nargs="*", default=[],
+                        help="stage names or prefixes (parse, fetch, export/csv, duckdb, ...), default all")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run per stage")
+    parser.add_argument("--thresholds", type=Path, default=THRESHOLDS_FILE)
+    parser.add_argument("--baseline", type=Path, help="earlier --output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth over the baseline")
+    parser.add_argument("--latency", type=float, default=0.0, help="stand-in seconds before the first byte")
+    parser.add_argument("--bandwidth", type=float, default=None, help="stand-in MB/s per response")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="keep the output of the stages")
+    args = parser.parse_args()
+
+    started = time.time()
+    with tempfile.TemporaryDirectory() as tmp:
+        suite = Suite(args, Path(tmp))
+        suite.results["fixtures"] = {name: {"source": fixture_source(path), "bytes": path.stat().st_size}
+                                     for name, path in suite.paths.items()}
+        suite.boundaries()
+        suite.parse()
+        if any(suite.wanted(f"fetch/{n}") for n in suite.paths) or suite.wants_duckdb():
+            bandwidth = args.bandwidth * 1024 ** 2 if args.bandwidth else None
+            with OverpassStandIn(list(suite.paths.values()), latency=args.latency, bandwidth=bandwidth) as server:
+                suite.fetch(server)
+        suite.export()
+        suite.pmtiles()
+        suite.duckdb()
+        results = suite.results
+
+    results.update({"created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "machine": machine_info(),
+                    "settings": {"repeat": args.repeat, "latency": args.latency, "bandwidth": args.bandwidth,
+                                 "seed": args.seed},
+                    "wall_time_s": round(time.time() - started, 1), "max_rss_mb": _max_rss_mb()})
+    thresholds = json.loads(args.thresholds.read_text()) if args.thresholds and args.thresholds.exists() else None
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    results["failures"] = check(results, thresholds, baseline, args.tolerance)
+
+    Path(args.output).write_text(json.dumps(results, indent=2, sort_keys=True))
+    print(f"📄 Results for {len(results['stages'])} stages ({len(results['skipped'])} skipped, "
+          f"{len(results['errors'])} failed) → {args.output}")
+    for failure in results["failures"]:
+        print(f"❌ {failure}")
+    if results["failures"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# The pre-tiling zoom levels (build_zoom_levels) on a synthetic state: a lattice of small adjacent fields
+# plus large detailed forests. Reports the stage time, rows and vertices tippecanoe gets per zoom and
+# the landuse classes present at every overview zoom; with tippecanoe on the PATH also build time and
+# archive size with and without the levels.
+#
+#   python -m benchmarks.bench_tile_levels --features 200000
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from app.config.config_export import TILE_MIN_ZOOM, TILE_MAX_ZOOM
+from app.services.file_export_service import TIPPECANOE_MINZOOM, TIPPECANOE_MAXZOOM
+from app.services.tile_levels_service import build_zoom_levels
+from app.services.tiles_export_service import generate_pmtiles
+
+TYPES = np.array(["farmland", "meadow", "residential", "orchard", "vineyard", "allotments"])
+
+def synthetic_state(n, seed=0):
+    # 95% fields of 150-600 m on a jittered lattice, 5% forests with a few hundred vertices
+    rng = np.random.default_rng(seed)
+    fields, forests = int(n * 0.95), n - int(n * 0.95)
+    side = int(np.ceil(np.sqrt(fields)))
+    step = 0.006
+    i = np.arange(fields)
+    x = 11.0 + (i % side) * step + rng.uniform(0, 0.001, fields)
+    y = 50.5 + (i // side) * step * 0.65 + rng.uniform(0, 0.001, fields)
+    w = rng.uniform(0.002, step, fields)
+    h = rng.uniform(0.0015, step * 0.65, fields)
+    field_geoms = shapely.box(x, y, x + w, y + h)
+
+    extent = side * step
+    centres = shapely.points(11.0 + rng.uniform(0, extent, forests), 50.5 + rng.uniform(0, extent * 0.65, forests))
+    forest_geoms = np.array([shapely.buffer(c, r, quad_segs=64)
+                             for c, r in zip(centres, rng.uniform(0.01, 0.04, forests))], dtype=object)
+    forest_geoms = shapely.simplify(shapely.make_valid(forest_geoms), 0.0)
+
+    geoms = np.concatenate([field_geoms, forest_geoms])
+    landuse = np.concatenate([TYPES[rng.integers(0, len(TYPES), fields)], np.full(forests, "forest")])
+    # a class made of a handful of tiny polygons only, the one overview zooms lose first
+    landuse[:25] = "quarry"
+    return gpd.GeoDataFrame({
+        "osm_id": np.arange(n).astype(str),
+        "name": None,
+        "landuse_type": landuse,
+        "leisure": None,
+        "city": None,
+        "area": shapely.area(geoms) * 7e9,
+    }, geometry=geoms, crs="EPSG:4326")
+
+def report(gdf, levels):
+    classes = set(gdf["landuse_type"])
+    print(f"{'zoom':>4} {'rows':>9} {'vertices':>11}  missing classes")
+    for z in range(TILE_MIN_ZOOM, TILE_MAX_ZOOM + 1):
+        at = (levels[TIPPECANOE_MINZOOM] <= z) & (levels[TIPPECANOE_MAXZOOM] >= z)
+        vertices = int(shapely.get_num_coordinates(levels.geometry.values[at.values]).sum())
+        missing = sorted(classes - set(levels.loc[at, "landuse_type"]))
+        print(f"{z:>4} {int(at.sum()):>9} {vertices:>11}  {', '.join(missing) or '-'}")
+    print(f"full detail: {len(gdf)} rows, {int(shapely.get_num_coordinates(gdf.geometry.values).sum())} vertices")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    gdf = synthetic_state(args.features, args.seed)
+    start = time.perf_counter()
+    levels = build_zoom_levels(gdf)
+    print(f"zoom levels: {time.perf_counter() - start:.1f}s")
+    report(gdf, levels)
+
+    if shutil.which("tippecanoe") is None:
+        print("tippecanoe not found, skipping the archive builds")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, bands in (("full detail", []), ("zoom levels", None)):
+            start = time.perf_counter()
+            kwargs = {} if bands is None else {"zoom_bands": bands}
+            path = Path(generate_pmtiles(gdf, Path(tmp), f"{name.replace(' ', '_')}.pmtiles", **kwargs))
+            print(f"{name:12s} {time.perf_counter() - start:7.1f}s  archive {path.stat().st_size / 1024 ** 2:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Compares the ways of feeding tippecanoe:
+#   geojson - previous behaviour, full GeoJSON FeatureCollection written with to_file, then tiled
+#   file    - NDJSON temp file with only the tile attributes, read in parallel (-P)
+#   pipe    - NDJSON streamed into tippecanoe's stdin, nothing written besides the archive
+# The zoom levels are built once and the same rows go through every mode, so only the input path
+# differs. Times include the tippecanoe run, they only compare the modes when the `tippecanoe` on
+# PATH is the real one; the binary used is printed with the results.
+#
+#   python -m benchmarks.bench_tippecanoe_input --features 200000
+import argparse
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from app.services import tiles_export_service
+from app.services.tile_levels_service import build_zoom_levels
+from app.services.tiles_export_service import generate_pmtiles, TIPPECANOE_OPTIONS
+
+def synthetic_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(6.0, 15.0, n)
+    y = rng.uniform(47.5, 55.0, n)
+    size = rng.uniform(0.0005, 0.005, n)
+    types = np.array(["farmland", "forest", "residential", "meadow", "industrial"])
+    return gpd.GeoDataFrame({
+        "id": [f"bench_{i}" for i in range(n)],
+        "osm_id": rng.integers(1, 10 ** 9, n).astype(str),
+        "osm_type": "way",
+        "name": np.where(rng.random(n) < 0.3, "Some landuse name", None),
+        "landuse_type": types[rng.integers(0, len(types), n)],
+        "leisure": None,
+        "city": np.where(rng.random(n) < 0.1, "Berlin", None),
+        "area": size * size * 7e9,
+    }, geometry=shapely.box(x, y, x + size, y + size), crs="EPSG:4326")
+
+def legacy_geojson(gdf, output_dir):
+    geojson_path = output_dir / "legacy.geojson"
+    pmtiles_path = output_dir / "legacy.pmtiles"
+    gdf.to_file(geojson_path, driver="GeoJSON")
+    written = geojson_path.stat().st_size
+    subprocess.run(["tippecanoe", "-o", str(pmtiles_path), str(geojson_path), *TIPPECANOE_OPTIONS],
+                   capture_output=True, check=True)
+    geojson_path.unlink()
+    return written
+
+def ndjson_file(gdf, output_dir):
+    # measure the intermediate file before generate_pmtiles removes it
+    written = {}
+    run_file = tiles_export_service._run_tippecanoe_file
+
+    def measured(gdf, tmp_path, ndjson_path):
+        result = run_file(gdf, tmp_path, ndjson_path)
+        written["bytes"] = Path(ndjson_path).stat().st_size
+        return result
+
+    tiles_export_service._run_tippecanoe_file = measured
+    try:
+        generate_pmtiles(gdf, output_dir, "file.pmtiles", mode="file", zoom_bands=[])
+    finally:
+        tiles_export_service._run_tippecanoe_file = run_file
+    return written["bytes"]
+
+def pipe(gdf, output_dir):
+    generate_pmtiles(gdf, output_dir, "pipe.pmtiles", mode="pipe", zoom_bands=[])
+    return 0
+
+MODES = {"geojson": legacy_geojson, "file": ndjson_file, "pipe": pipe}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", type=int, default=100_000)
+    parser.add_argument("--modes", default="geojson,file,pipe")
+    args = parser.parse_args()
+
+    gdf = synthetic_frame(args.features)
+    start = time.perf_counter()
+    # the rows generate_pmtiles would tile, the modes below get them as they are (zoom_bands=[])
+    levels = build_zoom_levels(gdf)
+    print(f"{args.features} polygons, {len(levels)} rows after build_zoom_levels "
+          f"({time.perf_counter() - start:.2f}s, not in the times below)")
+    print(f"tippecanoe {shutil.which('tippecanoe')} {TIPPECANOE_OPTIONS}")
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+        for mode in args.modes.split(","):
+            start = time.perf_counter()
+            written = MODES[mode](levels, output_dir)
+            elapsed = time.perf_counter() - start
+            archive = next(output_dir.glob(f"{'legacy' if mode == 'geojson' else mode}.pmtiles"))
+            print(f"{mode:8s} {elapsed:7.2f}s  intermediate {written / 1024 ** 2:8.1f} MB  "
+                  f"archive {archive.stat().st_size / 1024 ** 2:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# Overpass responses the benchmark suite replays, one gzip file per area size under benchmarks/fixtures/.
+# Recorded from a real interpreter (OVERPASS_URL or --url) with the app's own query for the area, or,
+# where no recording exists, generated: Overpass-shaped JSON with the same element mix (closed ways,
+# multipolygon relations split over member ways, nodes) at about the landuse density of the real area.
+#
+#   python -m benchmarks.overpass_fixtures --record city region state
+#   python -m benchmarks.overpass_fixtures --synthesize
+import argparse
+import gzip
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import requests
+import shapely
+
+from app.config.config_overpass import OVERPASS_URL
+from app.utils.boundary_registry import get_boundary_registry
+from app.utils.overpass_cache import payload_remark
+from app.utils.overpass_query import build_overpass_query
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+SYNTHETIC_GENERATOR = "landuse-map synthetic fixture"
+
+# city bbox up to a full state; features is what the synthetic version holds, grid the cell size the
+# fetch stage splits the area into (None: the app's own choice for the state)
+FIXTURES = {
+    "city": {"bounds": (13.30, 52.46, 13.50, 52.56), "features": 8_000, "grid": 0.05},
+    "region": {"bounds": (9.80, 48.30, 10.40, 48.70), "features": 40_000, "grid": 0.1},
+    "state": {"bundesland": "Saarland", "features": 100_000, "grid": None},
+}
+
+LANDUSE_WEIGHTS = {"farmland": 0.30, "meadow": 0.20, "residential": 0.15, "forest": 0.10, "grass": 0.08,
+                   "industrial": 0.05, "orchard": 0.03, "allotments": 0.03, "commercial": 0.03,
+                   "retail": 0.02, "cemetery": 0.01}
+
+def fixture_path(name):
+    return FIXTURES_DIR / f"{name}.json.gz"
+
+def fixture_area(name):
+    # (area, boundary): the area queried and the state boundary it is cut to (None for bboxes)
+    spec = FIXTURES[name]
+    if "bundesland" in spec:
+        boundary = get_boundary_registry().geometry(spec["bundesland"])
+        if boundary is None:
+            raise ValueError(f"{spec['bundesland']} not found in the bundesland boundaries")
+        return shapely.box(*boundary.bounds), boundary
+    return shapely.box(*spec["bounds"]), None
+
+def fixture_source(path):
+    # "recorded" or "synthetic", from the generator field at the top of the response
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        head = f.read(512)
+    return "synthetic" if SYNTHETIC_GENERATOR in head else "recorded"
+
+def load_elements(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)["elements"]
+
+def _ring(rng, x, y, radius, vertices):
+    # irregular star-shaped ring, closed like Overpass returns it
+    angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+    r = radius * rng.uniform(0.6, 1.0, vertices)
+    lon = np.round(x + r * np.cos(angles) * 1.6, 7).tolist()
+    lat = np.round(y + r * np.sin(angles), 7).tolist()
+    return [{"lat": a, "lon": o} for o, a in zip(lon + lon[:1], lat + lat[:1])]
+
+def _bounds(points):
+    lats, lons = [p["lat"] for p in points], [p["lon"] for p in points]
+    return {"minlat": min(lats), "minlon": min(lons), "maxlat": max(lats), "maxlon": max(lons)}
+
+def _tags(rng, landuse):
+    tags = {"landuse": landuse}
+    if rng.random() < 0.1:
+        tags["name"] = f"{landuse.title()} {rng.integers(1, 1000)}"
+    if rng.random() < 0.05:
+        tags["addr:city"] = "Benchstadt"
+    if rng.random() < 0.02:
+        tags["leisure"] = "park"
+    return tags
+
+def synthetic_elements(name, seed=0):
+    spec = FIXTURES[name]
+    area, boundary = fixture_area(name)
+    rng = np.random.default_rng(seed)
+    min_x, min_y, max_x, max_y = area.bounds
+    n = spec["features"]
+
+    # centres inside the area (the boundary for states), drawn in bulk until there are enough
+    centres = np.empty((0, 2))
+    region = boundary if boundary is not None else area
+    while len(centres) < n:
+        candidates = np.column_stack([rng.uniform(min_x, max_x, n), rng.uniform(min_y, max_y, n)])
+        inside = shapely.contains_xy(region, candidates[:, 0], candidates[:, 1])
+        centres = np.concatenate([centres, candidates[inside]])
+    centres = centres[:n]
+
+    classes = np.array(list(LANDUSE_WEIGHTS))
+    landuse = rng.choice(classes, n, p=np.array(list(LANDUSE_WEIGHTS.values())))
+    kind = rng.choice(["way", "node", "relation", "line"], n, p=[0.89, 0.06, 0.04, 0.01])
+    base_id = (list(FIXTURES).index(name) + 1) * 10 ** 9
+    elements = []
+    for i, ((x, y), use, k) in enumerate(zip(centres, landuse, kind)):
+        osm_id = base_id + i
+        tags = _tags(rng, str(use))
+        if k == "node":
+            elements.append({"type": "node", "id": osm_id, "lat": round(float(y), 7), "lon": round(float(x), 7),
+                             "tags": tags})
+            continue
+        large = use == "forest"
+        radius = rng.uniform(0.003, 0.015) if large else rng.uniform(0.0004, 0.002)
+        vertices = int(rng.integers(40, 200)) if large else int(rng.integers(4, 24))
+        ring = _ring(rng, x, y, radius, vertices)
+        if k == "line":
+            ring = ring[:-2]
+        if k == "relation":
+            # outer ring split over two member ways plus one inner ring, as relations usually come
+            half = len(ring) // 2
+            inner = _ring(rng, x, y, radius * 0.3, 6)
+            members = [{"type": "way", "ref": osm_id * 10 + j, "role": role, "geometry": pts}
+                       for j, (role, pts) in enumerate((("outer", ring[:half + 1]), ("outer", ring[half:]),
+                                                        ("inner", inner)))]
+            tags["type"] = "multipolygon"
+            elements.append({"type": "relation", "id": osm_id, "bounds": _bounds(ring), "members": members,
+                             "tags": tags})
+            continue
+        elements.append({"type": "way", "id": osm_id, "bounds": _bounds(ring),
+                         "nodes": list(range(osm_id * 100, osm_id * 100 + len(ring))), "geometry": ring,
+                         "tags": tags})
+    return elements
+
+def write_fixture(path, elements, generator):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write(json.dumps({"version": 0.6, "generator": generator,
+                            "osm3s": {"timestamp_osm_base": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}})[:-1])
+        f.write(', "elements": [\n')
+        f.write(",\n".join(json.dumps(e, separators=(",", ":")) for e in elements))
+        f.write("\n]}\n")
+    tmp_path.replace(path)
+    return path
+
+def synthesize(name, seed=0):
+    start = time.time()
+    elements = synthetic_elements(name, seed)
+    path = write_fixture(fixture_path(name), elements, SYNTHETIC_GENERATOR)
+    print(f"🧪 Synthetic {name} fixture: {len(elements)} elements in {time.time() - start:.1f}s → {path}")
+    return path
+
+def record(name, url=OVERPASS_URL):
+    # the query the app sends for the whole area, with a timeout that lets a full state through
+    area, boundary = fixture_area(name)
+    query = build_overpass_query(area, "all", "all", boundary=boundary, timeout=900)
+    path = fixture_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    start = time.time()
+    tail = b""
+    with requests.post(url, data={"data": query}, timeout=1000, stream=True) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Overpass API error: {response.status_code}")
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                f.write(chunk)
+                tail = (tail + chunk)[-4096:]
+    remark = payload_remark(tail)
+    if remark and "error" in remark.lower():
+        tmp_path.unlink()
+        raise RuntimeError(f"Overpass API error: {remark}")
+    tmp_path.replace(path)
+    print(f"📼 Recorded {name} in {time.time() - start:.1f}s → {path} ({path.stat().st_size / 1024 ** 2:.1f} MB)")
+    return path
+
+def ensure_fixture(name, seed=0):
+    # a recording if there is one, otherwise the synthetic response (generated once)
+    path = fixture_path(name)
+    return path if path.exists() else synthesize(name, seed)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("names", nargs="*", default=list(FIXTURES))
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--record", action="store_true", help="fetch from a real Overpass interpreter")
+    mode.add_argument("--synthesize", action="store_true", help="(re)generate the synthetic responses")
+    parser.add_argument("--url", default=OVERPASS_URL)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name in args.names:
+        if name not in FIXTURES:
+            raise ValueError(f"Unknown fixture {name}, expected one of {', '.join(FIXTURES)}")
+        if args.record:
+            record(name, args.url)
+        else:
+            synthesize(name, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# Local stand-in for an Overpass interpreter that answers the app's queries from fixture responses:
+# every statement (node/way/relation, tag filters, bbox or poly) selects the fixture elements whose
+# bounds intersect its area, like Overpass does, so cells on a border come back in both neighbours.
+# A `>;` recursion (the previous query text) adds the members and nodes of the selection again.
+# Optional latency before the first byte and a bandwidth cap make transfer times comparable to a
+# real server.
+#
+#   python -m benchmarks.overpass_standin --port 8089      (then OVERPASS_URL=http://127.0.0.1:8089/api/interpreter)
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import numpy as np
+import shapely
+
+from benchmarks.overpass_fixtures import FIXTURES, ensure_fixture, load_elements
+
+_STATEMENT_RE = re.compile(r'^\s*(node|way|relation)((?:\[[^\]]*\])*)(\([^)]*\));\s*$', re.MULTILINE)
+_TAG_RE = re.compile(r'\["([^"]*)"(?:="([^"]*)")?\]')
+_RECURSE_RE = re.compile(r'^\s*(?:out[^;]*;\s*)?>;', re.MULTILINE)
+_POLY_RE = re.compile(r'^\(poly:"([^"]*)"\)$')
+_BBOX_RE = re.compile(r'^\(([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\)$')
+_SEND_CHUNK = 1 << 16
+
+def _element_bounds(element):
+    if element["type"] == "node":
+        return element["lon"], element["lat"], element["lon"], element["lat"]
+    b = element["bounds"]
+    return b["minlon"], b["minlat"], b["maxlon"], b["maxlat"]
+
+def _node(node_id, point):
+    return {"type": "node", "id": node_id, "lat": point["lat"], "lon": point["lon"]}
+
+def _down(element):
+    # what `>;` adds for an element, as `out qt` writes it: the nodes of a way; the member ways of a
+    # relation with their nodes (ids made up where the fixture has none) and its member nodes
+    if element["type"] == "way":
+        for node_id, point in zip(element.get("nodes", []), element.get("geometry", [])):
+            yield _node(node_id, point)
+    elif element["type"] == "relation":
+        for member in element.get("members", []):
+            if member["type"] == "node" and "lat" in member:
+                yield _node(member["ref"], member)
+            elif member["type"] == "way":
+                points = member.get("geometry", [])
+                nodes = member.get("nodes") or [member["ref"] * 1000 + i for i in range(len(points))]
+                yield {"type": "way", "id": member["ref"], "nodes": nodes}
+                for node_id, point in zip(nodes, points):
+                    yield _node(node_id, point)
+
+def _filter_area(text):
+    match = _BBOX_RE.match(text)
+    if match:
+        south, west, north, east = (float(v) for v in match.groups())
+        return shapely.box(west, south, east, north)
+    match = _POLY_RE.match(text)
+    if match:
+        values = [float(v) for v in match.group(1).split()]
+        return shapely.Polygon(list(zip(values[1::2], values[0::2])))
+    raise ValueError(f"Unsupported area filter {text}")
+
+class FixtureIndex:
+    # all fixture elements in one R-tree over their bounds, kept pre-serialized
+
+    def __init__(self, paths):
+        elements, encoded, types, bounds, seen = [], [], [], [], set()
+        for path in paths:
+            for element in load_elements(path):
+                key = (element["type"], element["id"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                elements.append(element)
+                encoded.append(json.dumps(element, separators=(",", ":")).encode("utf-8"))
+                types.append(element["type"])
+                bounds.append(_element_bounds(element))
+        self.elements = elements
+        self.encoded = encoded
+        self.types = np.array(types)
+        self.tree = shapely.STRtree(shapely.box(*np.array(bounds).T))
+
+    def __len__(self):
+        return len(self.encoded)
+
+    def select(self, query):
+        # positions of the elements the query's statements return, in element order
+        selected = []
+        for element_type, tag_filters, area in _STATEMENT_RE.findall(query):
+            idx = self.tree.query(_filter_area(area), predicate="intersects")
+            idx = idx[self.types[idx] == element_type]
+            for key, value in _TAG_RE.findall(tag_filters):
+                tags = [self.elements[i].get("tags") or {} for i in idx]
+                keep = [key in t and (not value or t[key] == value) for t in tags]
+                idx = idx[np.array(keep, dtype=bool)]
+            selected.append(idx)
+        return np.unique(np.concatenate(selected)) if selected else np.array([], dtype=np.int64)
+
+    def _encoded(self, query):
+        selected = self.select(query)
+        for pos in selected:
+            yield self.encoded[pos]
+        if not _RECURSE_RE.search(query):
+            return
+        seen = set()
+        for pos in selected:
+            for element in _down(self.elements[pos]):
+                key = (element["type"], element["id"])
+                if key not in seen:
+                    seen.add(key)
+                    yield json.dumps(element, separators=(",", ":")).encode("utf-8")
+
+    def response(self, query):
+        # the body as Overpass writes it: header, one element per line, no remark
+        yield b'{"version":0.6,"generator":"Overpass API stand-in","osm3s":{},"elements":[\n'
+        parts = []
+        size = 0
+        for i, encoded in enumerate(self._encoded(query)):
+            parts.append((b",\n" if i else b"") + encoded)
+            size += len(parts[-1])
+            if size >= _SEND_CHUNK:
+                yield b"".join(parts)
+                parts, size = [], 0
+        parts.append(b"\n]}\n")
+        yield b"".join(parts)
+
+class OverpassStandIn:
+    # with OverpassStandIn(paths) as server: ... server.url; counts requests and bytes sent
+
+    def __init__(self, paths, host="127.0.0.1", port=0, latency=0.0, bandwidth=None):
+        self.index = FixtureIndex(paths)
+        self.latency = latency
+        # bytes per second, None for as fast as the socket takes them
+        self.bandwidth = bandwidth
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/interpreter"
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                form = parse_qs(self.rfile.read(length).decode("utf-8"))
+                query = (form.get("data") or [""])[0]
+                try:
+                    chunks = list(standin.index.response(query))
+                except ValueError as e:
+                    body = str(e).encode("utf-8")
+                    self.send_response(400)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                length = sum(len(c) for c in chunks)
+                # counted before the body goes out, a client that has read it all sees the total
+                with standin._lock:
+                    standin.requests += 1
+                    standin.bytes_sent += length
+                if standin.latency:
+                    time.sleep(standin.latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(length))
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(chunk)
+                    if standin.bandwidth:
+                        time.sleep(len(chunk) / standin.bandwidth)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("names", nargs="*", default=list(FIXTURES))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first byte")
+    parser.add_argument("--bandwidth", type=float, default=None, help="MB/s per response")
+    args = parser.parse_args()
+
+    bandwidth = args.bandwidth * 1024 ** 2 if args.bandwidth else None
+    server = OverpassStandIn([ensure_fixture(n) for n in args.names], args.host, args.port, args.latency, bandwidth)
+    print(f"Overpass stand-in with {len(server.index)} elements at {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+if __name__ == "__main__":
+    main()
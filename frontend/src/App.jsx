@@ -48,6 +48,29 @@ function App() {
     return null;
   }, [bbox, bundesland, landuseType, geometryType]);
 
+  // Bundesland filters run as background jobs, polled until the archive is ready
+  const runFilterJob = useCallback(async (filterUrl) => {
+    const query = filterUrl.split("?")[1];
+    const res = await fetch(`http://127.0.0.1:5000/landuse/jobs?kind=filter&${query}`, {
+      method: "POST",
+    });
+    let job = await res.json();
+    if (res.status !== 202) return job;
+
+    while (!["done", "failed", "cancelled"].includes(job.status)) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      job = await (await fetch(`http://127.0.0.1:5000${job.status_url}`)).json();
+      const progress = job.progress || {};
+      if (progress.cells) {
+        setNotification(
+          `⏳ ${progress.stage}: ${progress.fetched}/${progress.cells} cells, ${progress.features} features`
+        );
+      }
+    }
+    if (job.status === "failed") setNotification(`⚠️ ${job.error}`);
+    return job;
+  }, []);
+
   // Apply filter 
   const handleApplyFilter = useCallback(async () => {
     if (!landuseType || !geometryType) {
@@ -61,11 +84,22 @@ function App() {
     }
 
     try {
-      const res = await fetch(base);
-      const raw = await res.json();
-
-      if (raw?.pmtiles_url) {
-        const fullUrl = `http://127.0.0.1:5000${raw.pmtiles_url}?ts=${Date.now()}`;
+      const raw = bbox
+        ? await (await fetch(base)).json()
+        : await runFilterJob(base);
+
+      if (raw?.tiles_url) {
+        mapRef.current?.showVectorTiles(
+          `http://127.0.0.1:5000${raw.tiles_url}`,
+          raw.minzoom,
+          raw.maxzoom
+        );
+        setNotification(null);
+        mapRef.current?.resetCursor();
+        setDrawTrigger(0);
+      } else if (raw?.pmtiles_url) {
+        // the url carries the archive version, no cache busting needed
+        const fullUrl = `http://127.0.0.1:5000${raw.pmtiles_url}`;
         mapRef.current?.showPmtiles(fullUrl);
         setNotification(null);
         mapRef.current?.resetCursor();
@@ -80,7 +114,7 @@ function App() {
       console.error("Apply Filter failed:", e);
       setNotification("⚠️ Failed to fetch data. Check backend logs.");
     }
-  }, [buildFilterUrl, landuseType, geometryType]);
+  }, [buildFilterUrl, runFilterJob, bbox, landuseType, geometryType]);
 
   // Download 
   const handleDownload = useCallback(() => {
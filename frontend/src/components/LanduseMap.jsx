@@ -11,6 +11,7 @@ import { fromLonLat, toLonLat } from "ol/proj";
 import Draw, { createBox } from "ol/interaction/Draw";
 import { Fill, Stroke, Style } from "ol/style";
 import { PMTilesVectorSource } from "ol-pmtiles";
+import VectorTileSource from "ol/source/VectorTile";
 import MVT from "ol/format/MVT";
 import { unByKey } from "ol/Observable";
 import { FaDrawPolygon, FaLayerGroup } from "react-icons/fa";
@@ -37,6 +38,10 @@ function getColor(props) {
       return "rgba(255,165,0,0.4)";
     case "industrial":
       return "rgba(128,128,128,0.4)";
+    case "natural":
+      return "rgba(0,160,100,0.4)";
+    case "leisure":
+      return "rgba(150,220,100,0.4)";
     default:
       return "rgba(200,200,200,0.4)";
   }
@@ -58,32 +63,49 @@ const LanduseMap = forwardRef(function LanduseMap(
   const popupOverlayRef = useRef();
   const pmtilesLoadedRef = useRef(false); 
 
-  useImperativeHandle(ref, () => ({
-    showPmtiles: (pmtilesUrl) => {
-      if (!mapRef.current || !pmtilesUrl) return;
+  const showTileSource = (source) => {
+    if (pmtilesLayerRef.current) {
+      mapRef.current.removeLayer(pmtilesLayerRef.current);
+      pmtilesLayerRef.current = null;
+    }
 
-      if (pmtilesLayerRef.current) {
-        mapRef.current.removeLayer(pmtilesLayerRef.current);
-        pmtilesLayerRef.current = null;
-      }
+    const vtLayer = new VectorTileLayer({
+      source,
+      style: (feature) =>
+        new Style({
+          fill: new Fill({ color: getColor(feature.getProperties()) }),
+          stroke: new Stroke({ color: "#333", width: 1 }),
+        }),
+    });
 
-      const pmtilesSource = new PMTilesVectorSource({
-        url: pmtilesUrl,
-        format: new MVT(),
-      });
+    mapRef.current.addLayer(vtLayer);
+    pmtilesLayerRef.current = vtLayer;
+    pmtilesLoadedRef.current = true;
+  };
 
-      const vtLayer = new VectorTileLayer({
-        source: pmtilesSource,
-        style: (feature) =>
-          new Style({
-            fill: new Fill({ color: getColor(feature.getProperties()) }),
-            stroke: new Stroke({ color: "#333", width: 1 }),
-          }),
-      });
+  useImperativeHandle(ref, () => ({
+    showPmtiles: (pmtilesUrl) => {
+      if (!mapRef.current || !pmtilesUrl) return;
 
-      mapRef.current.addLayer(vtLayer);
-      pmtilesLayerRef.current = vtLayer;
-      pmtilesLoadedRef.current = true;
+      showTileSource(
+        new PMTilesVectorSource({
+          url: pmtilesUrl,
+          format: new MVT(),
+        })
+      );
+    },
+    // tiles rendered on demand by /landuse/tiles/{z}/{x}/{y}.mvt
+    showVectorTiles: (tilesUrl, minZoom, maxZoom) => {
+      if (!mapRef.current || !tilesUrl) return;
+
+      showTileSource(
+        new VectorTileSource({
+          url: tilesUrl,
+          format: new MVT(),
+          minZoom,
+          maxZoom,
+        })
+      );
     },
     clearPmtiles: () => {
       if (mapRef.current && pmtilesLayerRef.current) {
@@ -162,6 +184,7 @@ const LanduseMap = forwardRef(function LanduseMap(
         popupRef.current.innerHTML = `
           <div style="font-size:12px">
             <b>Properties</b><br/>
+            ${props.merged ? "<i>Merged small areas</i><br/>" : ""}
             OSM ID: ${props.osm_id || "-"}<br/>
             Name: ${props.name || "Unnamed"}<br/>
             Landuse: ${props.landuse_type || "Unknown"}<br/>
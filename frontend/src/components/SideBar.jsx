@@ -12,7 +12,7 @@ const bundeslandOptions = [
 
 const landuseOptions = [
   "All","Residential", "Farmland", "Forest", "Allotments", "Flowerbed",
-  "Greenhouse-Horticulture", "Orchard", "Commercial", "Industrial"
+  "Greenhouse-Horticulture", "Orchard", "Commercial", "Industrial", "Natural", "Leisure"
 ];
 
 const geometryOptions = ["All","Point", "Polygon", "MultiPolygon"];
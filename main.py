@@ -1,8 +1,11 @@
-from flask import Flask, send_from_directory
+from flask import Flask, abort, request
+from werkzeug.security import safe_join
 from flask_restx import Api
 from flask_cors import CORS 
 from pathlib import Path
 from app.routes.landuse_routes import landuse_ns
+from app.services.tiles_export_service import touch_pmtiles, start_pmtiles_gc
+from app.services.pmtiles_service import pmtiles_response
 
 APP_DIR = Path(__file__).resolve().parent / "app"
 STATIC_DIR = APP_DIR / "static" / "tiles"
@@ -13,16 +16,26 @@ CORS(app, resources={r"/*": {"origins": ["http://localhost:5173"]}})
 # ✅ Serve pmtiles explicitly
 @app.route("/static/tiles/<path:filename>")
 def serve_pmtiles(filename):
-    return send_from_directory(STATIC_DIR, filename, mimetype="application/vnd.pmtiles")
+    path = safe_join(str(STATIC_DIR), filename)
+    if not path or not touch_pmtiles(path):
+        abort(404)
+    try:
+        return pmtiles_response(path, request)
+    except (FileNotFoundError, ValueError):
+        abort(404)
 
-# ✅ Add no-cache headers (fix stale .pmtiles issue)
+# ✅ Add no-cache headers to the API JSON; archives, tiles and downloads set their own caching headers
 @app.after_request
 def add_header(response):
+    if response.mimetype != "application/json":
+        return response
     response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
     response.headers["Pragma"] = "no-cache"
     response.headers["Expires"] = "0"
     return response
 
+start_pmtiles_gc(STATIC_DIR)
+
 # ✅ Register API
 api = Api(app)
 api.add_namespace(landuse_ns, path="/landuse")
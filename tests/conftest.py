@@ -0,0 +1,55 @@
+import duckdb
+import pytest
+
+from app.config import config_db
+from app.persistence.landuse_persistence import LANDUSE_COLUMNS
+
+class PlainManager(config_db.ConnectionManager):
+    # the pooled manager without the spatial extension, for tests that need no ST_ functions
+    def _open(self):
+        if not self.read_only:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        return duckdb.connect(str(self.path), read_only=self.read_only)
+
+def spatial_available():
+    try:
+        with duckdb.connect() as conn:
+            conn.load_extension("spatial")
+        return True
+    except duckdb.Error:
+        return False
+
+@pytest.fixture
+def plain_store(tmp_path, monkeypatch):
+    # get_connection() on an empty store in tmp_path, without spatial
+    manager = PlainManager(tmp_path / "landuse.duckdb", read_only=False, idle_seconds=0.2)
+    monkeypatch.setattr(config_db, "_manager", manager)
+    yield manager
+    manager.close()
+
+@pytest.fixture
+def spatial_store(tmp_path, monkeypatch):
+    # the real manager (spatial loaded) on an empty store; skipped where the extension is unavailable
+    if not spatial_available():
+        pytest.skip("DuckDB spatial extension unavailable")
+    manager = config_db.ConnectionManager(tmp_path / "landuse.duckdb", read_only=False, idle_seconds=0.2)
+    monkeypatch.setattr(config_db, "_manager", manager)
+    yield manager
+    manager.close()
+
+@pytest.fixture
+def feature_frame():
+    # LANDUSE_COLUMNS frame (geometry as WKB) from (osm_id, landuse_type, geometry) triples
+    import pandas as pd
+    import shapely
+
+    def build(features, osm_type="way"):
+        rows = []
+        for i, (osm_id, landuse_type, geometry) in enumerate(features):
+            min_x, min_y, max_x, max_y = geometry.bounds
+            rows.append({"id": i, "osm_id": str(osm_id), "osm_type": osm_type, "name": None,
+                         "landuse_type": landuse_type, "leisure": None, "natural_type": None, "city": None,
+                         "area": geometry.area, "minx": min_x, "miny": min_y, "maxx": max_x, "maxy": max_y,
+                         "geometry": shapely.to_wkb(geometry)})
+        return pd.DataFrame(rows, columns=LANDUSE_COLUMNS)
+    return build
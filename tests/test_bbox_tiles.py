@@ -0,0 +1,72 @@
+import asyncio
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from app.services import bbox_tile_service
+
+def _tile_frame(osm_id):
+    return gpd.GeoDataFrame({"osm_type": ["way"], "osm_id": [osm_id]}, geometry=[shapely.box(7.0, 49.0, 7.01, 49.01)],
+                            crs="EPSG:4326")
+
+def _stub_fetch(monkeypatch, responses, written):
+    # fetch_overpass_file answers the tiles in order; "bad" responses fail to parse
+    answers = iter(responses)
+
+    async def fetch(session, query, sem):
+        return next(answers)
+
+    def parse(path):
+        if path == "bad":
+            raise ValueError("Malformed element")
+        return _tile_frame(path)
+
+    monkeypatch.setattr(bbox_tile_service, "fetch_overpass_file", fetch)
+    monkeypatch.setattr(bbox_tile_service, "parse_overpass_file", parse)
+    # the stubs live in this process, the real parse pool would not see them
+    monkeypatch.setattr(bbox_tile_service, "_process_pool", lambda workers: ThreadPoolExecutor(workers))
+    monkeypatch.setattr(bbox_tile_service, "_write_tile", lambda key, gdf: written.append(key))
+
+def test_failed_and_unparsable_tiles_are_counted(monkeypatch):
+    written = []
+    _stub_fetch(monkeypatch, ["1", None, "bad", "2"], written)
+    tiles = [(0, 0), (1, 0), (2, 0), (3, 0)]
+    frames, failed = asyncio.run(bbox_tile_service._fetch_tiles(tiles, 14, "all", "all"))
+    assert failed == 2
+    assert sorted(pd.concat(frames)["osm_id"]) == ["1", "2"]
+    # only the good tiles are cached
+    assert len(written) == 2
+
+def test_bbox_result_reports_missing_tiles(monkeypatch):
+    monkeypatch.setattr(bbox_tile_service, "_read_tile", lambda key: None)
+    monkeypatch.setattr(bbox_tile_service, "tiles_for_bounds", lambda bounds, zoom: [(0, 0), (1, 0)])
+
+    async def fetch_tiles(tiles, zoom, landuse_type, geometry_type):
+        return [_tile_frame("1")], 1
+    monkeypatch.setattr(bbox_tile_service, "_fetch_tiles", fetch_tiles)
+
+    gdf, failed = bbox_tile_service.get_landuse_by_tiles((48.9, 6.9, 49.1, 7.1), "all", "all")
+    assert failed == 1
+    assert list(gdf["osm_id"]) == ["1"]
+
+def test_tiles_are_parsed_in_the_parse_processes(monkeypatch, tmp_path):
+    path = tmp_path / "tile.json.gz"
+    way = {"type": "way", "id": 5, "tags": {"landuse": "forest"},
+           "geometry": [{"lat": 49.0, "lon": 7.0}, {"lat": 49.0, "lon": 7.01}, {"lat": 49.01, "lon": 7.01},
+                        {"lat": 49.0, "lon": 7.0}]}
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump({"version": 0.6, "elements": [way]}, f)
+    written = []
+
+    async def fetch(session, query, sem):
+        return path
+    monkeypatch.setattr(bbox_tile_service, "fetch_overpass_file", fetch)
+    monkeypatch.setattr(bbox_tile_service, "_write_tile", lambda key, gdf: written.append(key))
+
+    frames, failed = asyncio.run(bbox_tile_service._fetch_tiles([(0, 0)], 14, "all", "all"))
+    assert failed == 0 and len(written) == 1
+    assert list(frames[0]["osm_id"].astype(str)) == ["5"]
@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+import shapely
+
+from app.utils import boundary_registry, utils
+from app.utils.boundary_registry import BoundaryRegistry
+
+def _feature(id, name, geom):
+    return {"type": "Feature", "properties": {"id": id, "name": name}, "geometry": shapely.geometry.mapping(geom)}
+
+def _write(path, features, mtime_ns):
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+@pytest.fixture
+def registry(tmp_path):
+    json_file = tmp_path / "boundaries.json"
+    _write(json_file, [_feature("DESL", "Saarland", shapely.box(6.3, 49.1, 7.4, 49.6)),
+                       _feature("DERP", "Rheinland-Pfalz", shapely.box(6.1, 48.9, 8.5, 50.9))], 10 ** 18)
+    return BoundaryRegistry(json_file, tmp_path / "boundaries.parquet")
+
+def test_lookup_by_name_any_case(registry):
+    row = registry.get("saarland")
+    assert row["id"] == "DESL" and row["bundesland"] == "Saarland"
+    assert registry.get("SAARLAND") is row
+    assert registry.geometry("Saarland").equals(shapely.box(6.3, 49.1, 7.4, 49.6))
+    assert (row["minx"], row["miny"], row["maxx"], row["maxy"]) == (6.3, 49.1, 7.4, 49.6)
+    assert registry.get("Atlantis") is None and registry.geometry("Atlantis") is None
+
+def test_find_by_point_and_bbox(registry):
+    assert registry.find_by_point(7.0, 49.3) == ["Saarland", "Rheinland-Pfalz"]
+    assert registry.find_by_point(8.0, 50.5) == ["Rheinland-Pfalz"]
+    assert registry.find_by_bbox((9.0, 51.0, 9.5, 51.5)) == []
+
+def test_reloads_when_the_file_changes(registry):
+    assert registry.get("Saarland") is not None
+    _write(registry.json_file, [_feature("DEBE", "Berlin", shapely.box(13.1, 52.3, 13.8, 52.7))], 2 * 10 ** 18)
+    assert registry.get("Saarland") is None
+    assert registry.find_by_point(13.4, 52.5) == ["Berlin"]
+
+def test_keeps_the_loaded_frame_while_the_file_is_unchanged(registry):
+    frame = registry.frame()
+    assert registry.frame() is frame
+
+def test_stale_compiled_file_is_ignored(registry):
+    boundary_registry.compile_boundaries(registry.json_file, registry.compiled_file)
+    os.utime(registry.compiled_file, ns=(10 ** 18, 10 ** 18))
+    assert registry.get("Saarland") is not None
+    _write(registry.json_file, [_feature("DEBE", "Berlin", shapely.box(13.1, 52.3, 13.8, 52.7))], 2 * 10 ** 18)
+    assert registry.get("Berlin") is not None
+
+def test_unknown_state_has_no_grid_size(monkeypatch, registry):
+    monkeypatch.setattr(utils, "get_boundary_registry", lambda: registry)
+    with pytest.raises(ValueError, match="Atlantis not found"):
+        utils.choose_grid_size("Atlantis", "all")
+    assert utils.choose_grid_size("saarland", "all")[1].equals(registry.geometry("Saarland"))
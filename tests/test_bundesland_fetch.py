@@ -0,0 +1,147 @@
+import asyncio
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from shapely.geometry import box
+
+from app.services import landuse_by_bundesland_service as service
+from app.utils import utils
+
+CELLS = [box(7.0, 49.0, 7.1, 49.1), box(7.1, 49.0, 7.2, 49.1), box(7.2, 49.0, 7.3, 49.1)]
+
+def _fetch(monkeypatch, tmp_path, cells=CELLS):
+    monkeypatch.setattr(service, "CELL_CACHE_DIR", tmp_path / "cells")
+    monkeypatch.setattr(utils, "GRID_SIZES_FILE", tmp_path / "grid_sizes.json")
+    report = {}
+    files = asyncio.run(asyncio.wait_for(
+        service.fetch_all_overpass("Saarland", cells, "all", "", max_concurrent=1, report=report), timeout=30))
+    return files, report
+
+def test_failing_cells_do_not_stop_the_workers(monkeypatch, tmp_path):
+    # every cell raises an unexpected error, more cells than workers: the run still finishes
+    def broken_query(*args, **kwargs):
+        raise KeyError("tags")
+    monkeypatch.setattr(service, "build_overpass_query", broken_query)
+
+    files, report = _fetch(monkeypatch, tmp_path)
+    assert files == []
+    assert report["lost"] == len(CELLS)
+
+class FakePool(Executor):
+    # runs parse_and_write_cell inline; the first `broken` pools raise BrokenProcessPool on submit
+    created = []
+
+    def __init__(self, broken):
+        self.broken = broken
+        FakePool.created.append(self)
+
+    def submit(self, fn, *args):
+        if self.broken:
+            raise BrokenProcessPool("worker killed")
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+def _parse_setup(monkeypatch, tmp_path, broken_pools, parse_result=2):
+    FakePool.created = []
+    monkeypatch.setattr(service, "_process_pool", lambda workers: FakePool(len(FakePool.created) < broken_pools))
+    monkeypatch.setattr(service, "build_overpass_query", lambda cell, *args, **kwargs: str(cell.bounds))
+
+    async def fetched(session, query, *args):
+        return tmp_path / "response.json.gz"
+    monkeypatch.setattr(service, "_fetch_with_retries", fetched)
+
+    def parse(path, filename):
+        if isinstance(parse_result, Exception):
+            raise parse_result
+        return parse_result
+    monkeypatch.setattr(service, "parse_and_write_cell", parse)
+
+def test_broken_pool_is_replaced(monkeypatch, tmp_path):
+    _parse_setup(monkeypatch, tmp_path, broken_pools=1)
+    files, report = _fetch(monkeypatch, tmp_path)
+    assert len(files) == len(CELLS)
+    assert report["pool_restarts"] == 1 and report["lost"] == 0
+
+def test_pool_that_keeps_breaking_fails_the_run(monkeypatch, tmp_path):
+    _parse_setup(monkeypatch, tmp_path, broken_pools=service.MAX_POOL_RESTARTS + 5)
+    with pytest.raises(RuntimeError):
+        _fetch(monkeypatch, tmp_path)
+    assert len(FakePool.created) == service.MAX_POOL_RESTARTS + 1
+
+def test_parser_errors_lose_only_their_cell(monkeypatch, tmp_path):
+    _parse_setup(monkeypatch, tmp_path, broken_pools=0, parse_result=TypeError("'NoneType' object"))
+    files, report = _fetch(monkeypatch, tmp_path)
+    assert files == []
+    assert report["lost"] == len(CELLS) and report["fetched"] == len(CELLS)
+
+def _density_setup(monkeypatch, count, overloaded=lambda cell: False):
+    # cells answer with count(cell) elements, overloaded(cell) ones with an Overpass overload
+    monkeypatch.setattr(service, "_process_pool", lambda workers: FakePool(False))
+    monkeypatch.setattr(service, "build_overpass_query", lambda cell, *args, **kwargs: cell)
+    fetched = []
+
+    async def fetch(session, cell, *args):
+        fetched.append(cell)
+        if overloaded(cell):
+            raise service.OverpassOverloaded("runtime error: timeout")
+        return cell
+    monkeypatch.setattr(service, "_fetch_with_retries", fetch)
+    monkeypatch.setattr(service, "parse_and_write_cell", lambda cell, filename: count(cell))
+    return fetched
+
+def _in_first(cell):
+    return cell.bounds[2] <= 7.1
+
+def test_dense_cell_is_split_up_front_next_time(monkeypatch, tmp_path):
+    fetched = _density_setup(monkeypatch, lambda cell: service.MAX_CELL_ELEMENTS + 1 if _in_first(cell) else 10)
+    _fetch(monkeypatch, tmp_path)
+    assert utils.get_learned_depths("Saarland", "all") == {utils.grid_cell_key(CELLS[0]): 1}
+
+    # only the dense cell comes as quadrants, its neighbours keep their size
+    fetched.clear()
+    _, report = _fetch(monkeypatch, tmp_path)
+    assert report["cells"] == 4 + 2
+    assert sorted(round(service._cell_size(c), 3) for c in fetched) == [0.05] * 4 + [0.1] * 2
+
+def test_overloaded_cell_deepens_only_its_own_region(monkeypatch, tmp_path):
+    _density_setup(monkeypatch, lambda cell: 10,
+                   overloaded=lambda cell: _in_first(cell) and service._cell_size(cell) > 0.03)
+    _, report = _fetch(monkeypatch, tmp_path)
+    assert report["split"] == 1 + 4 and report["lost"] == 0
+    assert utils.get_learned_depths("Saarland", "all") == {utils.grid_cell_key(CELLS[0]): 2}
+
+def test_sparse_cells_grow_back(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "GRID_SIZES_FILE", tmp_path / "grid_sizes.json")
+    utils.remember_depths("Saarland", "all", {utils.grid_cell_key(CELLS[0]): 2})
+    _density_setup(monkeypatch, lambda cell: 10)
+    _, report = _fetch(monkeypatch, tmp_path)
+    assert report["cells"] == 16 + 2
+    assert utils.get_learned_depths("Saarland", "all") == {utils.grid_cell_key(CELLS[0]): 1}
+    _fetch(monkeypatch, tmp_path)
+    assert utils.get_learned_depths("Saarland", "all") == {}
+
+def test_lost_cells_keep_the_depth(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "GRID_SIZES_FILE", tmp_path / "grid_sizes.json")
+    utils.remember_depths("Saarland", "all", {utils.grid_cell_key(CELLS[0]): 1})
+    _density_setup(monkeypatch, lambda cell: 10)
+
+    async def lost(session, cell, *args):
+        return None if _in_first(cell) else cell
+    monkeypatch.setattr(service, "_fetch_with_retries", lost)
+    _fetch(monkeypatch, tmp_path)
+    assert utils.get_learned_depths("Saarland", "all") == {utils.grid_cell_key(CELLS[0]): 1}
+
+def test_shrinking_stops_at_the_minimum_cell_size(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "GRID_SIZES_FILE", tmp_path / "grid_sizes.json")
+    utils.remember_depths("Saarland", "all", {utils.grid_cell_key(CELLS[0]): 10})
+    fetched = _density_setup(monkeypatch, lambda cell: service.MAX_CELL_ELEMENTS + 1)
+    _fetch(monkeypatch, tmp_path, cells=CELLS[:1])
+    # 0.1° cells go down to 0.0125°, one more split would be under MIN_CELL_SIZE_DEG (0.01°)
+    assert len(fetched) == 4 ** 3
+    assert min(service._cell_size(c) for c in fetched) >= service.MIN_CELL_SIZE_DEG
+    assert utils.get_learned_depths("Saarland", "all") == {utils.grid_cell_key(CELLS[0]): 3}
@@ -0,0 +1,82 @@
+import geopandas as gpd
+from shapely.geometry import Polygon, box
+
+from app.config.config_db import get_connection
+from app.persistence import landuse_persistence
+from app.services import landuse_by_bundesland_service as bundesland_service
+from app.services import landuse_service
+from app.services.landuse_by_bundesland_service import ingest_cell_files
+
+# feature 2 crosses the border between the two cells and comes back from both, the copy of the
+# second cell with one vertex more (as Overpass returns it when the way got a node there)
+SHARED = box(7.09, 49.0, 7.11, 49.01)
+SHARED_DETAILED = Polygon([(7.09, 49.0), (7.10, 49.0), (7.11, 49.0), (7.11, 49.01), (7.09, 49.01)])
+
+def _cell(path, rows):
+    gdf = gpd.GeoDataFrame({"id": [f"way/{i}" for i, _ in rows], "osm_id": [i for i, _ in rows],
+                            "osm_type": "way", "name": None, "landuse_type": "meadow", "leisure": None,
+                            "city": None, "area": [g.area for _, g in rows]},
+                           geometry=[g for _, g in rows], crs="EPSG:4326")
+    gdf.to_parquet(path, index=False)
+    return str(path)
+
+def _cells(directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    return [_cell(directory / "Saarland_grid_1_a.geoparquet", [(1, box(7.0, 49.0, 7.05, 49.01)), (2, SHARED)]),
+            _cell(directory / "Saarland_grid_2_b.geoparquet", [(2, SHARED_DETAILED), (3, box(7.15, 49.0, 7.2, 49.01))])]
+
+def test_overlapping_cells_ingest_once(spatial_store, tmp_path, monkeypatch):
+    monkeypatch.setattr(bundesland_service, "CELL_CACHE_DIR", tmp_path / "cells")
+    assert ingest_cell_files("Saarland", _cells(tmp_path / "cells")) == 3
+    # the files are gone after the ingest; the same cells again must not add rows
+    assert not list((tmp_path / "cells").glob("*.geoparquet"))
+    assert ingest_cell_files("Saarland", _cells(tmp_path / "cells")) == 3
+
+    conn = get_connection()
+    rows = conn.execute("""SELECT osm_id, ST_NPoints(geometry) FROM landuse_by_h3
+                           WHERE osm_type = 'way' ORDER BY osm_id;""").fetchall()
+    conn.close()
+    assert [r[0] for r in rows] == ["1", "2", "3"]
+    # the more detailed copy of the shared feature wins
+    assert rows[1][1] == 6
+
+def _fetched_state(monkeypatch, tmp_path, ingest):
+    # normalize_bundesland_landuse for a state that is in neither store, with the fetch stubbed out
+    files = _cells(tmp_path / "cells")
+    cleaned = []
+
+    class Registry:
+        def geometry(self, name):
+            return box(6.0, 48.0, 8.0, 50.0)
+    monkeypatch.setattr(landuse_service, "get_boundary_registry", lambda: Registry())
+    monkeypatch.setattr(landuse_service, "query_local_boundary", lambda *args: None)
+    monkeypatch.setattr(landuse_service, "store_covers", lambda *args: False)
+    monkeypatch.setattr(landuse_service, "get_landuse_data_by_bundesland", lambda *args, **kwargs: files)
+    monkeypatch.setattr(landuse_service, "write_features", lambda *args: None)
+    monkeypatch.setattr(landuse_service, "read_features", lambda *args: "stored")
+    monkeypatch.setattr(landuse_service, "ingest_cell_files", ingest)
+    monkeypatch.setattr(landuse_service, "clean_cell_files", lambda bundesland, f: cleaned.append(f))
+    return files, cleaned, landuse_service.normalize_bundesland_landuse("Saarland", "all", "")
+
+def test_state_fetch_ingests_its_cells(monkeypatch, tmp_path):
+    ingested = []
+    files, cleaned, result = _fetched_state(monkeypatch, tmp_path, lambda bundesland, f: ingested.append(f))
+    assert result == ("stored", 0)
+    assert ingested == [files] and cleaned == []
+
+def test_failed_ingest_still_cleans_the_cells(monkeypatch, tmp_path):
+    def ingest(bundesland, files):
+        raise RuntimeError("spatial extension unavailable")
+    files, cleaned, result = _fetched_state(monkeypatch, tmp_path, ingest)
+    assert result == ("stored", 0)
+    assert cleaned == [files]
+
+def test_cell_ingest_keeps_the_data_version(plain_store, monkeypatch, tmp_path):
+    # artifacts, archives and tiles of other areas stay valid after a state fetch
+    landuse_persistence.bump_data_version()
+    for name in ("create_landuse_table", "upgrade_landuse_table", "create_landuse_index", "ensure_stats"):
+        monkeypatch.setattr(bundesland_service, name, lambda *args, **kwargs: None)
+    monkeypatch.setattr(bundesland_service, "add_landuse_data", lambda files: 3)
+    monkeypatch.setattr(bundesland_service, "CELL_CACHE_DIR", tmp_path / "cells")
+    assert ingest_cell_files("Saarland", _cells(tmp_path / "cells")) == 3
+    assert landuse_persistence.get_data_version() == 1
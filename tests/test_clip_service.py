@@ -0,0 +1,61 @@
+import geopandas as gpd
+import pytest
+import shapely
+from shapely.geometry import LineString, Point, Polygon, box
+
+from app.services import clip_service, landuse_service
+from app.services.clip_service import clip_to_boundary
+
+# a concave state: an L-shaped boundary with a notch, so boxes can be inside, crossing or outside it
+BOUNDARY = Polygon([(0, 0), (4, 0), (4, 2), (2, 2), (2, 4), (0, 4)])
+
+def _frame():
+    geometries = [
+        box(0.5, 0.5, 1.0, 1.0),                    # inside
+        box(1.5, 1.5, 3.0, 3.0),                    # across the notch
+        box(3.0, 3.0, 3.5, 3.5),                    # in the notch, outside
+        box(-1.0, -1.0, 5.0, 5.0),                  # covers the whole state
+        LineString([(-1, 1), (5, 1)]),              # line through the state
+        LineString([(1, 3), (3, 3), (3, 1)]),       # line leaving and re-entering it
+        Point(1, 1),                                # point inside
+        Point(3, 3),                                # point outside
+        box(4.0, 0.0, 5.0, 1.0),                    # touching the border from outside
+    ]
+    return gpd.GeoDataFrame({"osm_id": [str(i) for i in range(len(geometries))]}, geometry=geometries,
+                            crs="EPSG:4326")
+
+def _expected(gdf, boundary):
+    # reference result: intersection with the boundary, empty results and polygons that only touch
+    # the border (leaving a line) dropped
+    clipped = gdf.geometry.intersection(boundary)
+    keep = ~clipped.is_empty & (shapely.get_dimensions(clipped.values) == shapely.get_dimensions(gdf.geometry.values))
+    return gdf[keep].assign(geometry=clipped[keep])
+
+def _assert_same(result, expected):
+    assert list(result["osm_id"]) == list(expected["osm_id"])
+    for got, want in zip(result.geometry, expected.geometry):
+        assert shapely.equals(shapely.normalize(got), shapely.normalize(want)) or \
+            got.symmetric_difference(want).area < 1e-12 and abs(got.length - want.length) < 1e-9
+
+@pytest.mark.parametrize("max_vertices", [4, 256])
+def test_clip_matches_intersection(max_vertices):
+    gdf = _frame()
+    result = clip_to_boundary(gdf, BOUNDARY, workers=1, max_vertices=max_vertices)
+    _assert_same(result, _expected(gdf, BOUNDARY))
+
+def test_parallel_clip_matches_intersection(monkeypatch):
+    monkeypatch.setattr(clip_service, "CLIP_PARALLEL_MIN", 1)
+    gdf = _frame()
+    _assert_same(clip_to_boundary(gdf, BOUNDARY, workers=2), _expected(gdf, BOUNDARY))
+
+class StubRegistry:
+    def geometry(self, name):
+        return BOUNDARY
+
+def test_state_results_from_the_local_store_are_clipped(monkeypatch):
+    monkeypatch.setattr(landuse_service, "get_boundary_registry", lambda: StubRegistry())
+    monkeypatch.setattr(landuse_service, "query_local_boundary", lambda *args: _frame())
+    result, lost = landuse_service.normalize_bundesland_landuse("Teststaat", "all", "")
+    assert lost == 0
+    assert result.geometry.within(BOUNDARY.buffer(1e-9)).all()
+    assert "2" not in set(result["osm_id"])
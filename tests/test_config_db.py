@@ -0,0 +1,101 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from tests.conftest import PlainManager
+
+def _open_in_other_process(path, hold=0.0):
+    # exit code 0 when another process can take the file read-write
+    code = (f"import duckdb, time; c = duckdb.connect({str(path)!r}); "
+            f"c.execute('CREATE TABLE IF NOT EXISTS t(x INT)'); time.sleep({hold}); c.close()")
+    return subprocess.Popen([sys.executable, "-c", code], stderr=subprocess.PIPE)
+
+def test_idle_handle_releases_the_file_lock(tmp_path):
+    manager = PlainManager(tmp_path / "store.duckdb", idle_seconds=0.2, lock_timeout=0)
+    conn = manager.cursor()
+    conn.execute("SELECT 1;").fetchone()
+
+    # a lease is open: the other process is locked out
+    assert _open_in_other_process(manager.path).wait() != 0
+
+    conn.close()
+    time.sleep(0.5)
+    assert _open_in_other_process(manager.path).wait() == 0
+    manager.close()
+
+def test_open_waits_for_another_process(tmp_path):
+    path = tmp_path / "store.duckdb"
+    other = _open_in_other_process(path, hold=1.0)
+    time.sleep(0.5)
+    manager = PlainManager(path, idle_seconds=0, lock_timeout=10)
+    conn = manager.cursor()
+    assert conn.execute("SELECT count(*) FROM t;").fetchone() == (0,)
+    conn.close()
+    assert other.wait() == 0
+    assert manager.lock_waits > 0
+    manager.close()
+
+def test_unclosed_cursor_ends_its_lease(tmp_path):
+    manager = PlainManager(tmp_path / "store.duckdb", idle_seconds=0.05)
+    conn = manager.cursor()
+    conn.execute("SELECT 1;")
+    assert manager._leases == 1
+    del conn
+    assert manager._leases == 0
+    time.sleep(0.3)
+    assert manager._db is None
+
+def test_handle_stays_open_without_idle_seconds(tmp_path):
+    manager = PlainManager(tmp_path / "store.duckdb", idle_seconds=0, lock_timeout=0)
+    conn = manager.cursor()
+    conn.execute("SELECT 1;").fetchone()
+    db = manager._db
+    conn.close()
+    time.sleep(0.3)
+    # no reopen (and no reload of the spatial extension) for the next query
+    assert manager._db is db
+    manager.cursor().close()
+    assert manager._db is db
+    manager.close()
+
+def test_reader_hands_the_store_to_a_claiming_writer(tmp_path):
+    path = tmp_path / "store.duckdb"
+    reader = PlainManager(path, idle_seconds=60, lock_timeout=20)
+    conn = reader.cursor()
+    conn.execute("CREATE TABLE t(x INT);")
+    conn.close()
+
+    # the handle is still open (60 s idle time), the writer only gets it through the claim
+    code = ("import time; from tests.conftest import PlainManager; "
+            f"m = PlainManager({str(path)!r}, lock_timeout=0); m.claim_writer(timeout=20); c = m.cursor(); "
+            "c.execute('INSERT INTO t VALUES (1)'); c.close(); time.sleep(0.5); m.close()")
+    writer = subprocess.Popen([sys.executable, "-c", code], cwd=Path(__file__).parents[1])
+    intent = path.with_name(f"{path.name}.writer")
+    deadline = time.monotonic() + 20
+    while not intent.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.1)
+
+    conn = reader.cursor()
+    assert conn.execute("SELECT count(*) FROM t;").fetchone() == (1,)
+    conn.close()
+    assert writer.wait() == 0
+    assert not intent.exists()
+    reader.close()
+
+def test_idle_reader_hands_the_store_to_a_claiming_writer(tmp_path):
+    # no query after the claim: the open handle notices the writer on its own
+    path = tmp_path / "store.duckdb"
+    reader = PlainManager(path, idle_seconds=0, lock_timeout=20)
+    conn = reader.cursor()
+    conn.execute("CREATE TABLE t(x INT);")
+    conn.close()
+
+    code = ("from tests.conftest import PlainManager; "
+            f"m = PlainManager({str(path)!r}, lock_timeout=0); m.claim_writer(timeout=10); c = m.cursor(); "
+            "c.execute('INSERT INTO t VALUES (1)'); c.close(); m.close()")
+    writer = subprocess.Popen([sys.executable, "-c", code], cwd=Path(__file__).parents[1])
+    assert writer.wait(15) == 0
+    assert reader._db is None
+    reader.close()
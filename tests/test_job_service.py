@@ -0,0 +1,92 @@
+import threading
+import time
+
+import geopandas as gpd
+import pytest
+
+from app.services import job_service
+from app.services.job_service import JobManager
+
+AREA = ("bundesland", "Saarland")
+
+class StubFetch:
+    # normalize_bundesland_landuse stand-in: the first call runs until it is cancelled, later ones return
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.calls = 0
+        self.started = threading.Event()
+        self.lock = threading.Lock()
+
+    def __call__(self, bundesland, landuse_type, geometry_type, report=None, cancel=None):
+        with self.lock:
+            self.calls += 1
+            first = self.calls == 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.started.set()
+        try:
+            while first and not cancel.is_set():
+                time.sleep(0.01)
+            # stopping takes a moment, like a cell that is still being parsed
+            time.sleep(0.1)
+            return gpd.GeoDataFrame({"osm_id": []}, geometry=[], crs="EPSG:4326"), 0
+        finally:
+            with self.lock:
+                self.active -= 1
+
+@pytest.fixture
+def fetch(monkeypatch):
+    stub = StubFetch()
+    monkeypatch.setattr(job_service, "normalize_bundesland_landuse", stub)
+    return stub
+
+def _wait(job, timeout=5):
+    job.future.exception(timeout)
+    return job.status
+
+def test_identical_submission_attaches(fetch):
+    manager = JobManager(workers=2)
+    first, attached = manager.submit("key", "download", AREA, "all", "", "geojson")
+    second, attached_again = manager.submit("key", "download", AREA, "all", "", "geojson")
+    assert not attached and attached_again and second is first
+    manager.cancel(first.id)
+    assert _wait(first) == "cancelled"
+
+def test_resubmission_waits_for_the_cancelling_job(fetch):
+    manager = JobManager(workers=2)
+    first, _ = manager.submit("key", "download", AREA, "all", "", "geojson")
+    assert fetch.started.wait(5)
+    manager.cancel(first.id)
+    assert first.status == "cancelling"
+
+    second, attached = manager.submit("key", "download", AREA, "all", "", "geojson")
+    assert not attached and second is not first
+    assert _wait(first) == "cancelled"
+    assert _wait(second) == "done"
+    # the two never fetched at the same time
+    assert fetch.calls == 2 and fetch.max_active == 1
+    time.sleep(0.05)
+    assert manager._running == {}
+
+def test_cancelled_job_keeps_its_key_until_it_stops(fetch):
+    manager = JobManager(workers=1)
+    job, _ = manager.submit("key", "download", AREA, "all", "", "geojson")
+    assert fetch.started.wait(5)
+    manager.cancel(job.id)
+    assert manager._running.get("key") is job
+    _wait(job)
+    time.sleep(0.05)
+    assert "key" not in manager._running
+
+def test_incomplete_download_is_not_cached(monkeypatch):
+    built = []
+    frame = gpd.GeoDataFrame({"osm_id": ["1"]}, geometry=gpd.points_from_xy([7.0], [49.0]), crs="EPSG:4326")
+    monkeypatch.setattr(job_service, "normalize_bundesland_landuse", lambda *args, **kwargs: (frame, 2))
+    monkeypatch.setattr(job_service, "build_artifact", lambda *args: built.append(args))
+    manager = JobManager(workers=1)
+    job, _ = manager.submit("key", "download", AREA, "all", "", "geojson")
+    assert _wait(job) == "done"
+    assert job.future.result() == {"empty": False, "incomplete": True}
+    assert job.progress["lost"] == 2
+    assert built == []
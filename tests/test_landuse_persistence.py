@@ -0,0 +1,148 @@
+import pandas as pd
+import pytest
+import shapely
+
+from app.persistence import landuse_persistence
+
+# L-shaped state: the bbox query alone also finds features in the missing corner
+BOUNDARY = shapely.Polygon([(7.0, 49.0), (7.4, 49.0), (7.4, 49.2), (7.2, 49.2), (7.2, 49.4), (7.0, 49.4)])
+
+class RecordingConnection:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, query, params=None):
+        self.calls.append((query, params))
+        return self
+
+    def df(self):
+        return pd.DataFrame()
+
+    def close(self):
+        pass
+
+def test_boundary_is_bound_not_inlined(monkeypatch):
+    conn = RecordingConnection()
+    monkeypatch.setattr(landuse_persistence, "get_connection", lambda: conn)
+    landuse_persistence.get_landuse_by_bounds(BOUNDARY.bounds, "forest", "", boundary_wkb=BOUNDARY.wkb)
+
+    (query, params), = conn.calls
+    assert "POLYGON" not in query
+    assert "ST_GeomFromWKB(?)" in query
+    # the envelope stays in the text, the R-tree needs it as a constant
+    assert "ST_MakeEnvelope(7.0, 49.0, 7.4, 49.4)" in query
+    assert params == ["forest", BOUNDARY.wkb]
+
+def test_bounds_query_keeps_features_of_the_boundary(spatial_store, feature_frame):
+    landuse_persistence.create_landuse_table()
+    landuse_persistence.insert_landuse_features(feature_frame([
+        (1, "forest", shapely.box(7.05, 49.05, 7.1, 49.1)),
+        (2, "forest", shapely.box(7.3, 49.3, 7.35, 49.35)),
+        (3, "meadow", shapely.box(7.15, 49.15, 7.3, 49.18)),
+    ]))
+    landuse_persistence.create_landuse_index()
+
+    everything = landuse_persistence.get_landuse_by_bounds(BOUNDARY.bounds, "all", "")
+    inside = landuse_persistence.get_landuse_by_bounds(BOUNDARY.bounds, "all", "", boundary_wkb=BOUNDARY.wkb)
+    assert sorted(everything["osm_id"]) == ["1", "2", "3"]
+    assert sorted(inside["osm_id"]) == ["1", "3"]
+
+def _stats_store(cells, cell_size=0.01):
+    # store_meta and landuse_stats_by_cell as build_landuse_stats leaves them, one forest per cell
+    conn = landuse_persistence.get_connection()
+    conn.execute("""CREATE TABLE store_meta(key VARCHAR PRIMARY KEY, value VARCHAR);
+                    CREATE TABLE landuse_stats_by_cell(cell_x INTEGER, cell_y INTEGER, landuse_type VARCHAR,
+                                                       osm_type VARCHAR, feature_count BIGINT, area DOUBLE);""")
+    conn.execute("INSERT INTO store_meta VALUES ('stats_cell_size', ?);", [str(cell_size)])
+    for x, y in cells:
+        conn.execute("INSERT INTO landuse_stats_by_cell VALUES (?, ?, 'forest', 'way', 1, 10.0);", [x, y])
+    conn.close()
+
+def test_bbox_smaller_than_a_cell_counts_its_cell(plain_store):
+    _stats_store([(1330, 5245), (1331, 5245)])
+    df, cell_bounds = landuse_persistence.get_bounds_stats((13.302, 52.451, 13.304, 52.453), "all", "")
+    assert df["feature_count"].tolist() == [1]
+    assert cell_bounds == pytest.approx((13.30, 52.45, 13.31, 52.46))
+
+def test_bbox_on_grid_lines_keeps_to_its_cells(plain_store):
+    _stats_store([(1329, 5245), (1330, 5245), (1331, 5245), (1332, 5245)])
+    df, cell_bounds = landuse_persistence.get_bounds_stats((13.30, 52.45, 13.32, 52.46), "all", "")
+    assert df["feature_count"].tolist() == [2]
+    assert cell_bounds == pytest.approx((13.30, 52.45, 13.32, 52.46))
+
+def _state_stats(bundesland):
+    df = landuse_persistence.get_state_stats(bundesland, "all", "")
+    return {row.landuse_type: (row.feature_count, pytest.approx(row.area)) for row in df.itertuples()}
+
+def test_state_stats_split_border_features_by_area(spatial_store, feature_frame):
+    west, east = shapely.box(7.0, 49.0, 7.2, 49.2), shapely.box(7.2, 49.0, 7.4, 49.2)
+    boundaries = pd.DataFrame({"bundesland": ["West", "East"],
+                               "minx": [7.0, 7.2], "miny": [49.0, 49.0], "maxx": [7.2, 7.4], "maxy": [49.2, 49.2],
+                               "geometry": [west.wkb, east.wkb]})
+    landuse_persistence.create_landuse_table()
+    features = feature_frame([
+        (1, "forest", shapely.box(7.05, 49.05, 7.1, 49.1)),
+        # a quarter in the west, three quarters in the east
+        (2, "forest", shapely.box(7.19, 49.05, 7.23, 49.1)),
+        (3, "meadow", shapely.box(7.3, 49.05, 7.35, 49.1)),
+    ])
+    features["area"] = [100.0, 400.0, 50.0]
+    landuse_persistence.insert_landuse_features(features)
+    landuse_persistence.refresh_landuse_stats(boundaries)
+
+    # contained features count in full, the border one in both states by its share
+    assert _state_stats("West") == {"forest": (2, 200.0)}
+    assert _state_stats("east") == {"forest": (1, 300.0), "meadow": (1, 50.0)}
+
+    # incremental upkeep (MERGE into the existing rows): feature 2 moves into the east
+    keys = [("way", "2")]
+    landuse_persistence.adjust_landuse_stats(keys, -1)
+    landuse_persistence.delete_landuse_features(keys)
+    moved = feature_frame([(2, "forest", shapely.box(7.25, 49.05, 7.29, 49.1))])
+    moved["area"] = [400.0]
+    landuse_persistence.insert_landuse_features(moved)
+    landuse_persistence.adjust_landuse_stats(keys, 1)
+
+    assert _state_stats("West") == {"forest": (1, 100.0)}
+    assert _state_stats("East") == {"forest": (1, 400.0), "meadow": (1, 50.0)}
+
+def test_untagged_types_are_filtered_by_their_tag(monkeypatch):
+    conn = RecordingConnection()
+    monkeypatch.setattr(landuse_persistence, "get_connection", lambda: conn)
+    landuse_persistence.get_landuse_by_bounds(BOUNDARY.bounds, "natural", "")
+    landuse_persistence.get_landuse_by_bounds(BOUNDARY.bounds, "all", "")
+
+    (natural, params), (everything, _) = conn.calls
+    assert params == ["natural"]
+    assert f"{landuse_persistence.LANDUSE_TYPE_SQL} = ?" in natural
+    assert f"{landuse_persistence.LANDUSE_TYPE_SQL} AS landuse_type" in natural
+    assert "NOT IN ('natural', 'leisure')" in everything
+
+def test_untagged_types_count_apart_from_all(plain_store):
+    _stats_store([(1330, 5245)])
+    conn = landuse_persistence.get_connection()
+    conn.execute("INSERT INTO landuse_stats_by_cell VALUES (1330, 5245, 'natural', 'way', 3, 30.0);")
+    conn.close()
+    bounds = (13.30, 52.45, 13.31, 52.46)
+    everything, _ = landuse_persistence.get_bounds_stats(bounds, "all", "")
+    natural, _ = landuse_persistence.get_bounds_stats(bounds, "natural", "")
+    assert everything["landuse_type"].tolist() == ["forest"]
+    assert natural[["landuse_type", "feature_count"]].values.tolist() == [["natural", 3]]
+
+def test_pbf_natural_and_leisure_features_are_served(spatial_store, feature_frame):
+    landuse_persistence.create_landuse_table()
+    features = feature_frame([
+        (1, "forest", shapely.box(7.05, 49.05, 7.1, 49.1)),
+        (2, None, shapely.box(7.1, 49.05, 7.15, 49.1)),
+        (3, None, shapely.box(7.15, 49.05, 7.2, 49.1)),
+    ])
+    features["natural_type"] = [None, "wood", None]
+    features["leisure"] = ["park", None, "park"]
+    landuse_persistence.insert_landuse_features(features)
+
+    def served(landuse_type):
+        df = landuse_persistence.get_landuse_by_bounds(BOUNDARY.bounds, landuse_type, "")
+        return dict(zip(df["osm_id"], df["landuse_type"]))
+    assert served("all") == {"1": "forest"}
+    assert served("natural") == {"2": "natural"}
+    assert served("leisure") == {"3": "leisure"}
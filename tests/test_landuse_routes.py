@@ -0,0 +1,29 @@
+import geopandas as gpd
+import pytest
+from flask import Flask
+from flask_restx import Api
+
+from app.routes import landuse_routes
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    Api(app).add_namespace(landuse_routes.landuse_ns)
+    return app.test_client()
+
+def _stub_download(monkeypatch, lost):
+    exported = []
+    frame = gpd.GeoDataFrame({"osm_id": ["1"]}, geometry=gpd.points_from_xy([7.0], [49.0]), crs="EPSG:4326")
+    monkeypatch.setattr(landuse_routes, "artifact_key", lambda *args: "key")
+    monkeypatch.setattr(landuse_routes, "cached_artifact", lambda key, format: None)
+    monkeypatch.setattr(landuse_routes, "_load_area", lambda *args: (frame, lost))
+    monkeypatch.setattr(landuse_routes, "export_artifact",
+                        lambda df, key, format: exported.append(key) or {"exported": True})
+    return exported
+
+@pytest.mark.parametrize("lost, key", [(0, "key"), (3, None)])
+def test_download_caches_complete_results_only(client, monkeypatch, lost, key):
+    exported = _stub_download(monkeypatch, lost)
+    response = client.get("/landuse/download?bundesland=Saarland&format=geojson")
+    assert response.status_code == 200
+    assert exported == [key]
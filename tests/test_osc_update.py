@@ -0,0 +1,108 @@
+from pathlib import Path
+
+import pytest
+import shapely
+
+osmium = pytest.importorskip("osmium")
+
+from app.config.config_db import get_connection
+from app.persistence.landuse_persistence import LANDUSE_COLUMNS
+from app.persistence.osm_index_persistence import (create_osm_index_tables, add_relation_members,
+                                                   get_way_coordinates, get_known_nodes)
+from app.services import osc_update_service
+from app.services.osc_update_service import apply_changes, read_changes
+from app.services.pbf_ingest_service import _OsmIndexBuffer, _make_handler, _tracked_relations
+
+FIXTURES = Path(__file__).parent / "fixtures"
+BASE = FIXTURES / "base.osm"
+CHANGE = FIXTURES / "change.osc"
+
+def _insert_plain(df):
+    # insert_landuse_features without ST_GeomFromWKB: the geometry column holds the WKB as it is
+    conn = get_connection()
+    conn.register("features_view", df)
+    conn.execute(f"INSERT INTO landuse_by_h3 ({', '.join(LANDUSE_COLUMNS)}) "
+                 f"SELECT {', '.join(LANDUSE_COLUMNS)} FROM features_view;")
+    conn.unregister("features_view")
+    conn.close()
+
+@pytest.fixture
+def store(plain_store, monkeypatch):
+    # the base extract ingested like pbf_ingest does, into a landuse table with a BLOB geometry
+    monkeypatch.setattr(osc_update_service, "insert_landuse_features", _insert_plain)
+    monkeypatch.setattr(osc_update_service, "upgrade_landuse_table", lambda: None)
+    conn = get_connection()
+    conn.execute(f"""CREATE TABLE landuse_by_h3(id VARCHAR, osm_id VARCHAR, osm_type VARCHAR, name VARCHAR,
+                         landuse_type VARCHAR, leisure VARCHAR, natural_type VARCHAR, city VARCHAR, area DOUBLE,
+                         minx DOUBLE, miny DOUBLE, maxx DOUBLE, maxy DOUBLE, geometry BLOB);""")
+    conn.close()
+    create_osm_index_tables(replace=True)
+    relation_members, member_ways = _tracked_relations(osmium, BASE)
+    add_relation_members(relation_members)
+    index = _OsmIndexBuffer(member_ways, 100)
+    handler = _make_handler(osmium, _insert_plain, 100, index)
+    handler.apply_file(str(BASE), locations=True)
+    handler.flush()
+    return plain_store
+
+def _features():
+    conn = get_connection()
+    rows = conn.execute("SELECT osm_type, osm_id, landuse_type, name, natural_type, city, geometry "
+                        "FROM landuse_by_h3;").fetchall()
+    conn.close()
+    return {(t, int(i)): {"landuse_type": l, "name": n, "natural_type": nt, "city": c,
+                          "geometry": shapely.from_wkb(bytes(g))} for t, i, l, n, nt, c, g in rows}
+
+def test_base_ingest(store):
+    features = _features()
+    assert set(features) == {("way", 10), ("way", 11), ("way", 12), ("way", 13), ("way", 15), ("relation", 100),
+                             ("node", 30)}
+    assert get_way_coordinates({20, 21})["way_id"].nunique() == 2
+
+def test_read_changes_keeps_newest_versions():
+    changes = read_changes([CHANGE])
+    assert changes.ways[11][2] == {"landuse": "farmland"}
+    assert changes.ways[12][0] is True
+    assert changes.nodes[15][1] == pytest.approx((7.015, 49.035))
+    assert [m[1] for m in changes.relations[100][1]] == [20, 21, 22]
+
+def test_insert_modify_delete(store):
+    apply_changes([CHANGE])
+    features = _features()
+    # inserted
+    assert features[("way", 14)]["landuse_type"] == "allotments"
+    assert features[("way", 14)]["geometry"].equals(shapely.box(7.06, 49.0, 7.07, 49.01))
+    # modified tags, same geometry
+    assert features[("way", 11)]["landuse_type"] == "farmland"
+    # deleted way and tagged node, with the way's node locations
+    assert ("way", 12) not in features and ("node", 30) not in features
+    assert not get_known_nodes({9, 10, 11, 12})
+    # untouched
+    assert features[("way", 10)]["name"] == "Alte Wiese"
+
+def test_moved_node_rebuilds_way_with_stored_tags(store):
+    report = apply_changes([CHANGE])
+    way = _features()[("way", 13)]
+    assert (7.015, 49.035) in list(way["geometry"].exterior.coords)
+    assert way["landuse_type"] == "residential" and way["city"] == "Teststadt"
+    assert report["moved_ways"] == 1
+
+def test_relation_member_change_rebuilds_relation(store):
+    apply_changes([CHANGE])
+    relation = _features()[("relation", 100)]
+    geometry = relation["geometry"]
+    assert relation["name"] == "Streuobstwiese"
+    assert geometry.geom_type == "Polygon" and len(geometry.interiors) == 1
+    assert geometry.area == pytest.approx(0.04 * 0.04 - 0.01 * 0.01)
+
+def test_applying_twice_changes_nothing(store):
+    apply_changes([CHANGE])
+    first = _features()
+    apply_changes([CHANGE])
+    second = _features()
+    assert set(first) == set(second)
+    assert all(first[k]["geometry"].equals(second[k]["geometry"]) for k in first)
+
+def test_store_without_index_is_refused(plain_store):
+    with pytest.raises(RuntimeError):
+        apply_changes([CHANGE])
@@ -0,0 +1,62 @@
+import shapely
+
+from app.utils.overpass_query import POLY_MAX_VERTICES, build_overpass_query
+from app.utils.utils import parse_overpass_elements
+
+BOUNDARY = shapely.Polygon([(7.0, 49.0), (7.4, 49.0), (7.4, 49.2), (7.2, 49.2), (7.2, 49.4), (7.0, 49.4)])
+
+def _statements(query):
+    return [line.strip() for line in query.splitlines() if line.startswith("  ")]
+
+def test_bbox_query():
+    query = build_overpass_query(shapely.box(13.3, 52.45, 13.45, 52.55), "Forest", "all")
+    assert query.startswith("[out:json][timeout:60];")
+    assert _statements(query) == ['node["landuse"="forest"](52.45,13.3,52.55,13.45);',
+                                  'way["landuse"="forest"](52.45,13.3,52.55,13.45);',
+                                  'relation["landuse"="forest"](52.45,13.3,52.55,13.45);']
+
+def test_geometry_types():
+    area = shapely.box(13.3, 52.45, 13.45, 52.55)
+    assert _statements(build_overpass_query(area, "all", "point")) == ['node["landuse"](52.45,13.3,52.55,13.45);']
+    assert _statements(build_overpass_query(area, "all", "multipolygon")) == [
+        'way["landuse"](52.45,13.3,52.55,13.45);',
+        'relation["type"="multipolygon"]["landuse"](52.45,13.3,52.55,13.45);']
+
+def test_cell_inside_the_boundary_stays_a_bbox():
+    query = build_overpass_query(shapely.box(7.05, 49.05, 7.1, 49.1), "all", "point", boundary=BOUNDARY)
+    assert _statements(query) == ['node["landuse"](49.05,7.05,49.1,7.1);']
+
+def test_cell_cut_by_the_boundary_gets_a_poly_filter():
+    cell = shapely.box(7.1, 49.1, 7.3, 49.3)
+    query = build_overpass_query(cell, "all", "point", boundary=BOUNDARY)
+    (statement,) = _statements(query)
+    assert statement.startswith('node["landuse"](poly:"')
+    values = [float(v) for v in statement.split('"')[3].split()]
+    poly = shapely.Polygon(list(zip(values[1::2], values[0::2])))
+    # covers the part of the cell inside the state, not the missing corner
+    assert poly.covers(cell.intersection(BOUNDARY))
+    assert not poly.contains(shapely.Point(7.28, 49.28))
+    assert len(values) // 2 <= POLY_MAX_VERTICES
+
+def test_cell_outside_the_boundary_has_no_query():
+    assert build_overpass_query(shapely.box(7.25, 49.25, 7.35, 49.35), "all", "all", boundary=BOUNDARY) is None
+
+def test_geometry_is_inline_without_recursion():
+    query = build_overpass_query(shapely.box(13.3, 52.45, 13.45, 52.55), "all", "all")
+    assert query.rstrip().endswith("out geom qt;")
+    assert ">" not in query
+    assert query.count("out ") == 1
+
+def test_untagged_types_query_their_own_tag():
+    area = shapely.box(13.3, 52.45, 13.45, 52.55)
+    assert _statements(build_overpass_query(area, "Natural", "point")) == [
+        'node["natural"][!"landuse"](52.45,13.3,52.55,13.45);']
+    assert _statements(build_overpass_query(area, "leisure", "point")) == [
+        'node["leisure"][!"landuse"][!"natural"](52.45,13.3,52.55,13.45);']
+
+def test_untagged_elements_get_their_type():
+    elements = [{"type": "node", "id": 1, "lat": 49.0, "lon": 7.0, "tags": {"landuse": "forest", "natural": "wood"}},
+                {"type": "node", "id": 2, "lat": 49.0, "lon": 7.0, "tags": {"natural": "wood", "leisure": "park"}},
+                {"type": "node", "id": 3, "lat": 49.0, "lon": 7.0, "tags": {"leisure": "park"}},
+                {"type": "node", "id": 4, "lat": 49.0, "lon": 7.0, "tags": {"amenity": "bench"}}]
+    assert list(parse_overpass_elements(elements)["landuse_type"]) == ["forest", "natural", "leisure"]
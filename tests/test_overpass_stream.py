@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from app.utils.overpass_stream import OverpassElementDecoder, iter_element_batches
+
+# escapes, non-ASCII, literals and negative numbers, all of which a chunk boundary can split
+ELEMENTS = [{"type": "node", "id": i, "lat": 49.1234567 + i, "lon": -7.5,
+             "tags": {"name": f'Wiese "{i}" ä', "ok": True, "none": None}}
+            for i in range(50)]
+
+def _response(elements=ELEMENTS):
+    return json.dumps({"version": 0.6, "osm3s": {}, "elements": elements, "remark": "done"},
+                      ensure_ascii=False).encode("utf-8")
+
+def _chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 1 << 16])
+def test_elements_survive_any_chunk_boundary(size):
+    batches = list(iter_element_batches(_chunks(_response(), size), batch_size=16))
+    assert [e for batch in batches for e in batch] == ELEMENTS
+    assert [len(b) for b in batches] == [16, 16, 16, 2]
+
+@pytest.mark.parametrize("before_end", [0, 1, 10, 2000])
+def test_truncated_response_raises(before_end):
+    # cut before the closing "]": after the last element, inside it, or halfway through the array
+    data = _response()
+    end = data.rindex(b"]")
+    with pytest.raises(ValueError, match="ended inside"):
+        list(iter_element_batches(_chunks(data[:end - before_end], 64)))
+
+def test_response_without_elements_raises():
+    with pytest.raises(ValueError, match="no elements"):
+        list(iter_element_batches([b"<html>Gateway Timeout</html>"]))
+
+def test_malformed_element_raises_before_the_stream_ends():
+    data = _response().replace(b'"id": 3,', b'"id": 3 "x",', 1)
+    decoder = OverpassElementDecoder()
+    chunks = _chunks(data, 64)
+    with pytest.raises(ValueError, match="Malformed"):
+        for i, chunk in enumerate(chunks):
+            decoder.feed(chunk)
+    assert i < len(chunks) - 1
+
+def test_large_element_is_decoded_a_bounded_number_of_times(monkeypatch):
+    # one 2 MB element fed in 1 KB chunks: retries grow geometrically instead of once per chunk
+    big = {"type": "way", "id": 1, "geometry": [{"lat": 49.0, "lon": 7.0}] * 80_000}
+    decoder = OverpassElementDecoder()
+    calls = []
+    raw_decode = decoder._decoder.raw_decode
+    monkeypatch.setattr(decoder._decoder, "raw_decode", lambda s, idx: calls.append(idx) or raw_decode(s, idx))
+    elements = []
+    for chunk in _chunks(_response([big]), 1024):
+        elements.extend(decoder.feed(chunk))
+    elements.extend(decoder.close())
+    assert elements == [big]
+    assert len(calls) < 20
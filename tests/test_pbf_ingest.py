@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+import shapely
+
+osmium = pytest.importorskip("osmium")
+
+from app.config.config_db import get_connection
+from app.persistence.landuse_persistence import LANDUSE_COLUMNS
+from app.persistence.osm_index_persistence import create_osm_index_tables
+from app.services.pbf_ingest_service import (_OsmIndexBuffer, _header_bounds, _make_handler, _tracked_relations,
+                                             build_feature_frame)
+
+BASE = Path(__file__).parent / "fixtures" / "base.osm"
+
+def _rows():
+    square = shapely.MultiPolygon([shapely.box(7.0, 49.0, 7.01, 49.01)])
+    two_parts = shapely.MultiPolygon([shapely.box(7.0, 49.0, 7.01, 49.01), shapely.box(7.02, 49.0, 7.03, 49.01)])
+    return [
+        ("way", 10, {"landuse": "meadow", "name": "Alte Wiese", "addr:city": "Teststadt"}, shapely.to_wkb(square)),
+        ("relation", 100, {"landuse": "orchard", "is_in": "Saarland"}, shapely.to_wkb(two_parts)),
+        ("node", 30, {"natural": "tree"}, shapely.to_wkb(shapely.Point(7.08, 49.05))),
+        ("way", 15, {"natural": "tree_row", "leisure": "park"}, shapely.to_wkb(shapely.LineString([(7.0, 49.0), (7.1, 49.1)]))),
+    ]
+
+def _values(column):
+    # missing tags as None, whatever the column's string dtype uses for them
+    return [v if isinstance(v, str) else None for v in column]
+
+def test_build_feature_frame():
+    df = build_feature_frame(_rows())
+    assert list(df.columns) == LANDUSE_COLUMNS
+    assert list(df["osm_id"]) == ["10", "100", "30", "15"]
+    assert df["id"].is_unique
+
+    geoms = shapely.from_wkb(df["geometry"].to_numpy())
+    # single-part multipolygons are stored as polygons
+    assert list(shapely.get_type_id(geoms)) == [3, 6, 0, 1]
+    # web-mercator m², only for areas
+    assert df["area"][0] == pytest.approx(1113.19 * 1696.8, rel=0.01)
+    assert df["area"][1] == pytest.approx(2 * df["area"][0], rel=1e-3)
+    assert np.isnan(df["area"][2]) and np.isnan(df["area"][3])
+    assert list(df.loc[1, ["minx", "miny", "maxx", "maxy"]]) == pytest.approx([7.0, 49.0, 7.03, 49.01])
+
+    assert _values(df["landuse_type"]) == ["meadow", "orchard", None, None]
+    assert _values(df["natural_type"]) == [None, None, "tree", "tree_row"]
+    assert _values(df["city"]) == ["Teststadt", "Saarland", None, None]
+    assert df["leisure"][3] == "park" and df["name"][0] == "Alte Wiese"
+
+def _ingest(batch_size=100, index=None):
+    frames = []
+    handler = _make_handler(osmium, frames.append, batch_size, index)
+    handler.apply_file(str(BASE), locations=True)
+    handler.flush()
+    return frames, handler.count
+
+def test_handler_builds_features():
+    frames, count = _ingest()
+    df = frames[0]
+    features = {(t, int(i)): shapely.from_wkb(g) for t, i, g in zip(df["osm_type"], df["osm_id"], df["geometry"])}
+    assert count == len(df) == 7
+    # closed ways and the multipolygon come from the area assembly, the open way is a line,
+    # the untagged way 30 is not a feature
+    assert set(features) == {("way", 10), ("way", 11), ("way", 12), ("way", 13), ("way", 15), ("relation", 100),
+                             ("node", 30)}
+    assert features[("way", 10)].equals(shapely.box(7.0, 49.0, 7.01, 49.01))
+    assert features[("relation", 100)].equals(shapely.box(7.0, 49.04, 7.04, 49.08))
+    assert features[("way", 15)].geom_type == "LineString"
+    assert features[("node", 30)].equals(shapely.Point(7.08, 49.05))
+
+def test_handler_flushes_in_batches():
+    frames, count = _ingest(batch_size=3)
+    assert [len(f) for f in frames] == [3, 3, 1]
+    assert count == 7
+
+def test_handler_indexes_feature_and_member_ways(plain_store):
+    create_osm_index_tables(replace=True)
+    relation_members, member_ways = _tracked_relations(osmium, BASE)
+    assert list(relation_members["member_id"]) == [20, 21] and member_ways == {20, 21}
+
+    _ingest(index=_OsmIndexBuffer(member_ways, 100))
+    conn = get_connection()
+    way_ids = {r[0] for r in conn.execute("SELECT DISTINCT way_id FROM osm_way_nodes;").fetchall()}
+    nodes = conn.execute("SELECT count(*) FROM osm_nodes;").fetchone()[0]
+    conn.close()
+    # the untagged way 30 is neither a feature nor a member, its nodes come in through way 15
+    assert way_ids == {10, 11, 12, 13, 15, 20, 21}
+    assert nodes == 23
+
+def test_header_bounds():
+    assert _header_bounds(osmium, BASE) == pytest.approx((7.0, 49.0, 7.1, 49.1))
@@ -0,0 +1,46 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from app.services.file_export_service import TIPPECANOE_MAXZOOM
+from app.services.tile_levels_service import build_zoom_levels, pixel_degrees, simplify_coverage
+
+def _wavy_strip(x0, x1, y0, y1, n=200, amplitude=0.0005):
+    # two fields meeting on a jagged border of many sub-pixel steps
+    xs = np.linspace(x0, x1, n)
+    border = [(x, y1 + amplitude * np.sin(i)) for i, x in enumerate(xs)]
+    below = shapely.Polygon([(x0, y0), (x1, y0), *reversed(border)])
+    above = shapely.Polygon([*border, (x1, y1 + 0.02), (x0, y1 + 0.02)])
+    return below, above
+
+def test_adjacent_fields_keep_their_shared_edge():
+    below, above = _wavy_strip(7.0, 7.1, 49.0, 49.01)
+    px = pixel_degrees(8)
+    simplified = simplify_coverage(np.array([below, above], dtype=object), px)
+    assert all(shapely.get_num_coordinates(simplified) < [shapely.get_num_coordinates(below),
+                                                        shapely.get_num_coordinates(above)])
+    # no gap and no overlap between the two fields
+    assert shapely.area(shapely.intersection(*simplified)) < 1e-12
+    union = shapely.union_all(simplified)
+    assert union.geom_type == "Polygon" and len(union.interiors) == 0
+
+def test_overlapping_polygons_are_simplified_one_by_one():
+    below, above = _wavy_strip(7.0, 7.1, 49.0, 49.01)
+    overlapping = shapely.buffer(below, 0.001)
+    simplified = simplify_coverage(np.array([overlapping, above, shapely.Point(7, 49)], dtype=object),
+                                   pixel_degrees(8))
+    assert shapely.is_valid(simplified).all()
+    assert simplified[2].equals(shapely.Point(7, 49))
+
+def test_merged_shapes_carry_no_feature_attributes():
+    fields = [shapely.box(7.0 + i * 0.0003, 49.0, 7.0002 + i * 0.0003, 49.0002) for i in range(20)]
+    gdf = gpd.GeoDataFrame({"osm_id": [str(i) for i in range(20)], "name": "Feld", "city": "Saarbrücken",
+                            "landuse_type": "farmland", "leisure": None, "area": 400.0},
+                           geometry=fields, crs="EPSG:4326")
+    levels = build_zoom_levels(gdf, bands=[(0, 6), (7, 9)], max_zoom=14, merge_max_zoom=9)
+
+    merged = levels[levels["merged"].eq(True)]
+    assert len(merged) and set(merged[TIPPECANOE_MAXZOOM]) <= {6, 9}
+    assert merged[["osm_id", "name", "city"]].isna().all().all()
+    assert set(merged["landuse_type"]) == {"farmland"}
+    assert levels.loc[levels["merged"].ne(True), "osm_id"].notna().all()
@@ -0,0 +1,120 @@
+import threading
+import time
+
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+
+from app.services import tiles_export_service as service
+from app.services.tiles_export_service import get_or_build_pmtiles
+
+FRAME = gpd.GeoDataFrame({"osm_id": ["1"]}, geometry=[box(7.0, 49.0, 7.1, 49.1)], crs="EPSG:4326")
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(service, "_build_locks", {})
+    monkeypatch.setattr(service, "_failed_builds", {})
+
+def _loader(frame, delay=0.0):
+    calls = []
+
+    def load():
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        return frame, 0
+    return load, calls
+
+def _concurrently(n, fn):
+    results = [None] * n
+
+    def run(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+        time.sleep(0.01)
+    for t in threads:
+        t.join(10)
+    return results
+
+def test_concurrent_requests_share_one_build(monkeypatch, tmp_path):
+    def generate(df, output_dir, name):
+        time.sleep(0.1)
+        (output_dir / name).write_bytes(b"PMTi")
+        return str(output_dir / name)
+    monkeypatch.setattr(service, "generate_pmtiles", generate)
+    load, calls = _loader(FRAME, delay=0.1)
+
+    results = _concurrently(6, lambda: get_or_build_pmtiles("k" * 24, load, tmp_path))
+    assert len(calls) == 1
+    assert len(set(results)) == 1 and results[0].endswith(".pmtiles")
+    assert service._build_locks == {}
+
+def test_empty_result_is_remembered(tmp_path):
+    load, calls = _loader(FRAME.iloc[:0], delay=0.1)
+    results = _concurrently(4, lambda: get_or_build_pmtiles("e" * 24, load, tmp_path))
+    assert results == [None] * 4
+    assert get_or_build_pmtiles("e" * 24, load, tmp_path) is None
+    assert len(calls) == 1
+    assert service._build_locks == {}
+
+def test_failed_build_is_remembered_for_a_while(monkeypatch, tmp_path):
+    builds = []
+
+    def generate(df, output_dir, name):
+        builds.append(name)
+        raise RuntimeError("Tippecanoe failed")
+    monkeypatch.setattr(service, "generate_pmtiles", generate)
+    load, calls = _loader(FRAME)
+
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            get_or_build_pmtiles("f" * 24, load, tmp_path)
+    assert len(calls) == 1 and len(builds) == 1
+
+    # once the failure expires the archive is built again
+    monkeypatch.setattr(service, "PMTILES_RETRY_AFTER", 0)
+    service._failed_builds.clear()
+    with pytest.raises(RuntimeError):
+        get_or_build_pmtiles("f" * 24, load, tmp_path)
+    with pytest.raises(RuntimeError):
+        get_or_build_pmtiles("f" * 24, load, tmp_path)
+    assert len(builds) == 3
+
+def test_load_errors_are_not_remembered(tmp_path):
+    attempts = []
+
+    def load():
+        attempts.append(1)
+        raise RuntimeError("Overpass API error: 504")
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            get_or_build_pmtiles("l" * 24, load, tmp_path)
+    assert len(attempts) == 2
+
+def test_incomplete_load_is_not_kept_under_the_filter_name(monkeypatch, tmp_path):
+    builds = []
+
+    def generate(df, output_dir, name=None):
+        builds.append(name)
+        path = output_dir / (name or f"landuse_tmp{len(builds)}.pmtiles")
+        path.write_bytes(b"PMTi")
+        return str(path)
+    monkeypatch.setattr(service, "generate_pmtiles", generate)
+    loads = iter([(FRAME, 2), (FRAME, 0)])
+
+    partial = get_or_build_pmtiles("p" * 24, lambda: next(loads), tmp_path)
+    assert builds == [None]
+    assert not service.pmtiles_path_for("p" * 24, tmp_path).exists()
+    # the next request loads again and keeps the complete archive
+    complete = get_or_build_pmtiles("p" * 24, lambda: next(loads), tmp_path)
+    assert complete != partial
+    assert complete == str(service.pmtiles_path_for("p" * 24, tmp_path))
+
+def test_incomplete_empty_load_is_not_remembered(tmp_path):
+    loads = iter([(FRAME.iloc[:0], 1), (FRAME.iloc[:0], 0)])
+    assert get_or_build_pmtiles("q" * 24, lambda: next(loads), tmp_path) is None
+    assert service._recent_failure(service.pmtiles_path_for("q" * 24, tmp_path).name) == (False, None)
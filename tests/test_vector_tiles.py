@@ -0,0 +1,79 @@
+from urllib.parse import parse_qs, urlsplit
+
+import shapely
+from werkzeug.datastructures import MultiDict
+
+from app.persistence import landuse_persistence
+from app.routes import landuse_routes
+from app.services import vector_tile_service
+from app.services.vector_tile_service import TileLRU, get_vector_tile
+from app.utils.disk_cache import DiskCache
+from app.utils.utils import tile_bounds
+
+AREA = ("bbox", (49.0, 7.0, 49.5, 7.5))
+
+def _tile_calls(monkeypatch, tmp_path):
+    # get_vector_tile with fresh caches and the MVT query replaced by a recorder
+    calls = []
+    monkeypatch.setattr(vector_tile_service, "memory_tiles", TileLRU(16))
+    monkeypatch.setattr(vector_tile_service, "mvt_cache", DiskCache(tmp_path / "mvt", 60, 1 << 20, suffix=".mvt"))
+    monkeypatch.setattr(vector_tile_service, "current_data_version", lambda: 1)
+    monkeypatch.setattr(vector_tile_service, "get_landuse_mvt",
+                        lambda *args, area_wkb=None, **kwargs: calls.append(area_wkb) or b"tile")
+    return calls
+
+def test_tiles_url_carries_area(monkeypatch):
+    monkeypatch.setattr(landuse_routes, "local_store_covers", lambda bounds: True)
+    tiles = landuse_routes._vector_tiles(AREA, (7.0, 49.0, 7.5, 49.5), "forest", "polygon")
+    args = MultiDict({k: v[0] for k, v in parse_qs(urlsplit(tiles["tiles_url"]).query).items()})
+    assert landuse_routes._request_area(args)[0] == AREA
+    assert args["landuse_type"] == "forest"
+
+def test_tile_outside_area_is_empty_without_query(monkeypatch, tmp_path):
+    calls = _tile_calls(monkeypatch, tmp_path)
+    # z10 tile around Berlin, far from the Saarland bbox
+    data, _ = get_vector_tile(10, 550, 335, "all", "", AREA)
+    assert data == b"" and calls == []
+
+def test_tile_inside_area_needs_no_feature_test(monkeypatch, tmp_path):
+    calls = _tile_calls(monkeypatch, tmp_path)
+    # z14 tile around (7.25, 49.25)
+    data, _ = get_vector_tile(14, 8521, 5609, "all", "", AREA)
+    assert data == b"tile" and calls == [None]
+
+def test_tile_on_area_edge_gets_clipped_area(monkeypatch, tmp_path):
+    calls = _tile_calls(monkeypatch, tmp_path)
+    # z6 tile containing the whole bbox and more
+    data, _ = get_vector_tile(6, 33, 21, "all", "", AREA)
+    area = shapely.from_wkb(calls[0])
+    tile = shapely.box(*tile_bounds(33, 21, 6))
+    assert data == b"tile"
+    assert area.equals(shapely.box(7.0, 49.0, 7.5, 49.5).intersection(tile))
+
+def test_cache_key_depends_on_area(monkeypatch, tmp_path):
+    _tile_calls(monkeypatch, tmp_path)
+    _, key = get_vector_tile(14, 8521, 5609, "all", "", AREA)
+    _, other = get_vector_tile(14, 8521, 5609, "all", "", ("bbox", (49.0, 7.0, 49.4, 7.5)))
+    _, unfiltered = get_vector_tile(14, 8521, 5609, "all", "", None)
+    assert len({key, other, unfiltered}) == 3
+
+def test_mvt_sql_keeps_features_of_the_area(spatial_store, feature_frame):
+    # two features in the same tile, only one inside the requested bbox
+    landuse_persistence.create_landuse_table()
+    landuse_persistence.insert_landuse_features(feature_frame([
+        (1, "forest", shapely.box(7.10, 49.10, 7.12, 49.12)),
+        (2, "forest", shapely.box(7.60, 49.10, 7.62, 49.12)),
+    ]))
+    landuse_persistence.create_landuse_index()
+    z, x, y = 6, 33, 21
+    bounds = tile_bounds(x, y, z)
+    tolerance = vector_tile_service.simplify_tolerance(z)
+    area_wkb = shapely.to_wkb(shapely.box(7.0, 49.0, 7.5, 49.5))
+
+    everything = landuse_persistence.get_landuse_mvt(z, x, y, bounds, "all", "", tolerance)
+    in_area = landuse_persistence.get_landuse_mvt(z, x, y, bounds, "all", "", tolerance, area_wkb=area_wkb)
+    outside = landuse_persistence.get_landuse_mvt(z, x, y, bounds, "all", "", tolerance,
+                                                  area_wkb=shapely.to_wkb(shapely.box(8.0, 49.0, 8.1, 49.1)))
+    assert everything and in_area
+    assert len(in_area) < len(everything)
+    assert outside == b""